@@ -7,8 +7,181 @@ import subprocess
 import random
 import uuid
 import hashlib
+import re
 from configobj import ConfigObj
 
+# Pillow is optional. Without it, assets are copied but never downscaled or
+# converted
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+class Assets:
+    # matches \includegraphics[options]{path}, keeping the path separate
+    includeRE = re.compile(r'(\\includegraphics\s*(?:\[[^\]]*\])?\s*\{)([^}]+)(\})')
+
+    # extensions pdflatex tries when \includegraphics has none
+    latexExtensions = ['.pdf', '.png', '.jpg', '.jpeg']
+
+    # formats pdflatex can't read, converted to PNG when Pillow is available
+    convertExtensions = ['.gif', '.bmp', '.tif', '.tiff', '.webp']
+
+    # formats we know how to downscale
+    rasterExtensions = ['.png', '.jpg', '.jpeg']
+
+    # widest an image can be printed on a letter page with 1in margins
+    printWidth = 6.5
+
+    ###########################################
+    # __init__
+    ##########################################
+    def __init__(self, destDir, dpi=None):
+        self.destDir = destDir
+        self.dirName = "assets"
+        self.assetDir = os.path.join(destDir, self.dirName)
+        self.dpi = dpi
+
+        # absolute source path -> (mtime, size, hash), so each file is only
+        # hashed once no matter how many versions reference it
+        self.hashes = {}
+
+        # absolute source path -> path relative to destDir
+        self.resolved = {}
+
+        self.copied = 0
+        self.reused = 0
+
+    ###########################################
+    # rewrite
+    ##########################################
+    def rewrite(self, text, searchDirs):
+        def replace(match):
+            asset = self.add(match.group(2).strip(), searchDirs)
+            if not asset:
+                return match.group(0)
+            return match.group(1) + asset + match.group(3)
+
+        return self.includeRE.sub(replace, text)
+
+    ###########################################
+    # find
+    ##########################################
+    def find(self, name, searchDirs):
+        candidates = [name]
+        if not os.path.splitext(name)[1]:
+            candidates = [name + ext for ext in self.latexExtensions]
+
+        for c in candidates:
+            if os.path.isabs(c):
+                if os.path.isfile(c):
+                    return os.path.abspath(c)
+                continue
+            for d in searchDirs:
+                f = os.path.join(d, c)
+                if os.path.isfile(f):
+                    return os.path.abspath(f)
+        return None
+
+    ###########################################
+    # hash
+    ##########################################
+    def hash(self, src):
+        st = os.stat(src)
+        cached = self.hashes.get(src)
+        if cached and cached[0] == st.st_mtime and cached[1] == st.st_size:
+            return cached[2]
+
+        h = hashlib.sha1()
+        with open(src, 'rb') as f:
+            for chunk in iter(lambda: f.read(65536), b''):
+                h.update(chunk)
+        digest = h.hexdigest()[:16]
+        self.hashes[src] = (st.st_mtime, st.st_size, digest)
+        return digest
+
+    ###########################################
+    # add
+    ##########################################
+    def add(self, name, searchDirs):
+        # Already pointing into the asset directory
+        if name.startswith(self.dirName + "/"):
+            return None
+
+        src = self.find(name, searchDirs)
+        if not src:
+            print("Warning: could not find image '%s'" % (name))
+            return None
+
+        if src in self.resolved:
+            return self.resolved[src]
+
+        digest = self.hash(src)
+        ext = os.path.splitext(src)[1].lower()
+
+        convert = Image and (ext in self.convertExtensions or (self.dpi and ext in self.rasterExtensions))
+        if convert:
+            outExt = '.jpg' if ext in ['.jpg', '.jpeg'] else '.png'
+            suffix = "-%ddpi" % self.dpi if self.dpi else ""
+            outName = digest + suffix + outExt
+        else:
+            if ext in self.convertExtensions:
+                print("Warning: install Pillow to convert '%s' for pdflatex" % (name))
+            outName = digest + ext
+
+        dst = os.path.join(self.assetDir, outName)
+
+        # Files are named by content hash, so an existing file is always up
+        # to date
+        if os.path.exists(dst):
+            self.reused += 1
+        else:
+            try:
+                os.makedirs(self.assetDir, 0o700)
+            except OSError as e:
+                if not (e.errno == errno.EEXIST and os.path.isdir(self.assetDir)):
+                    fatal("Can not create asset directory %s" % (self.assetDir))
+
+            # Write to a temporary name first so an interrupted run never
+            # leaves a truncated file that looks cached
+            tmp = dst + ".tmp"
+            if convert:
+                self.convert(src, tmp, outExt)
+            else:
+                shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+            self.copied += 1
+
+        self.resolved[src] = self.dirName + "/" + outName
+        return self.resolved[src]
+
+    ###########################################
+    # convert
+    ##########################################
+    def convert(self, src, dst, outExt):
+        img = Image.open(src)
+        if getattr(img, 'n_frames', 1) > 1:
+            img.seek(0)
+
+        # pdflatex assumes 72 dpi when the file doesn't say, so scale the
+        # density along with the pixels to keep the printed size the same
+        density = img.info.get('dpi', (72, 72))[0] or 72
+
+        if self.dpi:
+            maxWidth = int(self.printWidth * self.dpi)
+            if img.width > maxWidth:
+                height = max(1, int(round(img.height * maxWidth / float(img.width))))
+                density = density * maxWidth / float(img.width)
+                img = img.resize((maxWidth, height), Image.LANCZOS)
+
+        if outExt == '.jpg':
+            img.convert('RGB').save(dst, 'JPEG', quality=90, optimize=True, dpi=(density, density))
+        else:
+            if img.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA'):
+                img = img.convert('RGBA')
+            img.save(dst, 'PNG', optimize=True, dpi=(density, density))
+
 
 class MKT:
     # set to True when the master settings are read. This is done so we only
@@ -55,6 +228,12 @@ class MKT:
 
     multipartSkipKeys = ['type', 'points', 'showPoints', 'question', 'solutionSpace', 'key']
 
+    # shared asset directory for every version and key written by this run
+    assets = None
+
+    # ids of questions whose images have already been collected
+    assetsDone = None
+
     # hash used for duplicate question detection. Since we want to keep track
     # of ALL questions, regardless of whether we use it in a test or not, we
     # can make it a member variable
@@ -232,6 +411,9 @@ class MKT:
                 fatal("%s: file already exists" % (answerFilename))
             kf = open(answerFilename, 'w', encoding='utf-8')
 
+        # Copy the images this version uses into the shared asset directory
+        self.collectAssets(args, destDir, questions)
+
         # Generate the test once
         tempFile = tempfile.TemporaryFile(mode='w+')
         self.generateTest(tempFile, questions)
@@ -262,6 +444,66 @@ class MKT:
         if args.pdf:
             self.createPDF(outFilename, answerFilename)
 
+    ##########################################
+    # collectAssets
+    ##########################################
+    def collectAssets(self, args, destDir, questions):
+        if self.assets is None:
+            self.assets = Assets(destDir, args.imageDPI)
+            self.assetsDone = set()
+
+        configDir = os.path.dirname(args.configFile) or "."
+        copied, reused = self.assets.copied, self.assets.reused
+
+        for q in questions:
+            # The same question can show up in more than one version
+            if id(q) in self.assetsDone:
+                continue
+            self.assetsDone.add(id(q))
+
+            searchDirs = [configDir, os.getcwd(), destDir]
+            questionDir = self.sourceDir(q["key"])
+            if questionDir is not None:
+                searchDirs.insert(0, questionDir)
+
+            self.rewriteAssets(q, searchDirs)
+
+        copied = self.assets.copied - copied
+        reused = self.assets.reused - reused
+        if copied or reused:
+            print("Assets in %s: %d copied, %d reused" % (self.assets.assetDir, copied, reused))
+
+    ##########################################
+    # rewriteAssets
+    ##########################################
+    def rewriteAssets(self, section, searchDirs):
+        for k in section.keys():
+            if k == "key":
+                continue
+            v = section[k]
+            if isinstance(v, str):
+                section[k] = self.assets.rewrite(v, searchDirs)
+            elif isinstance(v, list):
+                section[k] = [self.assets.rewrite(i, searchDirs) for i in v]
+            elif isinstance(v, dict):
+                self.rewriteAssets(v, searchDirs)
+
+    ##########################################
+    # sourceDir
+    ##########################################
+    def sourceDir(self, key):
+        # Question keys are the file name, followed by one path component per
+        # section, so walk back up until we hit the file itself
+        path = key
+        while path and not os.path.isfile(path):
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+        if not path:
+            return None
+        return os.path.dirname(path) or "."
+
     ##########################################
     # createPDF
     ##########################################
@@ -1320,6 +1562,8 @@ def main(argv):
                         action='store_true')
     parser.add_argument("-u", "--uuid", help="Generate a test with the specific UUID")
     parser.add_argument("-v", "--versions", help="Generate mulitple versions of this exam", type=int)
+    parser.add_argument("--imageDPI", help="Downscale images wider than the page at this resolution (requires Pillow)",
+                        type=int)
     parser.add_argument("--version", action='version', version='%(prog)s 0.50')
 
     mkt = MKT(parser.parse_args())
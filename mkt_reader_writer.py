@@ -1,45 +1,189 @@
 #!/usr/bin/env python3
 import os
-import glob
+import re
+import math
+import heapq
+import atexit
+import contextlib
+import shutil
+import tempfile
+import threading
 
 from os.path import exists, isdir, isfile, join
-from configobj import ConfigObj, Section
+from configobj import ConfigObj, ConfigObjError, Section
 
 MAX_QUESTIONS = "maxQuestions"
+DEFAULT_PAGE_SIZE = 100
+
+# Edits arriving within this many seconds of each other share one write
+COALESCE_DELAY = 0.5
 
 root_path = "../courses/"
 questions_path = "/questions/"
 # questionPool_path = "/questionPool/"
 
+# Everything below is cached in-process and checked against mtimes on each
+# request, so browsing never re-walks or re-parses anything that didn't change.
+#
+#   _listing_cache: directory -> (mtime, entries) for courses and exams
+#   _tree_cache:    course -> ({dir: mtime}, folders, files)
+#   _file_cache:    question file -> _QuestionFile
+_listing_cache = {}
+_tree_cache = {}
+_file_cache = {}
+_cache_lock = threading.RLock()
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+def _list_dir(path, want_dirs):
+    mtime = _mtime(path)
+    key = (path, want_dirs)
+    with _cache_lock:
+        cached = _listing_cache.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+    check = isdir if want_dirs else isfile
+    entries = sorted(name for name in os.listdir(path) if check(join(path, name)))
+    with _cache_lock:
+        _listing_cache[key] = (mtime, entries)
+    return entries
+
+def _scan_tree(course):
+    base = root_path + course + questions_path
+    dirs = {}
+    folders = []
+    files = []
+    for parent, ldirs, lfiles in os.walk(base):
+        ldirs[:] = sorted(nm for nm in ldirs if not nm.startswith('.'))
+        lfiles = [nm for nm in lfiles if not nm.startswith('.')]
+        dirs[parent] = _mtime(parent)
+        folders.append(parent.replace(root_path + course, '').strip('/'))
+        for f in lfiles:
+            files.append(join(parent, f).replace(base, ''))
+    files.sort()
+    return dirs, folders, files
+
+def _get_tree(course):
+    # Adding or removing an entry bumps its directory's mtime, so stat-ing the
+    # directories is enough to know whether the cached walk is still good
+    with _cache_lock:
+        cached = _tree_cache.get(course)
+    if cached and all(_mtime(d) == m for d, m in cached[0].items()):
+        return cached
+
+    tree = _scan_tree(course)
+    with _cache_lock:
+        _tree_cache[course] = tree
+    return tree
+
 def get_folders(course):
-    folders = [x[0] for x in os.walk(root_path + course + questions_path)]
-    folders_trimmed = list(map(lambda folder : folder.replace(root_path + course, '').strip('/'), folders))
-    return trim_array(folders_trimmed)
+    return list(_get_tree(course)[1])
 
 def get_courses():
-    courses = [name for name in os.listdir(root_path)
-            if isdir(join(root_path, name))]
-    courses.sort()
-    return courses
+    return list(_list_dir(root_path, True))
 
 def get_exams(course):
-    path = root_path + course
-    exams = [f for f in os.listdir(path) if isfile(join(path, f))]
-    exams.sort()
-    return trim_array(exams).replace(".ini", "")
+    exams = _list_dir(root_path + course, False)
+    return [e.replace(".ini", "") for e in exams]
 
 def get_question_files(course, exam):
-    path = root_path + course + questions_path
-    questions = [f for f in glob.glob(path + '**', recursive=True) if isfile(f)]
-    questions.sort()
-    return trim_array(questions).replace(path, '')
+    return list(_get_tree(course)[2])
+
+def question_file_path(course, question_file):
+    return root_path + course + questions_path + question_file
+
+class StaleVersion(Exception):
+    """Raised when an edit was made against an older copy of a file."""
+    def __init__(self, current):
+        Exception.__init__(self, "question file is now at version %s" % current)
+        self.current = current
+
+class UnknownQuestion(Exception):
+    """Raised when an edit names a question the file doesn't have."""
+    def __init__(self, name):
+        Exception.__init__(self, "Unknown question: %s" % name)
+        self.name = name
+
+class _QuestionFile:
+    """Parsed question file plus the bookkeeping needed to edit it safely."""
+    def __init__(self, f_name, st):
+        self.f_name = f_name
+        self.obj = ConfigObj(f_name, interpolation=True)
+        self.questions = load_questions(self.obj, os.path.basename(f_name))
+        self.mtime = st.st_mtime_ns
+        self.size = st.st_size
+        # The on-disk mtime we parsed plus the number of in-memory edits since
+        # then. Coalesced writes change the mtime later without changing the
+        # content, so the token can't just be the current mtime.
+        self.base = st.st_mtime_ns
+        self.edits = 0
+        self.dirty = False
+        self.timer = None
+        self.lock = threading.RLock()
+
+    @property
+    def version(self):
+        return "%x.%d" % (self.base, self.edits)
+
+def _get_file(f_name):
+    with _cache_lock:
+        entry = _file_cache.get(f_name)
+    if entry:
+        with entry.lock:
+            # Pending edits are newer than whatever is on disk
+            if entry.dirty:
+                return entry
+            st = os.stat(f_name)
+            if entry.mtime == st.st_mtime_ns and entry.size == st.st_size:
+                return entry
+
+    fresh = _QuestionFile(f_name, os.stat(f_name))
+    # Swap under the old entry's lock, so an edit can't land on it unseen
+    with entry.lock if entry else contextlib.nullcontext():
+        # Edits made while we were parsing are newer than what we parsed
+        if entry and entry.dirty:
+            return entry
+        with _cache_lock:
+            # Another request may have refreshed it while we were parsing
+            current = _file_cache.get(f_name)
+            if current is not entry:
+                return current
+            _file_cache[f_name] = fresh
+    return fresh
+
+def get_questions_file(course, question_file):
+    """Return the cached (obj, questions) pair for a question file, re-parsing
+    it only when the file on disk has changed."""
+    entry = _get_file(question_file_path(course, question_file))
+    return entry.obj, entry.questions
+
+def get_file_version(course, question_file):
+    return _get_file(question_file_path(course, question_file)).version
 
 def load_questions_file(course, question_file):
-    f_name = root_path + course + questions_path + question_file
-    obj = ConfigObj(f_name, interpolation=True)
-    f_name = f_name.split("/")
-    f_name = f_name[len(f_name)-1]
-    return load_questions(obj, f_name)
+    return get_questions_file(course, question_file)[1]
+
+def load_questions_page(course, question_file, page=1, page_size=DEFAULT_PAGE_SIZE):
+    entry = _get_file(question_file_path(course, question_file))
+    questions = entry.questions
+    page = max(int(page), 1)
+    page_size = max(int(page_size), 1)
+    names = list(questions)
+    start = (page - 1) * page_size
+    return {
+        'questions': {name: questions[name] for name in names[start:start + page_size]},
+        'page': page,
+        'pageSize': page_size,
+        'total': len(names),
+        'hasMore': start + page_size < len(names),
+        'version': entry.version,
+    }
 
 def load_questions(obj, parent):
     qList = {}    
@@ -62,8 +206,252 @@ def get_question(questions, file, title):
 def update_question(question, key, value):
     question[key] = value
     
+def _write_atomic(f_name, obj):
+    # Write next to the original so the rename stays on one filesystem, and
+    # fsync before renaming so a crash leaves either the old or the new file
+    tmp = tempfile.NamedTemporaryFile(dir=os.path.dirname(f_name) or '.', prefix='.' + os.path.basename(f_name),
+                                      suffix='.tmp', delete=False)
+    try:
+        with tmp:
+            obj.write(tmp)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        if exists(f_name):
+            shutil.copymode(f_name, tmp.name)
+        os.replace(tmp.name, f_name)
+    except BaseException:
+        if exists(tmp.name):
+            os.unlink(tmp.name)
+        raise
+
+def _flush(entry):
+    with entry.lock:
+        if entry.timer:
+            entry.timer.cancel()
+            entry.timer = None
+        if not entry.dirty:
+            return
+        _write_atomic(entry.f_name, entry.obj)
+        st = os.stat(entry.f_name)
+        entry.mtime = st.st_mtime_ns
+        entry.size = st.st_size
+        entry.dirty = False
+
+def flush(course=None, question_file=None):
+    """Write pending edits now, for one file or for all of them."""
+    with _cache_lock:
+        if course is None:
+            entries = list(_file_cache.values())
+        else:
+            entry = _file_cache.get(question_file_path(course, question_file))
+            entries = [entry] if entry else []
+    for entry in entries:
+        _flush(entry)
+
+atexit.register(flush)
+
+def _to_value(value):
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    return str(value)
+
+def patch_questions(course, question_file, patches, version=None):
+    """Apply per-question edits and return the file's new version token.
+
+    patches maps a question name to either a dict of fields to set (a value
+    of None removes the field) or None to remove the whole question. When
+    version is given and doesn't match the current one, StaleVersion is
+    raised before anything is changed, as is UnknownQuestion for a name the
+    file doesn't have. The file itself is written a little later so a burst
+    of edits turns into a single write.
+    """
+    f_name = question_file_path(course, question_file)
+    while True:
+        entry = _get_file(f_name)
+        with entry.lock:
+            with _cache_lock:
+                if _file_cache.get(f_name) is not entry:
+                    # The file changed on disk and was re-read since we looked
+                    continue
+            return _patch(entry, patches, version)
+
+def _patch(entry, patches, version):
+    if version is not None and version != entry.version:
+        raise StaleVersion(entry.version)
+
+    for name in patches:
+        if name not in entry.questions:
+            raise UnknownQuestion(name)
+
+    for name, fields in patches.items():
+        question = entry.questions[name]
+        if fields is None:
+            del question.parent[question.name]
+            del entry.questions[name]
+            continue
+        for key, value in fields.items():
+            if value is None:
+                if key in question:
+                    del question[key]
+            else:
+                question[key] = _to_value(value)
+
+    entry.edits += 1
+    entry.dirty = True
+    if entry.timer is None:
+        entry.timer = threading.Timer(COALESCE_DELAY, _flush, [entry])
+        entry.timer.daemon = True
+        entry.timer.start()
+    return entry.version
+
+
 def save_changes(f_name, obj):
-    obj.write(open(f_name, "wb"))
+    with _cache_lock:
+        entry = _file_cache.get(f_name)
+    if entry is None or entry.obj is not obj:
+        _write_atomic(f_name, obj)
+        return
+    with entry.lock:
+        entry.edits += 1
+        entry.dirty = True
+        _flush(entry)
+
+# Fields worth searching; everything else is layout or grading metadata
+SEARCH_FIELDS = ['question', 'solution', 'solutions', 'correctAnswer', 'wrongAnswers', 'choices']
+QUESTION_WEIGHT = 2
+
+_search_indexes = {}
+_token_re = re.compile(r'[a-z0-9_]+')
+
+def _tokenize(text):
+    return _token_re.findall(text.lower())
+
+def _question_terms(question):
+    terms = {}
+    for key in question:
+        value = question[key]
+        if isinstance(value, Section):
+            # multipart sub-questions
+            for term, count in _question_terms(value).items():
+                terms[term] = terms.get(term, 0) + count
+            continue
+        if key not in SEARCH_FIELDS:
+            continue
+        if isinstance(value, list):
+            value = " ".join(value)
+        weight = QUESTION_WEIGHT if key == 'question' else 1
+        for term in _tokenize(value):
+            terms[term] = terms.get(term, 0) + weight
+    return terms
+
+class _SearchIndex:
+    """Inverted index over every question file in one course."""
+    def __init__(self):
+        # term -> {(file, question name): weighted term count}
+        self.postings = {}
+        # file -> (_QuestionFile, version) it was indexed from
+        self.files = {}
+        # file -> {question name: terms}
+        self.docs = {}
+        # file -> mtime of a copy that isn't a question file (an image, say)
+        self.unreadable = {}
+        self.lock = threading.RLock()
+
+    def _remove(self, question_file):
+        for name, terms in self.docs.pop(question_file, {}).items():
+            for term in terms:
+                hits = self.postings.get(term)
+                if hits is None:
+                    continue
+                hits.pop((question_file, name), None)
+                if not hits:
+                    del self.postings[term]
+        self.files.pop(question_file, None)
+
+    def _add(self, question_file, entry):
+        docs = {}
+        for name, question in entry.questions.items():
+            terms = _question_terms(question)
+            docs[name] = terms
+            for term, count in terms.items():
+                self.postings.setdefault(term, {})[(question_file, name)] = count
+        self.docs[question_file] = docs
+        self.files[question_file] = (entry, entry.version)
+
+    def refresh(self, course):
+        """Re-index only the files that were added, removed or edited."""
+        files = _get_tree(course)[2]
+        with self.lock:
+            for question_file in set(self.files) - set(files):
+                self._remove(question_file)
+            for question_file in files:
+                f_name = question_file_path(course, question_file)
+                mtime = _mtime(f_name)
+                if self.unreadable.get(question_file) == mtime:
+                    continue
+                try:
+                    entry = _get_file(f_name)
+                except (UnicodeDecodeError, ConfigObjError):
+                    self._remove(question_file)
+                    self.unreadable[question_file] = mtime
+                    continue
+                self.unreadable.pop(question_file, None)
+                indexed = self.files.get(question_file)
+                if indexed and indexed[0] is entry and indexed[1] == entry.version:
+                    continue
+                self._remove(question_file)
+                with entry.lock:
+                    self._add(question_file, entry)
+
+    def search(self, query, limit):
+        terms = _tokenize(query)
+        if not terms:
+            return []
+        with self.lock:
+            total = sum(len(docs) for docs in self.docs.values()) or 1
+            scores = None
+            for term in set(terms):
+                hits = self.postings.get(term)
+                if not hits:
+                    return []
+                idf = math.log(1 + total / float(len(hits)))
+                if scores is None:
+                    scores = {doc: count * idf for doc, count in hits.items()}
+                else:
+                    # every term has to match
+                    scores = {doc: score + hits[doc] * idf for doc, score in scores.items() if doc in hits}
+                if not scores:
+                    return []
+            ranked = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+            hits = []
+            for (question_file, name), score in ranked:
+                question = self.files[question_file][0].questions.get(name, {})
+                text = question.get('question', '')
+                if isinstance(text, list):
+                    text = " ".join(text)
+                hits.append({
+                    'file': question_file,
+                    'question': name,
+                    'type': question.get('type', ''),
+                    'text': text[:150],
+                    'score': round(score, 4),
+                })
+        return hits
+
+def search_questions(course, query, limit=50):
+    """Ranked search over question text, solutions and choices in a course.
+
+    The index is built the first time a course is searched and afterwards
+    only re-indexes files whose version changed, which includes edits made
+    through patch_questions and save_changes.
+    """
+    with _cache_lock:
+        index = _search_indexes.get(course)
+        if index is None:
+            index = _search_indexes[course] = _SearchIndex()
+    index.refresh(course)
+    return index.search(query, limit)
 
 def read_question_file(file):
     return 'Hello World'
@@ -83,13 +471,10 @@ def create_section(name, course, path):
     os.makedirs(new_section)
     return 'Success'
 
-def trim_array(arr):
-    return str(arr).strip('[]').replace("'", "")
-
 if __name__ == "__main__":
     if not os._exists("../questions/"):
         root_path = "./questions/"
-    obj, questions = load_questions_file("csci320-2191", "chapter1.txt")
+    obj, questions = get_questions_file("csci320-2191", "chapter1.txt")
     question = get_question(questions, 'chapter1.txt', 'File System')
     update_question( question, 'points', 100)
     save_changes('test.txt', obj)
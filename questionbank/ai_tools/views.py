@@ -29,7 +29,7 @@ class GenerateQuestionsView(APIView):
         # Fetch existing questions for duplicate detection
         existing_questions = []
         if course_id:
-            qs = Question.objects.filter(course_id=course_id, deleted_at__isnull=True)
+            qs = Question.objects.filter(course_id=course_id)
             if tag_name:
                 qs = qs.filter(tags__name=tag_name)
             existing_questions = list(qs.values_list('text', flat=True)[:100])  # Limit to 100 for prompt size
@@ -412,7 +412,7 @@ class GenerateVariantView(APIView):
                 points = type_points.get(output_type, original.points)
 
             # Get next variant number for this block
-            next_variant_num = (original.block.questions.count() + 1) if original.block else 1
+            next_variant_num = (Question.all_objects.filter(block=original.block).count() + 1) if original.block else 1
 
             # Create the new question
             new_question = Question.objects.create(
@@ -89,6 +89,24 @@ else:
         }
     }
 
+# Cache (access lookups, list counts and the versioned API payloads)
+# REDIS_URL shares it between processes (needs the `redis` package), CACHE_DIR
+# keeps it on disk; otherwise each process has its own in-memory cache.
+REDIS_URL = os.getenv('REDIS_URL')
+CACHE_DIR = os.getenv('CACHE_DIR')
+if REDIS_URL:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}
+    }
+elif CACHE_DIR:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': CACHE_DIR}
+    }
+else:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -128,6 +146,9 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 50,
 }
 
+# Serve the hot list endpoints from values() rows (questions/fastlist.py)
+FAST_LISTS = os.getenv('FAST_LISTS', 'True').lower() == 'true'
+
 # CORS
 CORS_ALLOWED_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000,http://127.0.0.1:8000').split(',')
 CORS_ALLOW_ALL_ORIGINS = DEBUG
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import ExamTemplate, GeneratedExam, ExamQuestion, ExamTemplateShare
 from questions.models import Tag, QuestionBank
+from questions.fastlist import ValuesSerializer
 
 
 class ExamTemplateSerializer(serializers.ModelSerializer):
@@ -50,12 +51,15 @@ class ExamTemplateSerializer(serializers.ModelSerializer):
     def get_is_owner(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.owner == request.user
+            return obj.owner_id == request.user.id
         return False
 
     def get_is_shared(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated and obj.owner != request.user:
+        if request and request.user.is_authenticated and obj.owner_id != request.user.id:
+            # Use annotated value if available (from list view)
+            if hasattr(obj, '_is_shared'):
+                return obj._is_shared
             return obj.shares.filter(shared_with=request.user).exists()
         return False
 
@@ -105,12 +109,15 @@ class ExamTemplateListSerializer(serializers.ModelSerializer):
     def get_is_owner(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.owner == request.user
+            return obj.owner_id == request.user.id
         return False
 
     def get_is_shared(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated and obj.owner != request.user:
+        if request and request.user.is_authenticated and obj.owner_id != request.user.id:
+            # Use annotated value if available (from list view)
+            if hasattr(obj, '_is_shared'):
+                return obj._is_shared
             return obj.shares.filter(shared_with=request.user).exists()
         return False
 
@@ -128,6 +135,11 @@ class GeneratedExamSerializer(serializers.ModelSerializer):
         ]
 
 
+class GeneratedExamValuesSerializer(ValuesSerializer):
+    """GeneratedExamSerializer for the exam history's values() rows (see questions/fastlist.py)"""
+    serializer_class = GeneratedExamSerializer
+
+
 class GeneratedExamDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer including question list"""
     template_name = serializers.CharField(source='template.name', read_only=True)
@@ -0,0 +1,30 @@
+"""
+Bump the per-course content version (questions/versioning.py) when exam
+templates or their shares change, so the cached template list is rebuilt.
+"""
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from questions import versioning
+from .models import ExamTemplate, ExamTemplateShare
+
+
+@receiver(post_save, sender=ExamTemplate)
+@receiver(post_delete, sender=ExamTemplate)
+def bump_template_course(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versioning.bump([instance.course_id])
+
+
+@receiver(m2m_changed, sender=ExamTemplate.filter_banks.through)
+@receiver(m2m_changed, sender=ExamTemplate.filter_tags.through)
+def bump_template_filters(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        versioning.bump([instance.course_id])
+
+
+@receiver(post_save, sender=ExamTemplateShare)
+@receiver(post_delete, sender=ExamTemplateShare)
+def bump_shared_template_course(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versioning.bump(ExamTemplate.objects.filter(pk=instance.template_id).values_list('course_id', flat=True))
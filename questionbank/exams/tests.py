@@ -1,3 +1,52 @@
-from django.test import TestCase
+from questions.models import Question
+from questions.tests import QueryBudgetTestCase
 
-# Create your tests here.
+from .models import ExamTemplate, ExamTemplateShare, GeneratedExam, ExamQuestion
+
+
+class ExamsQueryBudgetTests(QueryBudgetTestCase):
+
+    def seed(self, **kwargs):
+        super().seed(**kwargs)
+        prefix = f"R{self.rounds}"
+        for course in self.user.owned_courses.filter(code__startswith=prefix):
+            template = ExamTemplate.objects.create(name=f"{prefix} midterm", course=course, owner=self.user)
+            template.filter_banks.set(course.question_banks.all())
+            exam = GeneratedExam.objects.create(template=template, version='A', created_by=self.user)
+            for order, question in enumerate(Question.objects.filter(course=course)[:5]):
+                ExamQuestion.objects.create(exam=exam, question=question, order=order)
+
+        # A template someone else shares with the user
+        course = self.other.owned_courses.filter(code__startswith=prefix).first()
+        template = ExamTemplate.objects.create(name=f"{prefix} final", course=course, owner=self.other)
+        ExamTemplateShare.objects.create(template=template, shared_with=self.user, shared_by=self.other)
+
+    def test_template_list(self):
+        self.assertQueryBudget(6, '/api/exams/templates/')
+
+    def test_history_list(self):
+        self.assertQueryBudget(3, '/api/exams/history/')
+
+    def test_history_list_matches_serializer(self):
+        data = self.assertFastListMatches('/api/exams/history/')
+        self.assertEqual(data['count'], GeneratedExam.objects.count())
+
+    def test_recording_an_exam_refreshes_usage(self):
+        from rest_framework.test import APIRequestFactory
+        from .views import GenerateExamView
+        template = ExamTemplate.objects.filter(owner=self.user).first()
+        questions = list(Question.objects.filter(course=template.course)[:4])
+        request = APIRequestFactory().post('/api/exams/generate/')
+        request.user = self.user
+
+        GenerateExamView()._record_generated_exam(request, template.id, template.name, questions)
+
+        exam = GeneratedExam.objects.latest('created_at')
+        self.assertEqual(
+            list(exam.examquestion_set.order_by('order').values_list('question_id', flat=True)),
+            [q.id for q in questions]
+        )
+        usage = template.course.usage
+        self.assertFalse(usage.stale)
+        self.assertEqual(usage.used, 4)
+        self.assertEqual({q['id'] for q in usage.most_used}, {q.id for q in questions})
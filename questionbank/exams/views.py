@@ -5,8 +5,14 @@ from rest_framework.decorators import action
 from django.http import FileResponse, HttpResponse
 from django.conf import settings
 from .models import ExamTemplate, GeneratedExam, ExamQuestion
-from .serializers import ExamTemplateSerializer, ExamTemplateListSerializer, GeneratedExamSerializer, GeneratedExamDetailSerializer
-from questions.models import Question, Course
+from .serializers import (
+    ExamTemplateSerializer, ExamTemplateListSerializer, GeneratedExamSerializer, GeneratedExamDetailSerializer,
+    GeneratedExamValuesSerializer
+)
+from questions.models import Question, Course, CourseUsage
+from questions.access import accessible_course_ids, owned_course_ids
+from questions.versioning import VersionedListMixin, bump as bump_content_version
+from questions.fastlist import FastListMixin
 import subprocess
 import tempfile
 import os
@@ -302,7 +308,7 @@ def markdown_to_latex(text):
     return '\n'.join(result_lines)
 
 
-class ExamTemplateViewSet(viewsets.ModelViewSet):
+class ExamTemplateViewSet(VersionedListMixin, viewsets.ModelViewSet):
     queryset = ExamTemplate.objects.select_related('course').all()
     pagination_class = None  # Return all templates without pagination
 
@@ -312,19 +318,24 @@ class ExamTemplateViewSet(viewsets.ModelViewSet):
         return ExamTemplateSerializer
 
     def get_queryset(self):
-        from django.db.models import Q
+        from django.db.models import Q, Exists, OuterRef
+        from .models import ExamTemplateShare
         user = self.request.user
         if not user.is_authenticated:
             return ExamTemplate.objects.none()
 
         queryset = ExamTemplate.objects.select_related('course', 'owner').prefetch_related(
             'filter_banks', 'filter_tags'
+        ).annotate(
+            _is_shared=Exists(ExamTemplateShare.objects.filter(template=OuterRef('pk'), shared_with=user))
         )
 
         # Filter by ownership or sharing
         queryset = queryset.filter(
-            Q(owner=user) | Q(shares__shared_with=user) | Q(course__owner=user) | Q(course__shares__shared_with=user)
-        ).distinct()
+            Q(owner=user) |
+            Q(id__in=ExamTemplateShare.objects.filter(shared_with=user).values('template_id')) |
+            Q(course_id__in=accessible_course_ids(user))
+        )
 
         course = self.request.query_params.get('course')
         if course:
@@ -334,6 +345,15 @@ class ExamTemplateViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(is_quiz=is_quiz.lower() == 'true')
         return queryset.order_by('course__code', 'name')
 
+    def content_course_ids(self):
+        # Owned and directly shared templates can sit in courses the user can't otherwise see
+        from django.db.models import Q
+        from .models import ExamTemplateShare
+        user = self.request.user
+        return set(accessible_course_ids(user)) | set(ExamTemplate.objects.filter(
+            Q(owner=user) | Q(id__in=ExamTemplateShare.objects.filter(shared_with=user).values('template_id'))
+        ).values_list('course_id', flat=True))
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user, created_by=self.request.user)
 
@@ -439,9 +459,10 @@ class ExamTemplateViewSet(viewsets.ModelViewSet):
         return Response(QuestionListSerializer(queryset, many=True).data)
 
 
-class GeneratedExamViewSet(viewsets.ReadOnlyModelViewSet):
+class GeneratedExamViewSet(FastListMixin, viewsets.ReadOnlyModelViewSet):
     """View exam generation history"""
     queryset = GeneratedExam.objects.select_related('template__course', 'created_by').all()
+    fast_serializer = GeneratedExamValuesSerializer
 
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -459,8 +480,8 @@ class GeneratedExamViewSet(viewsets.ReadOnlyModelViewSet):
         ).filter(
             Q(created_by=user) |
             Q(template__owner=user) |
-            Q(template__course__owner=user)
-        ).distinct()
+            Q(template__course_id__in=owned_course_ids(user))
+        )
 
         # Filter by template
         template = self.request.query_params.get('template')
@@ -2097,20 +2118,20 @@ Answers that are not legible or not made in the space provided will result in a
             )
 
             # Link questions with ordering
-            for i, q in enumerate(questions):
-                ExamQuestion.objects.create(
-                    exam=generated,
-                    question=q,
-                    order=i + 1
-                )
+            ExamQuestion.objects.bulk_create([
+                ExamQuestion(exam=generated, question=q, order=i + 1)
+                for i, q in enumerate(questions)
+            ])
 
-            # Update question usage stats
+            # Update question usage stats and the per-course dashboard rollups
+            from django.db.models import F
             from django.utils import timezone
-            now = timezone.now()
-            for q in questions:
-                q.times_used += 1
-                q.last_used = now
-                q.save(update_fields=['times_used', 'last_used'])
+            Question.objects.filter(id__in=[q.id for q in questions]).update(
+                times_used=F('times_used') + 1, last_used=timezone.now()
+            )
+            course_ids = {q.course_id for q in questions if q.course_id}
+            CourseUsage.refresh(course_ids)
+            bump_content_version(course_ids)  # times_used shows in the question list
 
         except Exception as e:
             # Log but don't fail the exam generation
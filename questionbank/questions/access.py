@@ -0,0 +1,74 @@
+"""
+Per-user access lookup: which courses (and directly shared banks) a user
+can see, and with what permission.
+
+Resolved with one small UNION query, cached in the Django cache and
+memoized on the request's user object, so list querysets can filter on
+`course_id IN (...)` instead of OR-ing owner/share joins and paying for
+DISTINCT. The cache entry is dropped by the signals in questions/signals.py
+whenever a Course owner, CourseShare or QuestionBankShare changes; the
+timeout bounds staleness when several processes use a non-shared cache.
+"""
+from django.core.cache import cache
+from django.db.models import CharField, Value
+
+CACHE_KEY = 'access:{}'
+CACHE_TIMEOUT = 300
+
+OWNER = 'owner'
+
+
+def _load(user_id):
+    """One UNION query over owned courses, course shares and bank shares"""
+    from .models import Course, CourseShare, QuestionBankShare
+    owned = Course.objects.filter(owner_id=user_id).order_by().values_list(
+        'id', Value(OWNER, output_field=CharField()), Value('course', output_field=CharField()))
+    courses = CourseShare.objects.filter(shared_with_id=user_id).order_by().values_list(
+        'course_id', 'permission', Value('course', output_field=CharField()))
+    banks = QuestionBankShare.objects.filter(shared_with_id=user_id).order_by().values_list(
+        'bank_id', 'permission', Value('bank', output_field=CharField()))
+    access = {'courses': {}, 'banks': {}}
+    for pk, permission, kind in courses.union(banks, owned, all=True):
+        if kind == 'bank':
+            access['banks'][pk] = permission
+        elif access['courses'].get(pk) != OWNER:
+            access['courses'][pk] = permission
+    return access
+
+
+def get_access(user):
+    """{'courses': {course_id: 'owner'|'edit'|'view'}, 'banks': {bank_id: 'edit'|'view'}}"""
+    if not user.is_authenticated:
+        return {'courses': {}, 'banks': {}}
+    access = getattr(user, '_access', None)
+    if access is None:
+        key = CACHE_KEY.format(user.id)
+        access = cache.get(key)
+        if access is None:
+            access = _load(user.id)
+            cache.set(key, access, CACHE_TIMEOUT)
+        user._access = access
+    return access
+
+
+def accessible_course_ids(user):
+    """Ids of courses the user owns or that are shared with them"""
+    return list(get_access(user)['courses'])
+
+
+def owned_course_ids(user):
+    return [cid for cid, perm in get_access(user)['courses'].items() if perm == OWNER]
+
+
+def shared_bank_ids(user):
+    """Ids of banks shared directly with the user (not through their course)"""
+    return list(get_access(user)['banks'])
+
+
+def course_permission(user, course_id):
+    """'owner', 'edit', 'view', or None"""
+    return get_access(user)['courses'].get(course_id)
+
+
+def invalidate(*user_ids):
+    cache.delete_many([CACHE_KEY.format(uid) for uid in user_ids if uid])
@@ -45,6 +45,12 @@ class QuestionAdmin(admin.ModelAdmin):
         return obj.text[:50] + '...' if len(obj.text) > 50 else obj.text
     short_text.short_description = 'Question'
 
+    def get_queryset(self, request):
+        # Trashed questions too
+        queryset = Question.all_objects.get_queryset()
+        ordering = self.get_ordering(request)
+        return queryset.order_by(*ordering) if ordering else queryset
+
 
 @admin.register(QuestionVersion)
 class QuestionVersionAdmin(admin.ModelAdmin):
@@ -0,0 +1,176 @@
+"""
+Bulk question edits for POST /api/questions/bulk/.
+
+One request applies an operation set to many questions inside a single
+transaction using set-based SQL: one UPDATE for the scalar fields and one
+INSERT or DELETE on the tag through table. Questions the user can only view,
+or that an operation doesn't fit (a week or block from another course),
+are skipped and reported per item; the rest are changed.
+
+Operations:
+    add_tags / remove_tags   list of tag names (missing tags are created)
+    week / block             id, or null to clear
+    difficulty / points      new value
+    bank                     id of a bank to file the questions under (moves course too)
+    course                   course code to move the questions to
+    trash                    true to move to trash, false to restore
+
+These writes bypass save() and the post_save signals, so the search index,
+list counts, usage rollups, duplicate signatures, content versions and the
+sync tombstones of moved questions are handled here.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import access, search, versioning
+from .models import (
+    Course, CourseUsage, Question, QuestionBandKey, QuestionBank, QuestionBlock, QuestionSignature, Tag, Tombstone,
+    Week
+)
+from .pagination import invalidate_course_count
+
+OPERATIONS = {'add_tags', 'remove_tags', 'week', 'block', 'difficulty', 'points', 'bank', 'course', 'trash'}
+EDITABLE = (access.OWNER, 'edit')
+
+
+def _clean(operations):
+    """Validate the operation set; raises ValueError for anything that can't apply to any question"""
+    if not isinstance(operations, dict) or not operations:
+        raise ValueError('No operations given')
+    unknown = set(operations) - OPERATIONS
+    if unknown:
+        raise ValueError(f"Unknown operations: {', '.join(sorted(unknown))}")
+    ops = dict(operations)
+
+    for key in ('add_tags', 'remove_tags'):
+        if key in ops:
+            names = ops[key]
+            if not isinstance(names, list) or not all(isinstance(n, str) and n.strip() for n in names):
+                raise ValueError(f'{key} must be a list of tag names')
+            ops[key] = sorted({n.strip() for n in names})
+    if 'difficulty' in ops and ops['difficulty'] not in Question.Difficulty.values:
+        raise ValueError(f"Invalid difficulty: {ops['difficulty']}")
+    if 'points' in ops:
+        try:
+            ops['points'] = Decimal(str(ops['points'])).quantize(Decimal('0.01'))
+        except (InvalidOperation, ValueError):
+            raise ValueError(f"Invalid points: {ops['points']}")
+        if not Decimal(0) <= ops['points'] < Decimal(1000):
+            raise ValueError(f"Invalid points: {ops['points']}")
+    if 'trash' in ops and not isinstance(ops['trash'], bool):
+        raise ValueError('trash must be true or false')
+    if 'bank' in ops and 'course' in ops:
+        raise ValueError('Give either bank or course, not both')
+    return ops
+
+
+def _course_of(model, pk, path):
+    """Course id of a week/block/bank, or ValueError if it doesn't exist"""
+    course_id = model.objects.filter(pk=pk).values_list(path, flat=True).first()
+    if course_id is None:
+        raise ValueError(f'{model._meta.verbose_name.capitalize()} {pk} not found')
+    return course_id
+
+
+def apply(user, questions, operations, requested_ids=None):
+    """Apply `operations` to the Question queryset `questions`.
+
+    `questions` must already be limited to courses the user can see.
+    `requested_ids` (when the caller passed explicit ids) lets ids that
+    matched nothing be reported. Returns (changed ids, [{'id', 'error'}]).
+    Raises ValueError for a bad operation set and PermissionError when the
+    destination course isn't editable by the user.
+    """
+    ops = _clean(operations)
+    permissions = access.get_access(user)['courses']
+
+    target_course = bank_id = None
+    if ops.get('bank') is not None:
+        bank_id = ops['bank']
+        target_course = _course_of(QuestionBank, bank_id, 'course_id')
+    if ops.get('course') is not None:
+        target_course = Course.objects.filter(code=ops['course']).values_list('id', flat=True).first()
+        if target_course is None:
+            raise ValueError(f"Course {ops['course']} not found")
+    if target_course is not None and permissions.get(target_course) not in EDITABLE:
+        raise PermissionError('You cannot edit the destination course')
+    week_course = _course_of(Week, ops['week'], 'course_id') if ops.get('week') is not None else None
+    block_course = (
+        _course_of(QuestionBlock, ops['block'], 'question_bank__course_id') if ops.get('block') is not None else None
+    )
+
+    errors = []
+    selected = {}
+    for pk, course_id in questions.order_by().values_list('id', 'course_id'):
+        destination = target_course or course_id
+        if permissions.get(course_id) not in EDITABLE:
+            errors.append({'id': pk, 'error': 'Read-only course'})
+        elif week_course is not None and week_course != destination:
+            errors.append({'id': pk, 'error': 'Week belongs to another course'})
+        elif block_course is not None and block_course != destination:
+            errors.append({'id': pk, 'error': 'Block belongs to another course'})
+        else:
+            selected[pk] = course_id
+    if requested_ids is not None:
+        seen = set(selected) | {e['id'] for e in errors}
+        errors += [{'id': pk, 'error': 'Not found'} for pk in requested_ids if pk not in seen]
+
+    ids = list(selected)
+    if not ids:
+        return [], errors
+
+    now = timezone.now()
+    fields = {'updated_at': now}
+    for name in ('difficulty', 'points'):
+        if name in ops:
+            fields[name] = ops[name]
+    if 'week' in ops:
+        fields['week_id'] = ops['week']
+    if 'block' in ops:
+        fields['block_id'] = ops['block']
+    if 'bank' in ops:
+        fields['question_bank_id'] = bank_id
+    if target_course is not None:
+        fields['course_id'] = target_course
+    if 'trash' in ops:
+        fields['deleted_at'] = now if ops['trash'] else None
+        fields['deleted_by'] = user if ops['trash'] else None
+
+    moved = [pk for pk, course_id in selected.items() if target_course not in (None, course_id)]
+    Through = Question.tags.through
+    with transaction.atomic():
+        if moved:
+            # Weeks, blocks and banks belong to the old course
+            cleared = {k: None for k in ('week_id', 'block_id', 'question_bank_id') if k not in fields}
+            if cleared:
+                Question.all_objects.filter(id__in=moved).update(**cleared)
+            QuestionSignature.objects.filter(question_id__in=moved).update(course_id=target_course)
+            QuestionBandKey.objects.filter(question_id__in=moved).update(course_id=target_course)
+            by_course = {}
+            for pk in moved:
+                by_course.setdefault(selected[pk], []).append(pk)
+            for course_id, pks in by_course.items():
+                Tombstone.record('question', pks, course_id)
+        Question.all_objects.filter(id__in=ids).update(**fields)
+
+        if ops.get('add_tags'):
+            Tag.objects.bulk_create([Tag(name=name) for name in ops['add_tags']], ignore_conflicts=True)
+            tag_ids = list(Tag.objects.filter(name__in=ops['add_tags']).values_list('id', flat=True))
+            Through.objects.bulk_create([
+                Through(question_id=pk, tag_id=tag_id) for pk in ids for tag_id in tag_ids
+            ], ignore_conflicts=True)
+        if ops.get('remove_tags'):
+            Through.objects.filter(question_id__in=ids, tag__name__in=ops['remove_tags']).delete()
+
+        retagged = bool(ops.get('add_tags') or ops.get('remove_tags'))
+        if retagged:
+            search.index_questions(ids)
+        courses = set(selected.values()) | ({target_course} if target_course else set())
+        versioning.bump(courses, tags=retagged)
+
+    for course_id in courses:
+        invalidate_course_count(course_id)
+    CourseUsage.objects.filter(course_id__in=courses, stale=False).update(stale=True)
+    return ids, errors
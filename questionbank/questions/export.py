@@ -0,0 +1,463 @@
+"""
+Streaming export of a whole course's questions.
+
+GET /api/courses/<code>/export/<format>/ and `export_course` read the
+course's live questions through one iterator(chunk_size=EXPORT_CHUNK_SIZE)
+cursor (tags prefetched per chunk) and pass them through a format writer,
+so memory use stays flat however big the course is. A writer turns the
+questions into (path, text) parts: single-file formats give a path of None
+and go out as encoded text, archive formats are written into a zip as it
+streams, one entry per path.
+
+    csv     one row per question with all its metadata (answer_data as JSON)
+    moodle  Moodle XML, a question category per bank
+    qti     QTI 1.2 package (imsmanifest.xml + one assessment) for Canvas
+            and Blackboard; text is rendered to HTML
+    mkt     mkt's INI question pool, <code>/questionPool/<bank>, the layout
+            import_questions.py reads; each file says `format = markdown`
+            so the importer takes its text as is instead of converting
+            LaTeX. With images, their files go in <code>/images/
+
+Questions come out grouped by bank, then block and variant, so the INI
+writer can close one bank file before starting the next.
+"""
+import csv
+import itertools
+import json
+import os
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+import markdown
+from django.db.models import F
+
+from .models import Question, QuestionImage
+
+EXPORT_CHUNK_SIZE = 2000
+# Bytes gathered before a chunk is handed to the response
+STREAM_BUFFER = 64 * 1024
+
+# INI file for questions that aren't in a bank
+UNFILED_BANK = 'unfiled'
+
+
+COLUMNS = [
+    'id', 'question_bank_id', 'block_id', 'variant_number', 'question_type', 'text', 'points', 'difficulty',
+    'answer_data', 'is_bonus', 'is_required', 'quiz_only', 'exam_only', 'canonical_id', 'created_at', 'updated_at',
+]
+RELATED = {
+    'bank_name': F('question_bank__name'), 'block_name': F('block__name'),
+    'max_questions': F('block__max_questions'), 'week_number': F('week__number'),
+}
+
+
+def questions(course):
+    """The course's live questions in export order, as values() rows"""
+    return Question.objects.filter(course=course).order_by(
+        'question_bank_id', 'block_id', 'variant_number', 'id'
+    ).values(*COLUMNS, **RELATED)
+
+
+def rows(course, chunk_size=EXPORT_CHUNK_SIZE):
+    """questions() read chunk_size rows at a time, each with its sorted tag names"""
+    cursor = questions(course).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(itertools.islice(cursor, chunk_size))
+        if not chunk:
+            return
+        tags = {}
+        for question_id, name in Question.tags.through.objects.filter(
+            question_id__in=[row['id'] for row in chunk]
+        ).values_list('question_id', 'tag__name'):
+            tags.setdefault(question_id, []).append(name)
+        for row in chunk:
+            row['tags'] = sorted(tags.get(row['id'], []))
+            yield row
+
+
+def _points(value):
+    return f'{value.normalize():f}'
+
+
+class Writer:
+    """Turns a stream of questions into (path, text) parts"""
+    extension = 'txt'
+    content_type = 'text/plain'
+    archive = False
+
+    def parts(self, course, questions):
+        raise NotImplementedError
+
+    def images_dir(self, course):
+        """Where image files go in the archive; None if this format doesn't package them"""
+        return None
+
+
+class _Echo:
+    """csv.writer target that hands each row back instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+class CsvWriter(Writer):
+    extension = 'csv'
+    content_type = 'text/csv'
+    COLUMNS = [
+        'id', 'bank', 'block', 'variant_number', 'question_type', 'points', 'difficulty', 'week', 'tags',
+        'is_bonus', 'is_required', 'quiz_only', 'exam_only', 'canonical_id', 'text', 'answer_data',
+        'created_at', 'updated_at',
+    ]
+
+    def parts(self, course, questions):
+        out = csv.writer(_Echo())
+        yield None, out.writerow(self.COLUMNS)
+        for q in questions:
+            yield None, out.writerow([
+                q['id'], q['bank_name'] or '', q['block_name'] or '',
+                q['variant_number'], q['question_type'], _points(q['points']), q['difficulty'],
+                q['week_number'] or '', '; '.join(q['tags']),
+                q['is_bonus'], q['is_required'], q['quiz_only'], q['exam_only'], q['canonical_id'] or '',
+                q['text'], json.dumps(q['answer_data']), q['created_at'].isoformat(), q['updated_at'].isoformat(),
+            ])
+
+
+def _text(value, tag='text'):
+    return f'<{tag}>{escape(str(value))}</{tag}>'
+
+
+class MoodleWriter(Writer):
+    extension = 'xml'
+    content_type = 'application/xml'
+    TYPES = {
+        'multipleChoice': 'multichoice', 'trueFalse': 'truefalse', 'shortAnswer': 'shortanswer',
+        'longAnswer': 'essay', 'matching': 'matching', 'multipart': 'essay',
+    }
+
+    def parts(self, course, questions):
+        yield None, '<?xml version="1.0" encoding="UTF-8"?>\n<quiz>\n'
+        bank = object()
+        for q in questions:
+            if q['question_bank_id'] != bank:
+                bank = q['question_bank_id']
+                category = f'$course$/{course.code}/{q["bank_name"] or UNFILED_BANK}'
+                yield None, f'<question type="category"><category>{_text(category)}</category></question>\n'
+            yield None, self.question(q)
+        yield None, '</quiz>\n'
+
+    def question(self, q):
+        kind = self.TYPES.get(q['question_type'], 'essay')
+        answers = q['answer_data'] or {}
+        name = ' '.join(q["text"].split())[:60] or f'Question {q["id"]}'
+        out = [
+            f'<question type="{kind}">',
+            f'<name>{_text(name)}</name>',
+            f'<questiontext format="markdown">{_text(q["text"])}</questiontext>',
+            f'<defaultgrade>{_points(q["points"])}</defaultgrade>',
+        ]
+        if kind == 'multichoice':
+            out.append('<single>true</single><shuffleanswers>true</shuffleanswers>')
+            out.append(f'<answer fraction="100" format="markdown">{_text(answers.get("correct", ""))}</answer>')
+            out += [f'<answer fraction="0" format="markdown">{_text(w)}</answer>' for w in answers.get('wrong', [])]
+        elif kind == 'truefalse':
+            correct = answers.get('correct', True)
+            out.append(f'<answer fraction="{100 if correct else 0}">{_text("true")}</answer>')
+            out.append(f'<answer fraction="{0 if correct else 100}">{_text("false")}</answer>')
+        elif kind == 'shortanswer':
+            out.append(f'<answer fraction="100">{_text(answers.get("solution", ""))}</answer>')
+        elif kind == 'matching':
+            out.append('<shuffleanswers>true</shuffleanswers>')
+            for choice, solution in zip(answers.get('choices', []), answers.get('solutions', [])):
+                out.append(f'<subquestion format="markdown">{_text(choice)}<answer>{_text(solution)}</answer></subquestion>')
+        else:
+            out.append('<responseformat>editor</responseformat>')
+            out.append(f'<graderinfo format="markdown">{_text(answers.get("solution", ""))}</graderinfo>')
+        tags = q['tags']
+        if tags:
+            out.append('<tags>' + ''.join(f'<tag>{_text(tag)}</tag>' for tag in tags) + '</tags>')
+        out.append('</question>\n')
+        return '\n'.join(out)
+
+
+class QtiWriter(Writer):
+    extension = 'zip'
+    content_type = 'application/zip'
+    archive = True
+    TYPES = {
+        'multipleChoice': 'multiple_choice_question', 'trueFalse': 'true_false_question',
+        'shortAnswer': 'short_answer_question', 'longAnswer': 'essay_question',
+        'matching': 'matching_question', 'multipart': 'essay_question',
+    }
+
+    def __init__(self):
+        # One converter for the whole export; building one per question dominates
+        self.markdown = markdown.Markdown(extensions=['fenced_code', 'tables'])
+
+    def mattext(self, text, html=True):
+        if html:
+            text, texttype = self.markdown.reset().convert(text or ''), 'text/html'
+        else:
+            text, texttype = str(text), 'text/plain'
+        return f'<material><mattext texttype="{texttype}">{escape(text)}</mattext></material>'
+
+    def parts(self, course, questions):
+        ident = f'mkt-{course.pk}'
+        path = f'{ident}/{ident}.xml'
+        yield 'imsmanifest.xml', (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<manifest identifier="{ident}-manifest" xmlns="http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1">\n'
+            '<metadata><schema>IMS Content</schema><schemaversion>1.1.3</schemaversion></metadata>\n'
+            '<organizations/>\n<resources>\n'
+            f'<resource identifier="{ident}" type="imsqti_xmlv1p2"><file href="{path}"/></resource>\n'
+            '</resources>\n</manifest>\n'
+        )
+        yield path, (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<questestinterop xmlns="http://www.imsglobal.org/xsd/ims_qtiasiv1p2">\n'
+            f'<assessment ident="{ident}" title={quoteattr(course.name or course.code)}>\n'
+            '<section ident="root_section">\n'
+        )
+        for q in questions:
+            yield path, self.item(q)
+        yield path, '</section>\n</assessment>\n</questestinterop>\n'
+
+    def item(self, q):
+        answers = q['answer_data'] or {}
+        kind = self.TYPES.get(q['question_type'], 'essay_question')
+        out = [
+            f'<item ident="q{q["id"]}" title={quoteattr(" ".join(q["text"].split())[:60])}>',
+            '<itemmetadata><qtimetadata>'
+            f'<qtimetadatafield><fieldlabel>question_type</fieldlabel><fieldentry>{kind}</fieldentry></qtimetadatafield>'
+            f'<qtimetadatafield><fieldlabel>points_possible</fieldlabel><fieldentry>{_points(q["points"])}</fieldentry></qtimetadatafield>'
+            '</qtimetadata></itemmetadata>',
+            f'<presentation>{self.mattext(q["text"])}',
+        ]
+        conditions = []
+        if kind in ('multiple_choice_question', 'true_false_question'):
+            if kind == 'true_false_question':
+                choices = [('true', 'True'), ('false', 'False')]
+                correct = 'true' if answers.get('correct', True) else 'false'
+                html = False
+            else:
+                choices = [('a0', answers.get('correct', ''))]
+                choices += [(f'a{i + 1}', wrong) for i, wrong in enumerate(answers.get('wrong', []))]
+                correct, html = 'a0', True
+            out.append('<response_lid ident="response1" rcardinality="Single"><render_choice>')
+            out += [f'<response_label ident="{ident}">{self.mattext(text, html)}</response_label>' for ident, text in choices]
+            out.append('</render_choice></response_lid>')
+            conditions.append(('response1', correct, 'Set', 100))
+        elif kind == 'matching_question':
+            pairs = list(zip(answers.get('choices', []), answers.get('solutions', [])))
+            for i, (choice, _) in enumerate(pairs):
+                out.append(f'<response_lid ident="response_{i}">{self.mattext(choice, False)}<render_choice>')
+                out += [f'<response_label ident="m{j}">{self.mattext(solution, False)}</response_label>'
+                        for j, (_, solution) in enumerate(pairs)]
+                out.append('</render_choice></response_lid>')
+                conditions.append((f'response_{i}', f'm{i}', 'Add', round(100 / len(pairs), 2)))
+        else:
+            out.append('<response_str ident="response1" rcardinality="Single"><render_fib><response_label ident="answer1"/></render_fib></response_str>')
+            if kind == 'short_answer_question' and answers.get('solution'):
+                conditions.append(('response1', answers.get('solution', ''), 'Set', 100))
+        out.append('</presentation>')
+        out.append('<resprocessing><outcomes><decvar maxvalue="100" minvalue="0" varname="SCORE" vartype="Decimal"/></outcomes>')
+        out += [
+            f'<respcondition continue="Yes"><conditionvar><varequal respident="{respident}">{escape(str(value))}</varequal>'
+            f'</conditionvar><setvar action="{action}" varname="SCORE">{score}</setvar></respcondition>'
+            for respident, value, action, score in conditions
+        ]
+        out.append('</resprocessing>')
+        if kind == 'essay_question' and answers.get('solution'):
+            out.append(f'<itemfeedback ident="general_fb"><flow_mat>{self.mattext(answers["solution"])}</flow_mat></itemfeedback>')
+        out.append('</item>\n')
+        return '\n'.join(out)
+
+
+def _quote(value, multiline=True):
+    """`value` as a ConfigObj value (list items can't span lines or hold both kinds of quote)"""
+    value = str(value)
+    if not multiline:
+        value = ' '.join(value.splitlines())
+        if '"' in value and "'" in value:
+            value = value.replace('"', "'")
+    if '\n' not in value and '"' not in value:
+        return f'"{value}"'
+    if '\n' not in value and "'" not in value:
+        return f"'{value}'"
+    if "'''" not in value:
+        return f"'''{value}'''"
+    # Nothing quotes text holding both ''' and """; break up the second
+    return '"""' + value.replace('"""', '"" "') + '"""'
+
+
+def _list(values):
+    values = [_quote(value, multiline=False) for value in values]
+    return ', '.join(values) + (',' if len(values) == 1 else '')
+
+
+def _section(name):
+    """A section name, quoted only when ConfigObj would misread it bare"""
+    if not name or name != name.strip() or any(c in name for c in '[]#"\''):
+        return _quote(name, False)
+    return name
+
+
+def _filename(name):
+    return name.replace('/', '-').replace('\\', '-').lstrip('.') or UNFILED_BANK
+
+
+def _unique(name, used):
+    """`name`, or `name` with a suffix if it's already in `used` (ConfigObj rejects duplicate sections)"""
+    candidate, n = name, 1
+    while candidate in used:
+        n += 1
+        candidate = f'{name}_{n}'
+    used.add(candidate)
+    return candidate
+
+
+class IniWriter(Writer):
+    extension = 'zip'
+    content_type = 'application/zip'
+    archive = True
+    TYPES = {'trueFalse': 'TF', 'multipart': 'multiPart'}
+
+    def images_dir(self, course):
+        return f'{_filename(course.code)}/images'
+
+    def parts(self, course, questions):
+        files, bank, block = set(), object(), None
+        for q in questions:
+            if q['question_bank_id'] != bank:
+                bank, block, sections = q['question_bank_id'], None, set()
+                name = _unique(_filename(q['bank_name'] or UNFILED_BANK), files)
+                path = f'{_filename(course.code)}/questionPool/{name}'
+                # Tells the importer the text is Markdown, not mkt's LaTeX
+                yield path, 'format = markdown\n\n'
+            if q['block_id'] is None:
+                yield path, self.section(q, f'q{q["id"]}', sections, 1)
+                continue
+            if q['block_id'] != block:
+                block, variants = q['block_id'], set()
+                name = _section(_unique(q['block_name'], sections))
+                yield path, f'[{name}]\nmaxQuestions = {q["max_questions"]}\n\n'
+            yield path, self.section(q, str(q['variant_number']), variants, 2)
+
+    def section(self, q, name, used, depth):
+        indent = '   ' * (depth - 1)
+        answers = q['answer_data'] or {}
+        values = [
+            ('type', self.TYPES.get(q['question_type'], q['question_type'])),
+            ('points', _points(q['points'])),
+            ('question', _quote(q['text'])),
+        ]
+        if q['question_type'] == 'multipleChoice':
+            values.append(('correctAnswer', _quote(answers.get('correct', ''), False)))
+            if answers.get('wrong'):
+                values.append(('wrongAnswers', _list(answers['wrong'])))
+        elif q['question_type'] == 'trueFalse':
+            values.append(('solution', 'True' if answers.get('correct', True) else 'False'))
+        elif q['question_type'] == 'matching':
+            values.append(('choices', _list(answers.get('choices', []))))
+            values.append(('solutions', _list(answers.get('solutions', []))))
+        elif answers.get('solution'):
+            values.append(('solution', _quote(answers['solution'])))
+        for key, flag in (('bonus', q['is_bonus']), ('required', q['is_required']),
+                          ('quizOnly', q['quiz_only']), ('examOnly', q['exam_only'])):
+            if flag:
+                values.append((key, 'true'))
+        values.append(('difficulty', q['difficulty']))
+        if q['week_number'] is not None:
+            values.append(('week', q['week_number']))
+        tags = q['tags']
+        if tags:
+            values.append(('tags', _list(tags)))
+        marker = '[' * depth + _section(_unique(name, used)) + ']' * depth
+        return indent + marker + '\n' + ''.join(f'{indent}{key} = {value}\n' for key, value in values) + '\n'
+
+
+WRITERS = {
+    'csv': CsvWriter,
+    'moodle': MoodleWriter,
+    'qti': QtiWriter,
+    'mkt': IniWriter,
+}
+
+
+def filename(course, fmt):
+    return f'{_filename(course.code)}-{fmt}.{WRITERS[fmt].extension}'
+
+
+def _image_parts(course, directory):
+    """(path, bytes) parts for the image files of the course's questions"""
+    storage = QuestionImage._meta.get_field('image').storage
+    names = QuestionImage.objects.filter(
+        question__course=course, question__deleted_at__isnull=True
+    ).order_by('image').values_list('image', flat=True).distinct()
+    for name in names.iterator():
+        try:
+            f = storage.open(name, 'rb')
+        except FileNotFoundError:
+            continue
+        with f:
+            for chunk in f.chunks():
+                yield f'{directory}/{os.path.basename(name)}', chunk
+
+
+def _encode(parts):
+    buffer, size = [], 0
+    for _, text in parts:
+        data = text.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= STREAM_BUFFER:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+class _Sink:
+    """Unseekable file object for zipfile that hands back what was written to it"""
+
+    def __init__(self):
+        self.buffer, self.size = [], 0
+
+    def write(self, data):
+        self.buffer.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.buffer)
+        self.buffer, self.size = [], 0
+        return data
+
+
+def _zip(parts):
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as archive:
+        entry, current = None, None
+        for path, data in parts:
+            if path != current:
+                if entry is not None:
+                    entry.close()
+                entry, current = archive.open(path, 'w'), path
+            entry.write(data.encode() if isinstance(data, str) else data)
+            if sink.size >= STREAM_BUFFER:
+                yield sink.take()
+        if entry is not None:
+            entry.close()
+    yield sink.take()
+
+
+def stream(course, fmt, images=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """The export of `course` in format `fmt` (a WRITERS key), as an iterator of bytes"""
+    writer = WRITERS[fmt]()
+    parts = writer.parts(course, rows(course, chunk_size))
+    directory = writer.images_dir(course)
+    if images and directory:
+        parts = itertools.chain(parts, _image_parts(course, directory))
+    return _zip(parts) if writer.archive else _encode(parts)
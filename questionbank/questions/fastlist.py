@@ -0,0 +1,180 @@
+"""
+Fast path for the hot list endpoints (questions, tags, banks, generated
+exams, submissions).
+
+A ModelSerializer builds a field object graph per row and resolves every
+field through attribute lookups; on a 2000-row page that dominates the
+request once the queries are fixed. Here the same columns are read with
+values(), each row dict is converted by a plan prepared once per serializer
+class (the serializer's own fields, so formats can't drift), and method
+fields are filled per page by ValuesSerializer.extend(). The result is the
+same Python data the serializer would produce, so the JSON is identical;
+FastJSONRenderer then encodes list responses with orjson when it's
+installed.
+
+Set FAST_LISTS = False in settings to serve every list through the
+serializers (the equivalence tests and `benchmark_lists` compare the two).
+"""
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+# Fields whose to_representation() returns a column value unchanged
+_PASS_THROUGH = {
+    serializers.CharField.to_representation,
+    serializers.ChoiceField.to_representation,
+    serializers.IntegerField.to_representation,
+    serializers.BooleanField.to_representation,
+    serializers.ReadOnlyField.to_representation,
+}
+
+
+def enabled():
+    return getattr(settings, 'FAST_LISTS', True)
+
+
+class ValuesSerializer:
+    """Serializes values() rows exactly as `serializer_class` serializes instances.
+
+    Model fields and dotted sources are read from columns. Method fields and
+    nested serializers must be named in `columns` (read from an annotation)
+    or listed in `computed` and filled in by extend(), which gets the page's
+    row dicts and adds keys under the output field names; `requires` names
+    the columns a computed field needs. `hidden` columns are always
+    selected but not output; `optional` ones only when the queryset has
+    that annotation. A `fieldset` in the context (see fieldsets.py) limits
+    both the columns selected and the fields output.
+    """
+    serializer_class = None
+    columns = {}
+    computed = ()
+    requires = {}
+    hidden = ()
+    optional = ()
+
+    def __init__(self):
+        self.fields = []  # (output name, row key, converter or None)
+        for name, field in self.serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if name in self.computed:
+                self.fields.append((name, name, None))
+                continue
+            if name in self.columns:
+                key = self.columns[name]
+            elif isinstance(field, (serializers.SerializerMethodField, serializers.BaseSerializer)):
+                raise TypeError(f'{type(self).__name__}: {name} needs a column or extend()')
+            else:
+                key = field.source.replace('.', '__')
+            self.fields.append((name, key, self._converter(field)))
+
+    @staticmethod
+    def _converter(field):
+        if isinstance(field, serializers.SerializerMethodField):
+            return None  # read from the annotation it would have used
+        if isinstance(field, PrimaryKeyRelatedField) and field.pk_field is None:
+            return None  # values() already gives the pk
+        if type(field).to_representation in _PASS_THROUGH:
+            return None
+        return field.to_representation
+
+    def plan(self, fieldset=None):
+        if fieldset is None:
+            return self.fields
+        return [f for f in self.fields if f[0] in fieldset]
+
+    def values(self, queryset, fieldset=None):
+        """`queryset` as row dicts with every column the requested fields need"""
+        names = set(self.hidden)
+        for name, key, _ in self.plan(fieldset):
+            names.update(self.requires.get(name, ()) if name in self.computed else (key,))
+        # The paginator reads the sort key back from the last row
+        concrete = {f.name for f in queryset.model._meta.concrete_fields}
+        names.update(o.lstrip('-') for o in queryset.query.order_by if o.lstrip('-') in concrete)
+        names.update(name for name in self.optional if name in queryset.query.annotations)
+        return queryset.prefetch_related(None).values(*sorted(names), *queryset.query.extra_select)
+
+    def extend(self, rows, context):
+        """Add the computed fields to a page of rows"""
+
+    def to_representation(self, rows, context):
+        rows = list(rows)
+        self.extend(rows, context)
+        fields = self.plan(context.get('fieldset'))
+        data = []
+        for row in rows:
+            item = {}
+            for name, key, convert in fields:
+                value = row[key]
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes list responses with orjson when available.
+
+    Only compact, non-indented output is handed to orjson, with everything
+    it formats differently from the stdlib encoder (dates and times,
+    dataclasses) passed back to DRF's encoder. Anything orjson rejects
+    falls back to the regular renderer.
+    """
+    if orjson is not None:
+        OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        view = renderer_context.get('view')
+        if (
+            orjson is None or data is None or getattr(view, 'action', None) != 'list'
+            or not self.compact or self.ensure_ascii or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.OPTIONS)
+        except (TypeError, orjson.JSONEncodeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class FastListMixin:
+    """list() through a ValuesSerializer instead of the serializer classes.
+
+    Set `fast_serializer` to a ValuesSerializer subclass. The paginator gets
+    the values() queryset, so it must read rows by key as well as attribute.
+    """
+    fast_serializer = None
+    renderer_classes = [FastJSONRenderer] + [
+        r for r in api_settings.DEFAULT_RENDERER_CLASSES if not issubclass(r, JSONRenderer)
+    ]
+
+    _plans = {}
+
+    def get_fast_serializer(self):
+        if self.fast_serializer is None:
+            return None
+        plan = self._plans.get(self.fast_serializer)
+        if plan is None:
+            plan = self._plans[self.fast_serializer] = self.fast_serializer()
+        return plan
+
+    def list(self, request, *args, **kwargs):
+        plan = self.get_fast_serializer() if enabled() else None
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        context = self.get_serializer_context()
+        rows = plan.values(self.filter_queryset(self.get_queryset()), context.get('fieldset'))
+        page = self.paginator.paginate_queryset(rows, request, view=self) if self.paginator else None
+        data = plan.to_representation(rows if page is None else page, context)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
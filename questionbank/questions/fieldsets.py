@@ -0,0 +1,98 @@
+"""
+Sparse fieldsets for the question endpoints: ?fields=, ?expand= and ?compact=1.
+
+    ?fields=id,question_type,points   only these fields (in the serializer's order)
+    ?compact=1                        a small default set: tag ids instead of tag
+                                      objects, text cut to COMPACT_TEXT_LENGTH, and
+                                      related objects as bare ids
+    ?expand=tags,block                with compact, bring back the details of
+                                      these relations (tag objects, block name and
+                                      variants, ...)
+
+Without any of them responses are unchanged. The view builds its queryset
+from the FieldSet, so fields nobody asked for cost no joins, annotations or
+per-page queries.
+"""
+from rest_framework.exceptions import ValidationError
+
+COMPACT_TEXT_LENGTH = 200
+
+# What ?expand= brings back in compact mode, per relation
+RELATIONS = {
+    'tags': ('tags',),
+    'course': ('course_code',),
+    'bank': ('bank_name',),
+    'block': ('block_name', 'block_max_questions', 'block_variant_count', 'block_types'),
+    'week': ('week_number', 'week_name'),
+}
+
+COMPACT_FIELDS = (
+    'id', 'question_type', 'text', 'points', 'difficulty', 'tags', 'block', 'variant_number', 'week',
+    'canonical', 'linked_count', 'is_bonus', 'is_required',
+)
+
+
+def _split(value):
+    return [name.strip() for name in (value or '').split(',') if name.strip()]
+
+
+def _truthy(value):
+    return (value or '').lower() in ('1', 'true', 'yes')
+
+
+class FieldSet:
+    """The fields a request asked for, and how compact they should be"""
+
+    def __init__(self, names, compact=False, expand=()):
+        self.names = set(names)
+        self.compact = compact
+        self.expand = set(expand)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def wants(self, *names):
+        return any(name in self.names for name in names)
+
+    @property
+    def tag_ids(self):
+        """Tags as a list of ids rather than objects"""
+        return self.compact and 'tags' not in self.expand
+
+    def truncate(self, text):
+        if self.compact and text and len(text) > COMPACT_TEXT_LENGTH:
+            return text[:COMPACT_TEXT_LENGTH] + '...'
+        return text
+
+    @classmethod
+    def from_request(cls, request, serializer_class):
+        """FieldSet for `serializer_class`, or None if the request didn't ask for one.
+
+        Raises ValidationError (400) for unknown field or relation names.
+        """
+        params = request.query_params
+        fields, expand = _split(params.get('fields')), _split(params.get('expand'))
+        compact = _truthy(params.get('compact'))
+        if not (fields or expand or compact):
+            return None
+
+        readable = [
+            name for name, field in serializer_class().fields.items() if not field.write_only
+        ]
+        errors = {}
+        unknown = [name for name in fields if name not in readable]
+        if unknown:
+            errors['fields'] = f"Unknown fields: {', '.join(unknown)}"
+        unknown = [name for name in expand if name not in RELATIONS]
+        if unknown:
+            errors['expand'] = f"Unknown relations: {', '.join(unknown)} (expected {', '.join(RELATIONS)})"
+        if errors:
+            raise ValidationError(errors)
+
+        if fields:
+            names = fields
+        elif compact:
+            names = list(COMPACT_FIELDS) + [name for rel in expand for name in RELATIONS[rel]]
+        else:
+            names = readable
+        return cls([name for name in names if name in readable], compact, expand)
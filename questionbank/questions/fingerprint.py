@@ -0,0 +1,81 @@
+"""
+Near-duplicate detection for question text.
+
+normalize() strips LaTeX, Markdown, punctuation, case and whitespace so
+cosmetic edits don't change a question's `fingerprint`.  minhash() turns the
+normalized text's word shingles into a fixed-size signature whose agreement
+rate estimates Jaccard similarity; band_keys() splits it into LSH bands so
+candidate duplicates are found by an indexed lookup on QuestionBandKey
+instead of comparing every pair.
+
+With 64 hashes in 16 bands of 4, pairs at 0.8 similarity share a band
+99.9% of the time and pairs at 0.3 about 12% of the time; candidates are
+then checked against SIMILARITY_THRESHOLD using the full signatures.
+"""
+import hashlib
+import random
+import re
+import struct
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+SHINGLE_SIZE = 3
+SIMILARITY_THRESHOLD = 0.8
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240501)
+_COEFFS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+
+_LATEX_ENV = re.compile(r'\\(?:begin|end)\{[^}]*\}')
+_LATEX_CMD = re.compile(r'\\[a-zA-Z]+\*?|\\.')
+_MD_IMAGE = re.compile(r'!\[[^\]]*\]\([^)]*\)')
+_MD_LINK = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+_NON_WORD = re.compile(r'[^\w]+')
+
+
+def normalize(text):
+    """Lowercased words of `text` with LaTeX/Markdown markup and punctuation removed"""
+    text = _MD_IMAGE.sub(' ', text or '')
+    text = _MD_LINK.sub(r'\1', text)
+    text = _LATEX_ENV.sub(' ', text)
+    text = _LATEX_CMD.sub(' ', text)
+    text = _NON_WORD.sub(' ', text.lower()).replace('_', ' ')
+    return ' '.join(text.split())
+
+
+def fingerprint(text):
+    return hashlib.md5(normalize(text).encode()).hexdigest()
+
+
+def _shingles(normalized):
+    words = normalized.split()
+    if len(words) <= SHINGLE_SIZE:
+        return {normalized}
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    """MinHash signature (list of NUM_HASHES ints) of the normalized text"""
+    hashes = [
+        struct.unpack('<Q', hashlib.blake2b(s.encode(), digest_size=8).digest())[0]
+        for s in _shingles(normalize(text))
+    ]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _COEFFS]
+
+
+def band_keys(signature):
+    """One short key per LSH band; questions sharing any key are candidates"""
+    keys = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS:(band + 1) * ROWS]
+        digest = hashlib.blake2b(repr(rows).encode(), digest_size=6).hexdigest()
+        keys.append(f'{band:02d}{digest}')
+    return keys
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    if not sig_a or not sig_b:
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
@@ -0,0 +1,182 @@
+"""
+Delta-compressed question version history.
+
+A QuestionVersion holds a question's text and answer_data as they were
+before an edit (or a propagation from its canonical question). Storing a
+full copy per version lets often-edited long answers pile up, so most
+versions hold only a delta against the version before them:
+
+    delta = {'text': ops, 'answer_data': ops}   (unchanged fields left out)
+    ops   = [[start, end, [tokens]], ...]       replace tokens[start:end]
+
+Text is split into word tokens (a word plus the whitespace after it);
+answer_data is diffed as its JSON text. Every SNAPSHOT_EVERY versions, and
+whenever a delta wouldn't be less than half the size of the content, a
+full snapshot is stored instead, so rebuilding any version reads about
+SNAPSHOT_EVERY rows in one query and applies the deltas after the nearest
+snapshot (older ones, if later snapshots were removed).
+
+`version_storage` reports how much space this saves and compacts history
+written before it.
+"""
+import json
+import re
+from difflib import SequenceMatcher
+
+from django.db.models import OuterRef, Subquery
+
+from .models import QuestionVersion
+
+SNAPSHOT_EVERY = 10
+
+_TOKEN = re.compile(r'\S+\s*|\s+')
+
+
+def _tokens(text):
+    return _TOKEN.findall(text)
+
+
+def _dump(answer_data):
+    return json.dumps(answer_data, indent=1)
+
+
+def diff(old, new):
+    """Edits turning the string `old` into `new`"""
+    a, b = _tokens(old), _tokens(new)
+    return [
+        [i1, i2, b[j1:j2]]
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+        if tag != 'equal'
+    ]
+
+
+def patch(old, ops):
+    """Apply diff() output to `old`"""
+    a = _tokens(old)
+    out, pos = [], 0
+    for start, end, tokens in ops:
+        out += a[pos:start]
+        out += tokens
+        pos = end
+    out += a[pos:]
+    return ''.join(out)
+
+
+def size(text, answer_data):
+    """Bytes of a version's full content"""
+    return len(text.encode()) + len(_dump(answer_data).encode())
+
+
+def stored_size(row):
+    """Bytes a (is_snapshot, text, answer_data, delta) row keeps of its content"""
+    is_snapshot, text, answer_data, delta = row
+    if is_snapshot:
+        return size(text, answer_data)
+    return len(json.dumps(delta).encode())
+
+
+def apply(content, row):
+    """Content of `row` given the content of the version before it"""
+    is_snapshot, text, answer_data, delta = row
+    if is_snapshot:
+        return text, answer_data
+    text, answer_data = content
+    if 'text' in delta:
+        text = patch(text, delta['text'])
+    if 'answer_data' in delta:
+        answer_data = json.loads(patch(_dump(answer_data), delta['answer_data']))
+    return text, answer_data
+
+
+def content(question_id, number):
+    """(text, answer_data) of version `number` of a question, or None if there's no such version"""
+    snapshot = QuestionVersion.objects.filter(
+        question_id=question_id, is_snapshot=True, version_number__lte=number
+    ).order_by('-version_number').values('version_number')[:1]
+    rows = list(
+        QuestionVersion.objects.filter(
+            question_id=question_id, version_number__lte=number, version_number__gte=Subquery(snapshot)
+        ).order_by('version_number').values_list('version_number', 'is_snapshot', 'text', 'answer_data', 'delta')
+    )
+    # Deltas can only be replayed from their snapshot through every version in between
+    if not rows or [row[0] for row in rows] != list(range(rows[0][0], number + 1)):
+        return None
+    state = None
+    for row in rows:
+        state = apply(state, row[1:])
+    return state
+
+
+def latest(question_ids):
+    """{question id: (latest version number, its snapshot's number, (text, answer_data))} in one query"""
+    snapshot = QuestionVersion.objects.filter(
+        question=OuterRef('question'), is_snapshot=True
+    ).order_by('-version_number').values('version_number')[:1]
+    rows = QuestionVersion.objects.filter(
+        question_id__in=question_ids, version_number__gte=Subquery(snapshot)
+    ).order_by('question_id', 'version_number').values_list(
+        'question_id', 'version_number', 'is_snapshot', 'text', 'answer_data', 'delta'
+    )
+    states = {}
+    for question_id, number, *row in rows:
+        _, snapshot_number, state = states.get(question_id, (None, number, None))
+        if row[0]:
+            snapshot_number = number
+        states[question_id] = (number, snapshot_number, apply(state, row))
+    return states
+
+
+def build(question_id, number, text, answer_data, previous=None, **fields):
+    """Unsaved QuestionVersion `number` holding this content.
+
+    `previous` is latest()'s entry for the question; without it (or when
+    it's time for one) the version is a full snapshot.
+    """
+    version = QuestionVersion(
+        question_id=question_id, version_number=number, size=size(text, answer_data), **fields
+    )
+    if previous is not None and number - previous[1] < SNAPSHOT_EVERY:
+        old_text, old_answer_data = previous[2]
+        delta = {}
+        if text != old_text:
+            delta['text'] = diff(old_text, text)
+        if answer_data != old_answer_data:
+            delta['answer_data'] = diff(_dump(old_answer_data), _dump(answer_data))
+        if len(json.dumps(delta)) * 2 < version.size:
+            version.is_snapshot = False
+            version.delta = delta
+            return version
+    version.is_snapshot = True
+    version.text = text
+    version.answer_data = answer_data
+    return version
+
+
+def record(entries, created_by=None, change_summary=''):
+    """Save a new version for each (question id, text, answer_data) with one bulk_create"""
+    entries = list(entries)
+    states = latest([question_id for question_id, _, _ in entries])
+    versions = []
+    for question_id, text, answer_data in entries:
+        previous = states.get(question_id)
+        number = previous[0] + 1 if previous else 1
+        versions.append(build(
+            question_id, number, text, answer_data, previous,
+            created_by=created_by, change_summary=change_summary,
+        ))
+    return QuestionVersion.objects.bulk_create(versions)
+
+
+def compact(question_id):
+    """Rewrite a question's history as snapshots and deltas; returns the versions changed"""
+    rows = list(QuestionVersion.objects.filter(question_id=question_id).order_by('version_number'))
+    changed, state, previous = [], None, None
+    for row in rows:
+        state = apply(state, (row.is_snapshot, row.text, row.answer_data, row.delta))
+        version = build(question_id, row.version_number, *state, previous)
+        previous = (row.version_number, row.version_number if version.is_snapshot else previous[1], state)
+        if version.is_snapshot != row.is_snapshot or version.delta != row.delta:
+            version.pk = row.pk
+            changed.append(version)
+    QuestionVersion.objects.bulk_update(changed, ['is_snapshot', 'text', 'answer_data', 'delta', 'size'])
+    return len(changed)
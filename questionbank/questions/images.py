@@ -0,0 +1,229 @@
+"""
+Question image uploads: content-addressed storage, renditions and orphan
+collection.
+
+An upload is stored under its SHA-256 (question_images/ab/abcd....png), so
+the same diagram uploaded again reuses the stored file and its renditions
+instead of writing another copy; each upload still gets its own
+QuestionImage row for its question, alt text and caption. The renditions
+are generated once per file, under question_images/renditions/<sha>/:
+
+    thumb   WebP, at most THUMB_SIZE px, for the SPA's image gallery
+    web     WebP, at most WEB_SIZE px wide, embedded in question text
+    print   PNG on white, at most PRINT_SIZE px, for LaTeX/PDF output
+
+Animated GIFs are rendered from their first frame. Uploads made before a
+question exists are orphans until the question is saved; `process_images`
+deletes the ones no question text refers to after ORPHAN_TTL, and
+backfills hashes and renditions for images uploaded before this module.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .models import Question, QuestionImage
+
+ALLOWED_TYPES = ['image/jpeg', 'image/png', 'image/gif', 'image/webp']
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}
+
+THUMB_SIZE = 320
+WEB_SIZE = 1600
+PRINT_SIZE = 2400
+ORPHAN_TTL = timedelta(hours=24)
+
+RENDITIONS = {
+    # kind: (file name, Pillow format, max (width, height), save options)
+    'thumb': ('thumb.webp', 'WEBP', (THUMB_SIZE, THUMB_SIZE), {'quality': 80, 'method': 6}),
+    'web': ('web.webp', 'WEBP', (WEB_SIZE, WEB_SIZE * 4), {'quality': 85, 'method': 6}),
+    'print': ('print.png', 'PNG', (PRINT_SIZE, PRINT_SIZE), {'optimize': True}),
+}
+
+
+def _storage():
+    return QuestionImage._meta.get_field('image').storage
+
+
+def _hash(upload):
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def _open(f):
+    """The image in `f`; ValueError if it isn't one Pillow can read"""
+    try:
+        image = Image.open(f)
+        image.load()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise ValueError('Not a valid image file')
+    if image.format not in EXTENSIONS:
+        raise ValueError('Invalid file type. Use JPEG, PNG, GIF, or WebP.')
+    return image
+
+
+def _render(image, fmt, size, options):
+    image = ImageOps.exif_transpose(image)
+    if fmt == 'PNG' or image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    if fmt == 'PNG':
+        # Flattened on white for print
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    image.thumbnail(size, Image.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, fmt, **options)
+    return out.getvalue()
+
+
+def rendition_name(sha, kind):
+    return f'question_images/renditions/{sha}/{RENDITIONS[kind][0]}'
+
+
+def render(image_row, image=None):
+    """Generate the renditions `image_row` is missing; returns the kinds written"""
+    storage = _storage()
+    written = []
+    for kind, (_, fmt, size, options) in RENDITIONS.items():
+        name = rendition_name(image_row.sha256, kind)
+        if not storage.exists(name):
+            if image is None:
+                with image_row.image.open('rb') as f:
+                    image = _open(f)
+            storage.save(name, ContentFile(_render(image, fmt, size, options)))
+            written.append(kind)
+        image_row.renditions[kind] = name
+    return written
+
+
+def save_upload(upload, **fields):
+    """A QuestionImage for an uploaded file, stored once per content hash.
+
+    Raises ValueError for files that aren't a supported image.
+    """
+    if upload.content_type not in ALLOWED_TYPES:
+        raise ValueError('Invalid file type. Use JPEG, PNG, GIF, or WebP.')
+    sha = _hash(upload)
+    existing = QuestionImage.objects.filter(sha256=sha).exclude(renditions={}).first()
+    if existing is not None:
+        return QuestionImage.objects.create(
+            image=existing.image.name, sha256=sha, width=existing.width, height=existing.height,
+            renditions=existing.renditions, **fields
+        )
+
+    image = _open(upload)
+    upload.seek(0)
+    storage = _storage()
+    name = f'question_images/{sha[:2]}/{sha}{EXTENSIONS[image.format]}'
+    if not storage.exists(name):
+        name = storage.save(name, upload)
+    row = QuestionImage(image=name, sha256=sha, width=image.width, height=image.height, **fields)
+    render(row, image)
+    row.save()
+    return row
+
+
+def delete_files(files, checked=False):
+    """Remove stored (name, sha256) files and renditions no image row uses any more.
+
+    Files some question's text or answers still embed (a clone's, a linked
+    copy's, pasted markdown) are kept too, unless `checked` says the caller
+    has already looked. Returns how many original files went.
+    """
+    files = set(files)
+    storage = _storage()
+    used_names, used_shas = set(), set()
+    rows = QuestionImage.objects.filter(
+        Q(image__in=[name for name, _ in files]) | Q(sha256__in=[sha for _, sha in files if sha])
+    )
+    for name, sha in rows.values_list('image', 'sha256'):
+        used_names.add(name)
+        used_shas.add(sha)
+    if not checked:
+        referenced = _referenced({key for name, sha in files for key in _keys(name, sha)})
+        for name, sha in files:
+            if not referenced.isdisjoint(_keys(name, sha)):
+                used_names.add(name)
+                used_shas.add(sha)
+    deleted = 0
+    for name, sha in files:
+        if name and name not in used_names and storage.exists(name):
+            storage.delete(name)
+            deleted += 1
+        if sha and sha not in used_shas:
+            for kind in RENDITIONS:
+                if storage.exists(rendition_name(sha, kind)):
+                    storage.delete(rendition_name(sha, kind))
+    return deleted
+
+
+def _keys(name, sha):
+    """What question text refers to a stored file by: its hash and its file name"""
+    return [key for key in (sha, os.path.basename(name or '')) if key]
+
+
+def _referenced(keys, chunk_size=2000):
+    """The `keys` (hashes or file names) that some question's text or answers mention.
+
+    One pass over the question table, however many keys there are.
+    """
+    keys = set(keys)
+    if not keys:
+        return set()
+    pattern = re.compile('|'.join(re.escape(key) for key in sorted(keys, key=len, reverse=True)))
+    found = set()
+    rows = Question.all_objects.values_list('text', 'answer_data').order_by()
+    for text, answer_data in rows.iterator(chunk_size=chunk_size):
+        found.update(pattern.findall(text))
+        if answer_data:
+            found.update(pattern.findall(json.dumps(answer_data, ensure_ascii=False)))
+        if found >= keys:
+            break
+    return found
+
+
+def collect_orphans(now=None):
+    """Delete orphan uploads older than ORPHAN_TTL that no question refers to.
+
+    Returns (rows deleted, files deleted).
+    """
+    cutoff = (now or timezone.now()) - ORPHAN_TTL
+    orphans = [
+        (pk, name, sha, _keys(name, sha))
+        for pk, name, sha in QuestionImage.objects.filter(
+            question__isnull=True, created_at__lt=cutoff).values_list('id', 'image', 'sha256')
+    ]
+    referenced = _referenced({key for *_, keys in orphans for key in keys})
+    doomed = [(pk, name, sha) for pk, name, sha, keys in orphans if keys and referenced.isdisjoint(keys)]
+    if not doomed:
+        return 0, 0
+    QuestionImage.objects.filter(id__in=[pk for pk, _, _ in doomed]).delete()
+    return len(doomed), delete_files([(name, sha) for _, name, sha in doomed], checked=True)
+
+
+def backfill(batch_size=100):
+    """Hash and render images stored before uploads were content-addressed; returns how many"""
+    done = 0
+    for row in QuestionImage.objects.filter(renditions={}).iterator(chunk_size=batch_size):
+        try:
+            with row.image.open('rb') as f:
+                row.sha256 = hashlib.sha256(f.read()).hexdigest()
+                f.seek(0)
+                image = _open(f)
+                row.width, row.height = image.width, image.height
+                render(row, image)
+        except (ValueError, FileNotFoundError):
+            continue
+        row.save(update_fields=['sha256', 'width', 'height', 'renditions'])
+        done += 1
+    return done
@@ -0,0 +1,544 @@
+"""
+Bulk import of mkt question pools into a course.
+
+An import reads a directory or zip (such as a course directory of the old
+mkt repository, or the mkt format of questions/export.py) and picks out
+the pool files:
+
+    .../questionPool/<bank>     a bank per file (as import_questions.py did)
+    <course>/<bank>             a bank per file too: files beside a
+                                questionPool or quizPool directory, or at
+                                the top of an imported directory
+    .../quizPool/<name>.txt     all in the quizPool bank, tagged with the
+                                file ("week3.txt": tag "Week 3", week 3),
+                                as import_quiz_pool.py did
+
+In all of them, a [section] holding maxQuestions or [[n]] variants becomes
+a block. Text is converted from mkt's LaTeX to Markdown, except in files
+questions/export.py wrote (`format = markdown`), which hold it as stored. Each file is keyed by its path from the course directory plus its
+SHA-256 (ImportedFile): files imported before with the same hash are
+skipped, so re-running an import changes nothing and a crashed job can
+run again. A changed file only adds the questions its bank doesn't already
+have (same content_hash); its tags are added to the ones it has.
+
+Changed files are parsed IMPORT_FILE_BATCH at a time in a process pool
+(ConfigObj is pure Python) and each batch is written in one transaction:
+banks, blocks, tags and weeks are resolved through dictionaries loaded
+once per run, and questions and their tag rows go in with bulk_create.
+The bookkeeping post_save would do (search index, list counts, usage
+rollups, content versions) runs once per batch; near-duplicate signatures
+are left to `cluster_duplicates`, as for bank copies. Progress is saved on
+the ImportJob after every batch.
+"""
+import hashlib
+import os
+import re
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import search, versioning
+from .fingerprint import fingerprint
+from .models import CourseUsage, ImportedFile, ImportJob, Question, QuestionBank, QuestionBlock, Tag, Week
+from .pagination import invalidate_course_count
+
+try:
+    from configobj import ConfigObj
+except ImportError:  # mkt's own copy, beside questionbank/ in the repository
+    sys.path.insert(0, os.path.dirname(str(settings.BASE_DIR)))
+    from configobj import ConfigObj
+
+IMPORT_FILE_BATCH = 50
+IMPORT_WORKERS = min(4, os.cpu_count() or 1)
+# Pool files are text; anything bigger is not one
+MAX_FILE_SIZE = 5 * 1024 * 1024
+
+QUESTION_POOL = 'questionPool'
+QUIZ_POOL = 'quizPool'
+# Extensions dropped from pool file names to get the bank name
+POOL_EXTENSIONS = ('.ini', '.txt', '.cfg')
+
+
+def latex_to_markdown(text):
+    """Convert common LaTeX constructs to Markdown"""
+    if not text:
+        return text
+
+    # Handle lstlisting code blocks
+    def replace_lstlisting(match):
+        code = match.group(1).strip()
+        return f'```\n{code}\n```'
+
+    text = re.sub(r'\\begin\{lstlisting\}(.*?)\\end\{lstlisting\}', replace_lstlisting, text, flags=re.DOTALL)
+
+    # Handle verbatim blocks
+    text = re.sub(r'\\begin\{verbatim\}(.*?)\\end\{verbatim\}',
+                  lambda m: f'```\n{m.group(1).strip()}\n```', text, flags=re.DOTALL)
+
+    # Handle itemize lists
+    def replace_itemize(match):
+        content = match.group(1)
+        items = re.findall(r'\\item\s*(.*?)(?=\\item|$)', content, flags=re.DOTALL)
+        md_items = '\n'.join(f'- {item.strip()}' for item in items if item.strip())
+        return '\n\n' + md_items  # Add blank line before list for proper Markdown
+
+    text = re.sub(r'\\begin\{itemize\}(.*?)\\end\{itemize\}', replace_itemize, text, flags=re.DOTALL)
+
+    # Handle enumerate lists
+    def replace_enumerate(match):
+        content = match.group(1)
+        items = re.findall(r'\\item\s*(.*?)(?=\\item|$)', content, flags=re.DOTALL)
+        md_items = '\n'.join(f'{i+1}. {item.strip()}' for i, item in enumerate(items) if item.strip())
+        return '\n\n' + md_items  # Add blank line before list for proper Markdown
+
+    text = re.sub(r'\\begin\{enumerate\}(.*?)\\end\{enumerate\}', replace_enumerate, text, flags=re.DOTALL)
+
+    # Handle images - convert to markdown image syntax
+    text = re.sub(r'\\includegraphics\[.*?\]\{(.*?)\}', r'![Image](\1)', text)
+
+    # Handle texttt (monospace)
+    text = re.sub(r'\\texttt\{([^}]*)\}', r'`\1`', text)
+
+    # Handle textbf (bold)
+    text = re.sub(r'\\textbf\{([^}]*)\}', r'**\1**', text)
+
+    # Handle textit (italic)
+    text = re.sub(r'\\textit\{([^}]*)\}', r'*\1*', text)
+
+    # Handle emph (italic)
+    text = re.sub(r'\\emph\{([^}]*)\}', r'*\1*', text)
+
+    # Handle underline (markdown doesn't have underline, use bold)
+    text = re.sub(r'\\underline\{([^}]*)\}', r'**\1**', text)
+
+    # Handle line breaks
+    text = text.replace('\\\\', '  \n')
+
+    # Handle special characters
+    text = text.replace('\\#', '#')
+    text = text.replace('\\$', '$')
+    text = text.replace('\\%', '%')
+    text = text.replace('\\&', '&')
+    text = text.replace('\\_', '_')
+    text = text.replace('\\{', '{')
+    text = text.replace('\\}', '}')
+    text = text.replace('\\textbackslash', '\\')
+
+    # Handle quotes
+    text = text.replace('``', '"')
+    text = text.replace("''", '"')
+
+    # Handle horizontal space commands (just remove them)
+    text = re.sub(r'\\hspace\{[^}]*\}', ' ', text)
+    text = re.sub(r'\\vspace\{[^}]*\}', '', text)
+
+    # Clean up any remaining simple LaTeX commands (but not backslash escapes)
+    text = re.sub(r'\\[a-zA-Z]+(?:\{[^}]*\})?', '', text)
+
+    # Clean up extra whitespace
+    text = re.sub(r'\n{3,}', '\n\n', text)
+
+    return text.strip()
+
+
+def parse_question_type(qtype):
+    """Map old question types to new ones"""
+    type_map = {
+        'multiplechoice': 'multipleChoice',
+        'tf': 'trueFalse',
+        'shortanswer': 'shortAnswer',
+        'longanswer': 'longAnswer',
+        'matching': 'matching',
+        'multipart': 'multipart',
+    }
+    return type_map.get(qtype.lower(), qtype)
+
+
+def _markdown(value, markdown=False):
+    """A legacy LaTeX value as Markdown; files export.py wrote (format = markdown) already are"""
+    if markdown:
+        return value
+    return latex_to_markdown(value.strip('"\''))
+
+
+def parse_answer_data(qtype, data, markdown=False):
+    """Extract answer data based on question type"""
+    qtype = qtype.lower()
+    answer_data = {}
+
+    if qtype == 'multiplechoice':
+        correct = data.get('correctAnswer', '')
+        if isinstance(correct, list):
+            correct = correct[0] if correct else ''
+        answer_data['correct'] = _markdown(correct, markdown) if isinstance(correct, str) else correct
+
+        wrong = data.get('wrongAnswers', [])
+        if isinstance(wrong, str):
+            wrong = [wrong]
+        answer_data['wrong'] = [_markdown(w, markdown) for w in wrong]
+
+    elif qtype == 'tf' or qtype == 'truefalse':
+        solution = data.get('solution', 'true')
+        if isinstance(solution, str):
+            answer_data['correct'] = solution.lower() == 'true'
+        else:
+            answer_data['correct'] = bool(solution)
+
+    elif qtype in ['shortanswer', 'longanswer']:
+        # Try 'solution' first, then 'solutions' (both are used in source files)
+        solution = data.get('solution', '') or data.get('solutions', '')
+        if isinstance(solution, list):
+            solution = '\n'.join(solution)
+        answer_data['solution'] = _markdown(solution if isinstance(solution, str) else str(solution), markdown)
+
+    elif qtype == 'matching':
+        choices = data.get('choices', [])
+        solutions = data.get('solutions', [])
+        if isinstance(choices, str):
+            choices = [choices]
+        if isinstance(solutions, str):
+            solutions = [solutions]
+        answer_data['choices'] = [_markdown(c, markdown) for c in choices]
+        answer_data['solutions'] = [_markdown(s, markdown) for s in solutions]
+
+    return answer_data
+
+
+def _points(value, default):
+    try:
+        return Decimal(str(float(value))).quantize(Decimal('0.01'))
+    except (TypeError, ValueError, InvalidOperation):
+        return Decimal(default)
+
+
+def _question(values, block=None, max_questions=1, variant=1, default_points=2, markdown=False):
+    """One question's fields from its ConfigObj section"""
+    text = values.get('question', '')
+    if isinstance(text, list):
+        text = '\n'.join(text)
+    qtype = parse_question_type(values.get('type', 'shortAnswer'))
+    tags = values.get('tags', [])
+    difficulty = values.get('difficulty', Question.Difficulty.MEDIUM)
+    week = str(values.get('week', ''))
+    return {
+        'block': block[:200] if block else None,
+        'max_questions': max_questions,
+        'variant_number': variant,
+        'question_type': qtype,
+        'text': _markdown(text, markdown),
+        'points': _points(values.get('points', values.get('point', default_points)), default_points),
+        'answer_data': parse_answer_data(qtype, values, markdown),
+        'difficulty': difficulty if difficulty in Question.Difficulty.values else Question.Difficulty.MEDIUM,
+        'is_bonus': str(values.get('bonus', 'false')).lower() == 'true',
+        'is_required': str(values.get('required', 'false')).lower() == 'true',
+        'quiz_only': str(values.get('quizOnly', 'false')).lower() == 'true',
+        'exam_only': str(values.get('examOnly', 'false')).lower() == 'true',
+        'tags': [tags] if isinstance(tags, str) else list(tags),
+        'week': int(week) if week.isdigit() else None,
+    }
+
+
+def parse(key, data):
+    """(questions, error) for the pool file `key`; runs in a worker process"""
+    pool, _, name = key.rpartition('/')
+    try:
+        config = ConfigObj(data.decode('utf-8', errors='replace').splitlines(), interpolation=False)
+    except Exception as e:
+        return [], f'{type(e).__name__}: {e}'
+
+    # Exported by questions/export.py: the text is Markdown as stored, not LaTeX
+    markdown = config.get('format') == 'markdown'
+    quiz = pool == QUIZ_POOL
+    prefix = f'{pool_name(name)}: ' if quiz else ''
+    default_points = 1 if quiz else 2
+    questions = []
+    for section, values in config.items():
+        if not isinstance(values, dict):
+            continue
+        variants = [(k, v) for k, v in values.items() if isinstance(v, dict) and 'question' in v]
+        if 'maxQuestions' in values or (variants and 'question' not in values):
+            try:
+                max_questions = int(values.get('maxQuestions') or 1)
+            except (TypeError, ValueError):
+                max_questions = 1
+            for position, (subkey, subvalues) in enumerate(variants, 1):
+                variant = int(subkey) if subkey.isdigit() else position
+                questions.append(_question(
+                    subvalues, prefix + section, max_questions, variant, default_points, markdown))
+        elif 'question' in values:
+            questions.append(_question(values, default_points=default_points, markdown=markdown))
+    return questions, None
+
+
+def pool_name(name):
+    """A pool file's name without a known extension"""
+    base, ext = os.path.splitext(name)
+    return base if ext.lower() in POOL_EXTENSIONS else name
+
+
+def _file_tag(key):
+    """(tag name, week number) a quizPool file gives its questions"""
+    pool, _, name = key.rpartition('/')
+    if pool != QUIZ_POOL:
+        return None, None
+    base = pool_name(name)
+    match = re.fullmatch(r'week\s*(\d+)', base, re.IGNORECASE)
+    if match:
+        return f'Week {int(match.group(1))}', int(match.group(1))
+    return base, None
+
+
+def _key(parts, course_dir=False):
+    """A pool file's key from its path parts, None for anything else.
+
+    `course_dir`: the file is directly in a course directory, so it's a bank.
+    """
+    if not parts or '__MACOSX' in parts or parts[-1].startswith('.'):
+        return None
+    if course_dir:
+        return parts[-1]
+    if len(parts) < 2:
+        return None
+    pool, name = parts[-2], parts[-1]
+    if pool == QUESTION_POOL or (pool == QUIZ_POOL and name.endswith('.txt')):
+        return f'{pool}/{name}'
+    return None
+
+
+class _Directory:
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+
+    def files(self):
+        base = os.path.dirname(self.path)
+        for dirpath, dirnames, filenames in os.walk(self.path):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+            course_dir = dirpath == self.path or bool({QUESTION_POOL, QUIZ_POOL} & set(dirnames))
+            for name in sorted(filenames):
+                path = os.path.join(dirpath, name)
+                key = _key(os.path.relpath(path, base).split(os.sep), course_dir)
+                if key:
+                    yield key, path, os.path.getsize(path)
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def close(self):
+        pass
+
+
+class _Zip:
+    def __init__(self, f):
+        self.zip = zipfile.ZipFile(f)
+
+    def files(self):
+        infos = sorted(self.zip.infolist(), key=lambda info: info.filename)
+        # Directories holding a questionPool or quizPool
+        courses = {
+            tuple(parts[:i]) for parts in (info.filename.split('/') for info in infos)
+            for i, part in enumerate(parts[:-1]) if part in (QUESTION_POOL, QUIZ_POOL)
+        }
+        for info in infos:
+            if not info.is_dir():
+                parts = info.filename.split('/')
+                key = _key(parts, tuple(parts[:-1]) in courses)
+                if key:
+                    yield key, info, info.file_size
+
+    def read(self, info):
+        return self.zip.read(info)
+
+    def close(self):
+        self.zip.close()
+
+
+def _open(job):
+    if job.archive:
+        return _Zip(job.archive.open('rb'))
+    if os.path.isdir(job.source):
+        return _Directory(job.source)
+    return _Zip(job.source)
+
+
+class _Cache:
+    """The course's banks, blocks and weeks, and tags by name, looked up once per run"""
+
+    def __init__(self, course, user):
+        self.course, self.user = course, user
+        self.banks = dict(QuestionBank.objects.filter(course=course).values_list('name', 'id'))
+        self.blocks = {
+            (bank_id, name): pk for pk, bank_id, name in QuestionBlock.objects.filter(
+                question_bank__course=course).values_list('id', 'question_bank_id', 'name')
+        }
+        self.weeks = dict(Week.objects.filter(course=course).values_list('number', 'id'))
+        self.tags = {}
+
+    def bank(self, name):
+        name = name[:200]
+        if name not in self.banks:
+            self.banks[name] = QuestionBank.objects.create(course=self.course, name=name, owner=self.user).id
+        return self.banks[name]
+
+    def resolve(self, blocks, tags, weeks):
+        """Create what's missing of {(bank id, block name): max_questions}, tag names and week numbers"""
+        missing = {key: n for key, n in blocks.items() if key not in self.blocks}
+        if missing:
+            QuestionBlock.objects.bulk_create([
+                QuestionBlock(question_bank_id=bank_id, name=name, max_questions=n)
+                for (bank_id, name), n in missing.items()
+            ], ignore_conflicts=True)
+            self.blocks.update({
+                (bank_id, name): pk for pk, bank_id, name in QuestionBlock.objects.filter(
+                    question_bank_id__in={bank_id for bank_id, _ in missing}, name__in={name for _, name in missing}
+                ).values_list('id', 'question_bank_id', 'name')
+            })
+        missing = set(tags) - set(self.tags)
+        if missing:
+            Tag.objects.bulk_create([Tag(name=name) for name in missing], ignore_conflicts=True)
+            self.tags.update(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+        missing = set(weeks) - set(self.weeks)
+        if missing:
+            Week.objects.bulk_create([Week(course=self.course, number=n) for n in missing], ignore_conflicts=True)
+            self.weeks.update(Week.objects.filter(course=self.course, number__in=missing).values_list('number', 'id'))
+
+
+def _write(job, cache, parsed):
+    """Save a batch of parsed (key, sha256, questions) files in one transaction.
+
+    Returns (questions created, questions already there).
+    """
+    course = job.course
+    Tagging = Question.tags.through
+    with transaction.atomic():
+        rows = []
+        for key, _, questions in parsed:
+            pool, _, name = key.rpartition('/')
+            bank_id = cache.bank(QUIZ_POOL if pool == QUIZ_POOL else pool_name(name))
+            file_tag, file_week = _file_tag(key)
+            for q in questions:
+                tags = set(q['tags']) | ({file_tag} if file_tag else set())
+                rows.append((key, bank_id, hashlib.md5(q['text'].encode()).hexdigest(), q, tags, q['week'] or file_week))
+        cache.resolve(
+            {(bank_id, q['block']): q['max_questions'] for _, bank_id, _, q, _, _ in rows if q['block']},
+            {tag for *_, tags, _ in rows for tag in tags},
+            {week for *_, week in rows if week},
+        )
+
+        # Questions already in their bank (trashed ones too), by content hash
+        found = {
+            (bank_id, content_hash): pk for pk, bank_id, content_hash in Question.all_objects.filter(
+                question_bank_id__in={bank_id for _, bank_id, *_ in rows},
+                content_hash__in={content_hash for _, _, content_hash, *_ in rows},
+            ).values_list('id', 'question_bank_id', 'content_hash')
+        }
+        new, tagged, per_file, existing = [], [], {}, 0
+        for key, bank_id, content_hash, q, tags, week in rows:
+            match = found.get((bank_id, content_hash))
+            if match is None:
+                match = found[(bank_id, content_hash)] = Question(
+                    course=course, question_bank_id=bank_id,
+                    block_id=cache.blocks[(bank_id, q['block'])] if q['block'] else None,
+                    variant_number=q['variant_number'], week_id=cache.weeks.get(week),
+                    content_hash=content_hash, fingerprint=fingerprint(q['text']), created_by=job.requested_by,
+                    **{field: q[field] for field in (
+                        'question_type', 'text', 'points', 'answer_data', 'difficulty',
+                        'is_bonus', 'is_required', 'quiz_only', 'exam_only',
+                    )}
+                )
+                new.append(match)
+                per_file[key] = per_file.get(key, 0) + 1
+            else:
+                existing += 1
+            tagged += [(match, cache.tags[tag]) for tag in tags]
+
+        Question.objects.bulk_create(new)
+        Tagging.objects.bulk_create([
+            Tagging(question_id=getattr(question, 'id', question), tag_id=tag_id) for question, tag_id in tagged
+        ], ignore_conflicts=True)
+        retagged = {question for question, _ in tagged if isinstance(question, int)}
+        if retagged:
+            # Their tags changed: show that to delta sync (and in the list order)
+            Question.all_objects.filter(id__in=retagged).update(updated_at=timezone.now())
+        ImportedFile.objects.bulk_create([
+            ImportedFile(course=course, path=key, sha256=sha, job=job, questions=per_file.get(key, 0))
+            for key, sha, _ in parsed
+        ], update_conflicts=True, unique_fields=['course', 'path'], update_fields=['sha256', 'job', 'questions', 'imported_at'])
+
+        # bulk_create skips the post_save signals that keep these in sync
+        search.index_questions([q.id for q in new] + list(retagged))
+        versioning.bump([course.id], tags=True)
+    invalidate_course_count(course.id)
+    CourseUsage.mark_stale(course.id)
+    return len(new), existing
+
+
+def run(job, workers=IMPORT_WORKERS, batch_size=IMPORT_FILE_BATCH, progress=None):
+    """Import `job` batch by batch, saving progress (and calling `progress(job)`) after each"""
+    tree = executor = None
+    try:
+        tree = _open(job)
+        files, seen = [], set()
+        for key, handle, size in tree.files():
+            if key not in seen:  # the same pool file in two course directories: the first wins
+                seen.add(key)
+                files.append((key, handle, size))
+        known = dict(ImportedFile.objects.filter(course=job.course).values_list('path', 'sha256'))
+        cache = _Cache(job.course, job.requested_by)
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers)
+
+        # Counts of files start over when an abandoned job is run again; created questions don't
+        job.total_files, job.files_done, job.files_skipped, job.file_errors = len(files), 0, 0, []
+        job.save(update_fields=['total_files', 'files_done', 'files_skipped', 'file_errors', 'updated_at'])
+        for start in range(0, len(files), batch_size):
+            batch = []
+            for key, handle, size in files[start:start + batch_size]:
+                if size > MAX_FILE_SIZE:
+                    job.file_errors.append({'path': key, 'error': f'Larger than {MAX_FILE_SIZE // 1024 // 1024}MB'})
+                    continue
+                data = tree.read(handle)
+                sha = hashlib.sha256(data).hexdigest()
+                if known.get(key) == sha:
+                    job.files_skipped += 1
+                else:
+                    batch.append((key, data, sha))
+
+            keys = [key for key, _, _ in batch]
+            results = (executor.map if executor else map)(parse, keys, [data for _, data, _ in batch])
+            parsed = []
+            for (key, _, sha), (questions, error) in zip(batch, results):
+                if error:
+                    job.file_errors.append({'path': key, 'error': error})
+                else:
+                    parsed.append((key, sha, questions))
+            if parsed:
+                created, existing = _write(job, cache, parsed)
+                job.questions_created += created
+                job.questions_existing += existing
+            job.files_done = min(start + batch_size, len(files))
+            job.save(update_fields=[
+                'files_done', 'files_skipped', 'questions_created', 'questions_existing', 'file_errors', 'updated_at'
+            ])
+            if progress:
+                progress(job)
+    except Exception as e:
+        job.status = ImportJob.Status.FAILED
+        job.error = str(e) or type(e).__name__
+    else:
+        job.status = ImportJob.Status.DONE
+        if job.archive:
+            job.archive.delete(save=False)
+    finally:
+        if executor:
+            executor.shutdown()
+        if tree:
+            tree.close()
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'archive', 'finished_at', 'updated_at'])
+    return job
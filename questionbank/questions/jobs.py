@@ -0,0 +1,78 @@
+"""
+Background jobs worked through by `run_*_jobs` management commands.
+
+A job model (PurgeJob, ImportJob) has a UUID id, a Status of pending,
+running, done or failed, and started_at/updated_at timestamps; its module
+saves progress on it as it goes, which bumps updated_at. claim() hands a
+worker the oldest pending job, or a running one whose worker has stopped
+saving progress for STALE_AFTER (it died), so crashed jobs are finished by
+the next worker. JobCommand is the polling loop those commands share.
+"""
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+# A running job that hasn't recorded progress for this long is taken over
+STALE_AFTER = timedelta(minutes=10)
+
+
+def claim(model):
+    """The oldest pending (or abandoned) `model` job, marked running; None if there's nothing to do"""
+    now = timezone.now()
+    candidates = model.objects.filter(
+        Q(status=model.Status.PENDING) | Q(status=model.Status.RUNNING, updated_at__lt=now - STALE_AFTER)
+    ).order_by('created_at')
+    for job in candidates:
+        claimed = model.objects.filter(pk=job.pk, status=job.status, updated_at=job.updated_at).update(
+            status=model.Status.RUNNING, started_at=job.started_at or now, updated_at=now
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+class JobCommand(BaseCommand):
+    """Run the pending jobs of `model` and exit, or with --loop keep polling for more.
+
+    Subclasses set `model` and implement run(job, options), returning the
+    finished job, and summary(job).
+    """
+    model = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling for new jobs instead of exiting when none are left'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2,
+            help='Seconds between polls with --loop (default 2)'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim(self.model)
+            if job is None:
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+                continue
+
+            job = self.run(job, options)
+            if job.status == self.model.Status.FAILED:
+                self.stdout.write(self.style.ERROR(f'Job {job.id} failed: {job.error}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'Job {job.id}: {self.summary(job)}'))
+
+    def run(self, job, options):
+        raise NotImplementedError
+
+    def summary(self, job):
+        raise NotImplementedError
@@ -0,0 +1,66 @@
+"""
+Management command to compare the serializer and fast list paths.
+
+Requests each hot list endpoint as the given user with FAST_LISTS off and
+on (see questions/fastlist.py), with the payload cache cleared before every
+request, and prints the median time of each path and whether the two
+responses are byte-identical.
+
+Usage:
+    python manage.py benchmark_lists --user alice
+    python manage.py benchmark_lists --user alice --course CSCI-141 --page-size 2000 --repeat 7
+"""
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the hot list endpoints with and without the fast list path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=str, required=True, help='Username to request the lists as')
+        parser.add_argument('--course', type=str, help='Course code for the course-filtered question list')
+        parser.add_argument('--page-size', type=int, default=2000, help='Question list page size (default 2000)')
+        parser.add_argument('--repeat', type=int, default=5, help='Requests per path and endpoint (default 5)')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['user']).first()
+        if user is None:
+            self.stdout.write(self.style.ERROR(f"User {options['user']} not found"))
+            return
+
+        questions = f"/api/questions/?page_size={options['page_size']}"
+        endpoints = [questions]
+        if options['course']:
+            endpoints.append(f"{questions}&course={options['course']}")
+        endpoints += ['/api/tags/', '/api/banks/', '/api/exams/history/', '/api/quizzes/submissions/']
+
+        client = APIClient()
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for url in endpoints:
+                timings = {}
+                bodies = {}
+                for fast in (False, True):
+                    runs = []
+                    for _ in range(options['repeat']):
+                        cache.clear()
+                        client.force_authenticate(User.objects.get(pk=user.pk))
+                        with override_settings(FAST_LISTS=fast):
+                            start = time.perf_counter()
+                            response = client.get(url)
+                            runs.append(time.perf_counter() - start)
+                    timings[fast] = statistics.median(runs) * 1000
+                    bodies[fast] = response.content
+                same = 'identical' if bodies[False] == bodies[True] else self.style.ERROR('DIFFERENT')
+                self.stdout.write(
+                    f'{url}: serializer {timings[False]:.0f}ms, fast {timings[True]:.0f}ms '
+                    f'({timings[False] / max(timings[True], 0.001):.1f}x), '
+                    f'{len(bodies[True]) / 1024:.0f}KB {same}'
+                )
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,79 @@
+"""
+Management command to group near-duplicate questions into clusters.
+
+Backfills fingerprints and MinHash signatures for questions written without
+signals (bulk imports, queryset.update()), then rebuilds DuplicateCluster
+rows per course from the LSH band keys. Meant to run periodically (cron or
+a scheduled job); /api/questions/duplicates/ only reads its output.
+
+Usage:
+    python manage.py cluster_duplicates
+    python manage.py cluster_duplicates --course csci251-2255 --threshold 0.9
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+from questions.fingerprint import fingerprint, SIMILARITY_THRESHOLD
+from questions.models import Course, Question, QuestionSignature, DuplicateCluster
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Cluster near-duplicate questions per course (MinHash/LSH)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course',
+            type=str,
+            help='Only this course code (default: every course)'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=SIMILARITY_THRESHOLD,
+            help=f'Minimum estimated similarity to link two questions (default {SIMILARITY_THRESHOLD})'
+        )
+
+    def handle(self, *args, **options):
+        courses = Course.objects.all()
+        if options['course']:
+            courses = courses.filter(code=options['course'])
+            if not courses.exists():
+                self.stdout.write(self.style.ERROR(f"Course {options['course']} not found"))
+                return
+
+        for course in courses:
+            updated = self.backfill(course)
+            clusters = DuplicateCluster.rebuild_for_course(course, options['threshold'])
+            clustered = sum(c.size for c in clusters)
+            self.stdout.write(
+                f'{course.code}: {updated} signatures updated, '
+                f'{len(clusters)} clusters covering {clustered} questions'
+            )
+        self.stdout.write(self.style.SUCCESS('Done'))
+
+    def backfill(self, course):
+        """Fill in fingerprints and signatures that are missing or out of date"""
+        missing = Question.objects.filter(course=course, fingerprint='').only('id', 'text')
+        batch = []
+        for q in missing.iterator():
+            q.fingerprint = fingerprint(q.text)
+            batch.append(q)
+            if len(batch) == BATCH_SIZE:
+                Question.objects.bulk_update(batch, ['fingerprint'])
+                batch = []
+        if batch:
+            Question.objects.bulk_update(batch, ['fingerprint'])
+
+        stale = Question.objects.filter(course=course).filter(
+            Q(signature__isnull=True) |
+            ~Q(signature__fingerprint=F('fingerprint')) |
+            ~Q(signature__course_id=F('course_id'))
+        ).only('id', 'text', 'fingerprint', 'course_id')
+        ids = list(stale.values_list('id', flat=True))
+        updated = 0
+        for start in range(0, len(ids), BATCH_SIZE):
+            chunk = Question.objects.filter(id__in=ids[start:start + BATCH_SIZE]).only(
+                'id', 'text', 'fingerprint', 'course_id')
+            updated += QuestionSignature.update_for(chunk)
+        return updated
@@ -0,0 +1,62 @@
+"""
+Management command to export every live question in a course.
+
+Streams the export to a file as it is written, in the same formats as
+GET /api/courses/<code>/export/<format>/ (see questions/export.py). The mkt
+format is a zip holding <code>/questionPool/<bank> files; unzipped, it can
+be read back with import_questions.py.
+
+Usage:
+    python manage.py export_course CSCI-141 --format qti
+    python manage.py export_course CSCI-141 --format mkt --images --output csci141.zip
+"""
+import time
+from django.core.management.base import BaseCommand
+from questions import export
+from questions.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Export a course as CSV, Moodle XML, QTI or mkt INI'
+
+    def add_arguments(self, parser):
+        parser.add_argument('course', type=str, help='Course code')
+        parser.add_argument(
+            '--format',
+            choices=list(export.WRITERS),
+            default='csv',
+            help='Export format (default: csv)'
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='File to write (default: <code>-<format>.<extension>)'
+        )
+        parser.add_argument(
+            '--images',
+            action='store_true',
+            help='Include image files (mkt format only)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=export.EXPORT_CHUNK_SIZE,
+            help=f'Questions read per database round trip (default: {export.EXPORT_CHUNK_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        course = Course.objects.filter(code=options['course']).first()
+        if course is None:
+            self.stdout.write(self.style.ERROR(f"Course {options['course']} not found"))
+            return
+
+        fmt = options['format']
+        path = options['output'] or export.filename(course, fmt)
+        start = time.monotonic()
+        size = 0
+        with open(path, 'wb') as f:
+            for chunk in export.stream(course, fmt, images=options['images'], chunk_size=options['chunk_size']):
+                f.write(chunk)
+                size += len(chunk)
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(f'Wrote {path} ({size / 1024:.1f}KB) in {elapsed:.1f}s'))
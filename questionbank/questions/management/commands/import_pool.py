@@ -0,0 +1,71 @@
+"""
+Management command to import a directory or zip of mkt question pools.
+
+Imports every questionPool/quizPool file under PATH, and the files beside
+them, into the course (see questions/importer.py), creating the course if
+needed. Files imported before and unchanged are skipped, so running it
+again is safe.
+
+Usage:
+    python manage.py import_pool ../questions/csci320-2211 --course csci320-2211
+    python manage.py import_pool export.zip --course CSCI-141 --owner alice --workers 8
+"""
+import os
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from questions import importer
+from questions.models import Course, ImportJob
+
+
+class Command(BaseCommand):
+    help = 'Import mkt questionPool/quizPool files from a directory or zip into a course'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='Directory or zip file')
+        parser.add_argument('--course', type=str, required=True, help='Course code (created if missing)')
+        parser.add_argument(
+            '--owner',
+            type=str,
+            help='Username owning a new course and the imported questions (default: the course owner)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=importer.IMPORT_WORKERS,
+            help=f'Processes parsing files (default {importer.IMPORT_WORKERS})'
+        )
+
+    def handle(self, *args, **options):
+        if not os.path.exists(options['path']):
+            self.stdout.write(self.style.ERROR(f"{options['path']} not found"))
+            return
+        owner = None
+        if options['owner']:
+            owner = User.objects.filter(username=options['owner']).first()
+            if owner is None:
+                self.stdout.write(self.style.ERROR(f"User {options['owner']} not found"))
+                return
+        course, _ = Course.objects.get_or_create(
+            code=options['course'], defaults={'name': options['course'], 'owner': owner}
+        )
+
+        start = time.monotonic()
+        job = ImportJob.objects.create(
+            requested_by=owner or course.owner, course=course, source=os.path.abspath(options['path'])
+        )
+        job = importer.run(job, options['workers'], progress=self.report)
+        for error in job.file_errors:
+            self.stdout.write(self.style.ERROR(f"  {error['path']}: {error['error']}"))
+        if job.status == ImportJob.Status.FAILED:
+            self.stdout.write(self.style.ERROR(f'Import failed: {job.error}'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'{job.questions_created} questions created from {job.total_files} files in '
+            f'{time.monotonic() - start:.1f}s ({job.questions_existing} already there, '
+            f'{job.files_skipped} files unchanged)'
+        ))
+
+    def report(self, job):
+        self.stdout.write(f'  {job.files_done}/{job.total_files} files')
@@ -0,0 +1,34 @@
+"""
+Management command for question image housekeeping.
+
+Deletes orphan uploads (images uploaded before their question existed)
+that are older than a day and that no question's text or answers refer
+to, along with their files and renditions once nothing else uses them.
+With --backfill it first hashes and renders images stored before uploads
+were content-addressed (see questions/images.py). Meant to run
+periodically (cron or a scheduled job).
+
+Usage:
+    python manage.py process_images
+    python manage.py process_images --backfill
+"""
+from django.core.management.base import BaseCommand
+from questions import images
+
+
+class Command(BaseCommand):
+    help = 'Collect orphan question images and backfill renditions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Hash and render images that have no renditions yet'
+        )
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            done = images.backfill()
+            self.stdout.write(f'{done} images hashed and rendered')
+        rows, files = images.collect_orphans()
+        self.stdout.write(self.style.SUCCESS(f'{rows} orphan images removed ({files} files deleted)'))
@@ -0,0 +1,31 @@
+"""
+Management command to rebuild the question full-text search index.
+
+Needed after changes that bypass model signals (queryset.update(),
+bulk_create(), raw SQL, restoring a database dump).
+
+Usage:
+    python manage.py rebuild_search_index
+"""
+import time
+from django.core.management.base import BaseCommand
+from questions import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the question full-text search index (Postgres tsvector / SQLite FTS5)'
+
+    def handle(self, *args, **options):
+        kind = search.backend()
+        if not kind:
+            self.stdout.write(self.style.ERROR(
+                'No search index on this database (run migrate; SQLite needs FTS5)'
+            ))
+            return
+
+        start = time.monotonic()
+        count = search.rebuild_index()
+        elapsed = time.monotonic() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {count} questions ({kind}) in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,42 @@
+"""
+Management command to run the pending question import jobs.
+
+POST /api/courses/<code>/import/ only stores the uploaded zip on an
+ImportJob; this command imports it (see questions/importer.py), saving
+progress on the job after each batch of files. Without --loop it runs every
+pending job and exits, for cron; with --loop it keeps polling, as the
+Procfile importer does. Jobs left running by a worker that died are picked
+up again.
+
+Usage:
+    python manage.py run_import_jobs
+    python manage.py run_import_jobs --loop --interval 5 --workers 2
+"""
+from questions import importer
+from questions.jobs import JobCommand
+from questions.models import ImportJob
+
+
+class Command(JobCommand):
+    help = 'Import uploaded question pools for pending import jobs'
+    model = ImportJob
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=importer.IMPORT_WORKERS,
+            help=f'Processes parsing files (default {importer.IMPORT_WORKERS})'
+        )
+
+    def run(self, job, options):
+        self.stdout.write(f'Job {job.id}: importing {job.source} into {job.course.code}')
+        return importer.run(job, options['workers'], progress=self.report)
+
+    def summary(self, job):
+        return (f'{job.questions_created} questions created '
+                f'({job.questions_existing} already there, {job.files_skipped} files unchanged)')
+
+    def report(self, job):
+        self.stdout.write(f'  {job.files_done}/{job.total_files} files')
@@ -0,0 +1,40 @@
+"""
+Management command to run the pending trash purge jobs.
+
+POST /api/questions/empty_trash/ only records a PurgeJob; this command
+deletes its questions in batches (see questions/purge.py), saving progress
+on the job after each batch. Without --loop it runs every pending job and
+exits, for cron; with --loop it keeps polling, as the Procfile worker does.
+Jobs left running by a worker that died are picked up again.
+
+Usage:
+    python manage.py run_purge_jobs
+    python manage.py run_purge_jobs --loop --interval 5 --batch-size 1000
+"""
+from questions import purge
+from questions.jobs import JobCommand
+from questions.models import PurgeJob
+
+
+class Command(JobCommand):
+    help = 'Permanently delete trashed questions for pending purge jobs, in batches'
+    model = PurgeJob
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=purge.PURGE_BATCH_SIZE,
+            help=f'Questions deleted per transaction (default {purge.PURGE_BATCH_SIZE})'
+        )
+
+    def run(self, job, options):
+        self.stdout.write(f'Job {job.id} for {job.requested_by.username}: starting')
+        return purge.run(job, options['batch_size'], progress=self.report)
+
+    def summary(self, job):
+        return f'{job.deleted} questions and {job.files_deleted} image files deleted'
+
+    def report(self, job):
+        self.stdout.write(f'  {job.deleted}/{job.total} questions deleted')
@@ -0,0 +1,63 @@
+"""
+Management command to report (and shrink) the space question history takes.
+
+Prints how many versions are full snapshots and how many deltas (see
+questions/history.py), the bytes they store against the bytes full copies
+of every version would take, and the savings. --compact first rewrites the
+history of every question as snapshots plus deltas, for versions written
+before history was delta-compressed.
+
+Usage:
+    python manage.py version_storage
+    python manage.py version_storage --course CSCI-141 --compact
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from questions import history
+from questions.models import Course, QuestionVersion
+
+CHUNK_SIZE = 2000
+
+
+class Command(BaseCommand):
+    help = 'Report question version storage, optionally compacting old history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--course',
+            type=str,
+            help='Only questions in this course code (default: every course)'
+        )
+        parser.add_argument(
+            '--compact',
+            action='store_true',
+            help='Rewrite stored history as snapshots plus deltas before reporting'
+        )
+
+    def handle(self, *args, **options):
+        versions = QuestionVersion.objects.all()
+        if options['course']:
+            if not Course.objects.filter(code=options['course']).exists():
+                self.stdout.write(self.style.ERROR(f"Course {options['course']} not found"))
+                return
+            versions = versions.filter(question__course__code=options['course'])
+
+        if options['compact']:
+            question_ids = versions.order_by('question_id').values_list('question_id', flat=True).distinct()
+            changed = sum(history.compact(question_id) for question_id in question_ids.iterator())
+            self.stdout.write(f'{changed} versions rewritten')
+
+        totals = versions.aggregate(count=Count('id'), full=Sum('size'))
+        snapshots = versions.filter(is_snapshot=True).count()
+        stored = sum(
+            history.stored_size(row) for row in versions.values_list(
+                'is_snapshot', 'text', 'answer_data', 'delta'
+            ).iterator(chunk_size=CHUNK_SIZE)
+        )
+        full = totals['full'] or 0
+        saved = (1 - stored / full) * 100 if full else 0
+        self.stdout.write(
+            f"{totals['count']} versions: {snapshots} snapshots, {totals['count'] - snapshots} deltas\n"
+            f'Stored {stored / 1024:.1f}KB of {full / 1024:.1f}KB as full copies ({saved:.0f}% saved)'
+        )
+        self.stdout.write(self.style.SUCCESS('Done'))
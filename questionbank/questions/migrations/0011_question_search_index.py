@@ -0,0 +1,24 @@
+from django.db import migrations
+
+from questions import search
+
+
+def create_search_index(apps, schema_editor):
+    """tsvector column + GIN index on Postgres, FTS5 table on SQLite, then fill it"""
+    search.create_index(schema_editor)
+    search.rebuild_index(apps.get_model('questions', 'Question'))
+
+
+def drop_search_index(apps, schema_editor):
+    search.drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0010_populate_question_course'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-19 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0011_question_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['course', '-updated_at', '-id'], name='questions_q_course__825ba1_idx'),
+        ),
+    ]
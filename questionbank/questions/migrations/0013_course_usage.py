@@ -0,0 +1,28 @@
+# Generated by Django 4.2.27 on 2026-10-19 08:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0012_question_course_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('used', models.PositiveIntegerField(default=0)),
+                ('by_type', models.JSONField(default=dict, help_text='{type: {total, used, times_used}}')),
+                ('most_used', models.JSONField(default=list)),
+                ('recently_used', models.JSONField(default=list)),
+                ('stale', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='usage', to='questions.course')),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.27 on 2026-10-19 08:18
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0013_course_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, help_text='md5 of normalized text (see fingerprint.py)', max_length=32),
+        ),
+        migrations.CreateModel(
+            name='QuestionSignature',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='questions.question')),
+                ('fingerprint', models.CharField(max_length=32)),
+                ('minhash', models.JSONField(default=list)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='questions.course')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DuplicateCluster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.PositiveIntegerField()),
+                ('similarity', models.FloatField(help_text='Lowest similarity of the pairs that joined the cluster')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_clusters', to='questions.course')),
+                ('questions', models.ManyToManyField(related_name='duplicate_clusters', to='questions.question')),
+            ],
+            options={
+                'ordering': ['-size', '-similarity'],
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionBandKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=16)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='questions.course')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='band_keys', to='questions.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course', 'key'], name='questions_q_course__eef06e_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.27 on 2026-10-19 08:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0015_content_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('question', 'Question'), ('tag', 'Tag'), ('block', 'Block'), ('week', 'Week')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+                ('course', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='questions.course')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['course', 'deleted_at'], name='questions_t_course__98ed6c_idx')],
+            },
+        ),
+    ]
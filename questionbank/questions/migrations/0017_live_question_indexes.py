@@ -0,0 +1,38 @@
+# Generated by Django 4.2.27 on 2026-10-19 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0016_sync_tombstones'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='question',
+            name='questions_q_course__825ba1_idx',
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('canonical__isnull', True), ('deleted_at__isnull', True)), fields=['course', '-updated_at', '-id'], name='question_live_course_updated'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('canonical__isnull', True), ('deleted_at__isnull', True)), fields=['course', 'question_type'], name='question_live_course_type'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', True)), fields=['block', 'variant_number'], name='question_live_block_variant'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['-deleted_at'], name='question_trash'),
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 4.2.27 on 2026-10-19 09:15
+
+import json
+import re
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+# Frozen copies of questions/history.py's helpers as of this migration, so
+# later changes there can't change what it does
+_TOKEN = re.compile(r'\S+\s*|\s+')
+
+
+def _dump(answer_data):
+    return json.dumps(answer_data, indent=1)
+
+
+def size(text, answer_data):
+    """Bytes of a version's full content"""
+    return len(text.encode()) + len(_dump(answer_data).encode())
+
+
+def patch(old, ops):
+    """Apply a delta's [start, end, tokens] edits to `old`"""
+    a = _TOKEN.findall(old)
+    out, pos = [], 0
+    for start, end, tokens in ops:
+        out += a[pos:start]
+        out += tokens
+        pos = end
+    out += a[pos:]
+    return ''.join(out)
+
+
+def apply(content, row):
+    """Content of `row` given the content of the version before it"""
+    is_snapshot, text, answer_data, delta = row
+    if is_snapshot:
+        return text, answer_data
+    text, answer_data = content
+    if 'text' in delta:
+        text = patch(text, delta['text'])
+    if 'answer_data' in delta:
+        answer_data = json.loads(patch(_dump(answer_data), delta['answer_data']))
+    return text, answer_data
+
+
+def fill_sizes(apps, schema_editor):
+    """Existing versions are all full snapshots; record their size"""
+    QuestionVersion = apps.get_model('questions', 'QuestionVersion')
+    batch = []
+    for version in QuestionVersion.objects.only('id', 'text', 'answer_data').iterator(chunk_size=BATCH_SIZE):
+        version.size = size(version.text, version.answer_data)
+        batch.append(version)
+        if len(batch) == BATCH_SIZE:
+            QuestionVersion.objects.bulk_update(batch, ['size'])
+            batch = []
+    QuestionVersion.objects.bulk_update(batch, ['size'])
+
+
+def expand_deltas(apps, schema_editor):
+    """Turn every delta back into a full copy before the columns go away"""
+    QuestionVersion = apps.get_model('questions', 'QuestionVersion')
+    rows = QuestionVersion.objects.order_by('question_id', 'version_number')
+    batch, question_id, state = [], None, None
+    for version in rows.iterator(chunk_size=BATCH_SIZE):
+        if version.question_id != question_id:
+            question_id, state = version.question_id, None
+        state = apply(state, (version.is_snapshot, version.text, version.answer_data, version.delta))
+        if not version.is_snapshot:
+            version.text, version.answer_data = state
+            batch.append(version)
+        if len(batch) == BATCH_SIZE:
+            QuestionVersion.objects.bulk_update(batch, ['text', 'answer_data'])
+            batch = []
+    QuestionVersion.objects.bulk_update(batch, ['text', 'answer_data'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0018_purge_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionversion',
+            name='delta',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='questionversion',
+            name='is_snapshot',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='questionversion',
+            name='size',
+            field=models.PositiveIntegerField(default=0, help_text='Bytes of the full content of this version'),
+        ),
+        migrations.AlterField(
+            model_name='questionversion',
+            name='text',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(fill_sizes, expand_deltas),
+    ]
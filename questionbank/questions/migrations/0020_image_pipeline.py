@@ -0,0 +1,37 @@
+# Generated by Django 4.2.27 on 2026-10-19 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0019_delta_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questionimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='questionimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='questionimage',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='questionimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='questionimage',
+            index=models.Index(condition=models.Q(('question__isnull', True)), fields=['created_at'], name='questionimage_orphan'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.27 on 2026-10-19 09:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('questions', '0020_image_pipeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('archive', models.FileField(blank=True, upload_to='question_imports/')),
+                ('source', models.CharField(blank=True, help_text='Upload name, or the server path imported', max_length=500)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('total_files', models.PositiveIntegerField(default=0)),
+                ('files_done', models.PositiveIntegerField(default=0)),
+                ('files_skipped', models.PositiveIntegerField(default=0, help_text='Unchanged since they were last imported')),
+                ('questions_created', models.PositiveIntegerField(default=0)),
+                ('questions_existing', models.PositiveIntegerField(default=0, help_text='Already in their bank')),
+                ('file_errors', models.JSONField(blank=True, default=list, help_text="[{'path': ..., 'error': ...}]")),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='import_jobs', to='questions.course')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportedFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='e.g. questionPool/recursion or quizPool/week3.txt', max_length=500)),
+                ('sha256', models.CharField(max_length=64)),
+                ('questions', models.PositiveIntegerField(default=0, help_text='Questions created from this version')),
+                ('imported_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='imported_files', to='questions.course')),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='files', to='questions.importjob')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='importjob',
+            index=models.Index(fields=['status', 'created_at'], name='questions_i_status_0b5260_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='importedfile',
+            unique_together={('course', 'path')},
+        ),
+    ]
@@ -1,12 +1,32 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 import hashlib
+import uuid
+
+
+def count_subquery(queryset, field, outer='pk'):
+    """Correlated COUNT of `queryset` rows whose `field` points at the outer row.
+
+    Used for list annotations instead of Count() so a count never multiplies
+    with (or gets filtered by) other joins on the same query.
+    """
+    counts = (
+        queryset.filter(**{field: OuterRef(outer)})
+        .order_by()
+        .values(field)
+        .annotate(n=Count('*'))
+        .values('n')
+    )
+    return Coalesce(Subquery(counts), 0)
 
 
 class Tag(models.Model):
     """Tags for categorizing questions"""
     name = models.CharField(max_length=100, unique=True)
     color = models.CharField(max_length=7, default='#6366f1')  # Hex color
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['name']
@@ -30,6 +50,60 @@ class Course(models.Model):
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+    def share_with(self, users, permission, shared_by):
+        """Share this course, and shared_by's banks and exam templates in it, with `users`.
+
+        One set-based upsert per share table, in one transaction. Bulk writes
+        skip the share signals, so the access cache is invalidated here.
+        Returns the CourseShare rows.
+        """
+        from django.db import transaction
+        from exams.models import ExamTemplate, ExamTemplateShare
+        from . import access, versioning
+
+        user_ids = [user.id for user in users]
+        bank_ids = list(self.question_banks.filter(owner=shared_by).values_list('id', flat=True))
+        template_ids = list(
+            ExamTemplate.objects.filter(course=self, owner=shared_by).values_list('id', flat=True)
+        )
+        upsert = {'update_conflicts': True, 'update_fields': ['permission', 'shared_by']}
+        with transaction.atomic():
+            CourseShare.objects.bulk_create([
+                CourseShare(course=self, shared_with_id=uid, permission=permission, shared_by=shared_by)
+                for uid in user_ids
+            ], unique_fields=['course', 'shared_with'], **upsert)
+            QuestionBankShare.objects.bulk_create([
+                QuestionBankShare(bank_id=bank_id, shared_with_id=uid, permission=permission, shared_by=shared_by)
+                for bank_id in bank_ids for uid in user_ids
+            ], unique_fields=['bank', 'shared_with'], **upsert)
+            ExamTemplateShare.objects.bulk_create([
+                ExamTemplateShare(template_id=template_id, shared_with_id=uid, permission=permission, shared_by=shared_by)
+                for template_id in template_ids for uid in user_ids
+            ], unique_fields=['template', 'shared_with'], **upsert)
+            if template_ids:
+                versioning.bump([self.id])  # the bulk template shares skip their signals
+        access.invalidate(*user_ids)
+        return CourseShare.objects.filter(course=self, shared_with_id__in=user_ids).select_related(
+            'shared_with', 'shared_by'
+        )
+
+    def unshare_with(self, users, shared_by):
+        """Remove the course share and shared_by's bank/template shares for `users`"""
+        from django.db import transaction
+        from exams.models import ExamTemplateShare
+        from . import access
+
+        user_ids = [user.id for user in users]
+        with transaction.atomic():
+            CourseShare.objects.filter(course=self, shared_with_id__in=user_ids).delete()
+            QuestionBankShare.objects.filter(
+                bank__course=self, bank__owner=shared_by, shared_with_id__in=user_ids
+            ).delete()
+            ExamTemplateShare.objects.filter(
+                template__course=self, template__owner=shared_by, shared_with_id__in=user_ids
+            ).delete()
+        access.invalidate(*user_ids)
+
 
 class CourseShare(models.Model):
     """Share a course with another user"""
@@ -85,35 +159,98 @@ class QuestionBank(models.Model):
     def __str__(self):
         return f"{self.course.code}/{self.name}"
 
-    def copy_to_user(self, user, new_name=None):
-        """Create a complete copy of this bank with all questions for another user"""
-        from django.utils import timezone
-
-        # Create new bank
-        new_bank = QuestionBank.objects.create(
-            name=new_name or f"{self.name} (copy)",
-            course=self.course,
-            description=self.description,
-            owner=user
-        )
+    COPY_CHUNK_SIZE = 500
 
-        # Copy all questions
-        for question in self.questions.all():
-            Question.objects.create(
-                question_bank=new_bank,
-                question_type=question.question_type,
-                text=question.text,
-                points=question.points,
-                difficulty=question.difficulty,
-                answer_data=question.answer_data,
-                is_bonus=question.is_bonus,
-                is_required=question.is_required,
-                quiz_only=question.quiz_only,
-                exam_only=question.exam_only,
-                canonical=question.canonical or question,  # Link to original
-                created_by=user
+    def copy_to_user(self, user, new_name=None):
+        """Create a complete copy of this bank with all questions for another user.
+
+        Runs in one transaction with bulk inserts, COPY_CHUNK_SIZE questions at
+        a time: blocks are recreated and remapped, tags and images carried over,
+        and each copy links to the original's canonical question. Weeks belong
+        to the course, which the copy shares, so they are kept as-is.
+        """
+        from django.db import transaction
+        from .fingerprint import fingerprint
+        from .pagination import invalidate_course_count
+        from . import search, versioning
+
+        with transaction.atomic():
+            new_bank = QuestionBank.objects.create(
+                name=new_name or f"{self.name} (copy)",
+                course_id=self.course_id,
+                description=self.description,
+                owner=user
             )
 
+            blocks = list(self.blocks.all())
+            new_blocks = QuestionBlock.objects.bulk_create([
+                QuestionBlock(
+                    name=block.name,
+                    question_bank=new_bank,
+                    max_questions=block.max_questions,
+                    description=block.description
+                ) for block in blocks
+            ])
+            block_map = {old.id: new.id for old, new in zip(blocks, new_blocks)}
+
+            source_ids = list(
+                self.questions.order_by('id').values_list('id', flat=True)
+            )
+            new_ids = []
+            for start in range(0, len(source_ids), self.COPY_CHUNK_SIZE):
+                chunk_ids = source_ids[start:start + self.COPY_CHUNK_SIZE]
+                chunk = list(Question.objects.filter(id__in=chunk_ids).order_by('id'))
+                copies = Question.objects.bulk_create([
+                    Question(
+                        course_id=self.course_id,
+                        question_bank=new_bank,
+                        question_type=q.question_type,
+                        text=q.text,
+                        points=q.points,
+                        block_id=block_map.get(q.block_id),
+                        variant_number=q.variant_number,
+                        canonical_id=q.canonical_id or q.id,  # Link to original
+                        difficulty=q.difficulty,
+                        week_id=q.week_id,
+                        answer_data=q.answer_data,
+                        content_hash=q.content_hash or hashlib.md5(q.text.encode()).hexdigest(),
+                        fingerprint=q.fingerprint or fingerprint(q.text),
+                        is_bonus=q.is_bonus,
+                        is_required=q.is_required,
+                        quiz_only=q.quiz_only,
+                        exam_only=q.exam_only,
+                        created_by=user
+                    ) for q in chunk
+                ])
+                question_map = {old.id: new.id for old, new in zip(chunk, copies)}
+
+                Tagging = Question.tags.through
+                Tagging.objects.bulk_create([
+                    Tagging(question_id=question_map[question_id], tag_id=tag_id)
+                    for question_id, tag_id in Tagging.objects.filter(
+                        question_id__in=question_map).values_list('question_id', 'tag_id')
+                ])
+                QuestionImage.objects.bulk_create([
+                    QuestionImage(
+                        question_id=question_map[image.question_id],
+                        image=image.image.name,
+                        sha256=image.sha256,
+                        width=image.width,
+                        height=image.height,
+                        renditions=image.renditions,
+                        alt_text=image.alt_text,
+                        caption=image.caption,
+                        uploaded_by_id=image.uploaded_by_id
+                    ) for image in QuestionImage.objects.filter(question_id__in=question_map)
+                ])
+                new_ids += [q.id for q in copies]
+
+            # bulk_create skips the post_save signals that keep these in sync.
+            # (Near-duplicate signatures are left to `cluster_duplicates`' backfill.)
+            search.index_questions(new_ids)
+            versioning.bump([self.course_id], tags=True)
+        invalidate_course_count(self.course_id)
+        CourseUsage.mark_stale(self.course_id)
         return new_bank
 
 
@@ -153,8 +290,26 @@ class QuestionBlock(models.Model):
         return f"{self.question_bank}: {self.name} ({self.questions.count()} variants)"
 
 
+class LiveQuestionManager(models.Manager):
+    """Questions that aren't in the trash"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+# Rows the list, type filter and block variant queries read: live, and (for
+# the first two) not a copy. Partial indexes leave trash and copies out.
+LIVE = models.Q(deleted_at__isnull=True)
+LIVE_CANONICAL = models.Q(deleted_at__isnull=True, canonical__isnull=True)
+
+
 class Question(models.Model):
-    """Individual question"""
+    """Individual question.
+
+    `objects` leaves out trashed questions (and so do reverse relations such
+    as course.questions); use `all_objects` for the trash and anything that
+    must see every row.
+    """
 
     class QuestionType(models.TextChoices):
         MULTIPLE_CHOICE = 'multipleChoice', 'Multiple Choice'
@@ -215,6 +370,7 @@ class Question(models.Model):
 
     # Metadata
     content_hash = models.CharField(max_length=32, blank=True, db_index=True)
+    fingerprint = models.CharField(max_length=32, blank=True, db_index=True, help_text="md5 of normalized text (see fingerprint.py)")
     is_bonus = models.BooleanField(default=False)
     is_required = models.BooleanField(default=False)
     quiz_only = models.BooleanField(default=False)
@@ -230,9 +386,12 @@ class Question(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     # Soft delete
-    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
     deleted_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='questions_deleted')
 
+    objects = LiveQuestionManager()
+    all_objects = models.Manager()
+
     class Meta:
         ordering = ['-updated_at']
         indexes = [
@@ -242,11 +401,26 @@ class Question(models.Model):
             models.Index(fields=['canonical']),
             models.Index(fields=['-updated_at']),
             models.Index(fields=['-created_at']),
+            # Per-course list pages in default order (keyset pagination)
+            models.Index(fields=['course', '-updated_at', '-id'], condition=LIVE_CANONICAL,
+                         name='question_live_course_updated'),
+            # Per-course ?type= lists and counts by type
+            models.Index(fields=['course', 'question_type'], condition=LIVE_CANONICAL,
+                         name='question_live_course_type'),
+            # Block variants (copies of a bank have their own blocks, so copies stay in)
+            models.Index(fields=['block', 'variant_number'], condition=LIVE, name='question_live_block_variant'),
+            # The trash view; live rows aren't in it
+            models.Index(fields=['-deleted_at'], condition=models.Q(deleted_at__isnull=False), name='question_trash'),
         ]
 
     def save(self, *args, **kwargs):
         # Generate content hash for duplicate detection
+        from .fingerprint import fingerprint
         self.content_hash = hashlib.md5(self.text.encode()).hexdigest()
+        self.fingerprint = fingerprint(self.text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'text' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'content_hash', 'fingerprint'}
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -262,13 +436,13 @@ class Question(models.Model):
         from django.utils import timezone
         self.deleted_at = timezone.now()
         self.deleted_by = user
-        self.save(update_fields=['deleted_at', 'deleted_by'])
+        self.save(update_fields=['deleted_at', 'deleted_by', 'updated_at'])
 
     def restore(self):
         """Restore this question from trash"""
         self.deleted_at = None
         self.deleted_by = None
-        self.save(update_fields=['deleted_at', 'deleted_by'])
+        self.save(update_fields=['deleted_at', 'deleted_by', 'updated_at'])
 
     @property
     def is_canonical(self):
@@ -310,10 +484,18 @@ class Question(models.Model):
 
 
 class QuestionVersion(models.Model):
-    """Version history for questions"""
+    """Version history for questions.
+
+    Snapshots hold the full text and answer_data; the other versions only a
+    `delta` against the version before them. Use questions.history to
+    write versions and read their content.
+    """
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='versions')
-    text = models.TextField()
+    text = models.TextField(blank=True)
     answer_data = models.JSONField(default=dict)
+    is_snapshot = models.BooleanField(default=True)
+    delta = models.JSONField(null=True, blank=True)
+    size = models.PositiveIntegerField(default=0, help_text="Bytes of the full content of this version")
     version_number = models.PositiveIntegerField()
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -327,6 +509,392 @@ class QuestionVersion(models.Model):
         return f"v{self.version_number} of Question {self.question.id}"
 
 
+class CourseUsage(models.Model):
+    """Precomputed usage numbers for a course's dashboard (see QuestionViewSet.usage_stats).
+
+    Refreshed after an exam is generated; question saves/deletes only mark
+    the row stale, and stale rows are recomputed the next time they're read.
+    """
+    TOP_N = 10
+
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, related_name='usage')
+    total = models.PositiveIntegerField(default=0)
+    used = models.PositiveIntegerField(default=0)
+    by_type = models.JSONField(default=dict, help_text="{type: {total, used, times_used}}")
+    most_used = models.JSONField(default=list)
+    recently_used = models.JSONField(default=list)
+    stale = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Usage for {self.course.code}"
+
+    @staticmethod
+    def _summary(q):
+        return {
+            'id': q['id'],
+            'text': q['text'][:80] + '...' if len(q['text']) > 80 else q['text'],
+            'type': q['question_type'],
+            'times_used': q['times_used'],
+            'last_used': q['last_used'].isoformat() if q['last_used'] else None
+        }
+
+    @classmethod
+    def refresh(cls, course_ids):
+        """Recompute the rollup rows for the given courses"""
+        from django.db.models import Sum
+        course_ids = list(course_ids)
+        if not course_ids:
+            return []
+        live = Question.objects.filter(course_id__in=course_ids)
+
+        # One grouped aggregate for every course/type pair
+        by_course = {cid: {} for cid in course_ids}
+        rows = live.order_by().values('course_id', 'question_type').annotate(
+            total=Count('id'),
+            used=Count('id', filter=models.Q(times_used__gt=0)),
+            times_used=Sum('times_used'),
+        )
+        for row in rows:
+            by_course[row['course_id']][row['question_type']] = {
+                'total': row['total'], 'used': row['used'], 'times_used': row['times_used'] or 0
+            }
+
+        fields = ['id', 'text', 'question_type', 'times_used', 'last_used']
+        usages = []
+        for cid, by_type in by_course.items():
+            course_live = live.filter(course_id=cid)
+            usage, _ = cls.objects.update_or_create(course_id=cid, defaults={
+                'total': sum(t['total'] for t in by_type.values()),
+                'used': sum(t['used'] for t in by_type.values()),
+                'by_type': by_type,
+                'most_used': [cls._summary(q) for q in course_live.filter(
+                    times_used__gt=0).order_by('-times_used').values(*fields)[:cls.TOP_N]],
+                'recently_used': [cls._summary(q) for q in course_live.filter(
+                    last_used__isnull=False).order_by('-last_used').values(*fields)[:cls.TOP_N]],
+                'stale': False,
+            })
+            usages.append(usage)
+        return usages
+
+    @classmethod
+    def for_courses(cls, course_ids):
+        """Rollup rows for the given courses, computing missing or stale ones first"""
+        course_ids = set(course_ids)
+        usages = [u for u in cls.objects.filter(course_id__in=course_ids) if not u.stale]
+        missing = course_ids - {u.course_id for u in usages}
+        return usages + cls.refresh(missing)
+
+    @classmethod
+    def mark_stale(cls, course_id):
+        if course_id:
+            cls.objects.filter(course_id=course_id, stale=False).update(stale=True)
+
+
+class Tombstone(models.Model):
+    """Record of a row that left a course (hard delete or move), for delta sync.
+
+    `course` is None for tags, which are global. No FK constraint, so the
+    log survives the course itself being deleted; pruned after
+    sync.TOMBSTONE_RETENTION.
+    """
+    KIND_CHOICES = [
+        ('question', 'Question'),
+        ('tag', 'Tag'),
+        ('block', 'Block'),
+        ('week', 'Week'),
+    ]
+    course = models.ForeignKey(
+        Course, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+'
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['course', 'deleted_at'])]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} gone from course {self.course_id}"
+
+    @classmethod
+    def record(cls, kind, object_ids, course_id=None):
+        cls.objects.bulk_create([cls(kind=kind, object_id=pk, course_id=course_id) for pk in object_ids])
+
+
+class ContentVersion(models.Model):
+    """Monotonic version of one course's content, or of the global tag list.
+
+    Bumped on every write that changes what the list endpoints return and
+    used for their ETags and cache keys (see versioning.py).
+    """
+    scope = models.CharField(max_length=40, primary_key=True, help_text="'course:<id>' or 'tags'")
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.scope} v{self.version}"
+
+
+class PurgeJob(models.Model):
+    """Permanent deletion of trashed questions, run in batches by `run_purge_jobs`.
+
+    With `question_ids` the job purges those questions; without, everything
+    in the requester's trash. Either way only questions trashed before the
+    job was created and still in the trash when their batch runs are
+    deleted, so a job can be re-run after a crash (see purge.py).
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    requested_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='purge_jobs')
+    question_ids = models.JSONField(null=True, blank=True, help_text="None: the requester's whole trash")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+
+    # Progress
+    total = models.PositiveIntegerField(default=0)
+    deleted = models.PositiveIntegerField(default=0)
+    files_deleted = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"Purge {self.id} ({self.status}, {self.deleted}/{self.total})"
+
+
+class ImportJob(models.Model):
+    """Import of an mkt question tree into a course (see importer.py).
+
+    Uploaded zips are stored in `archive` and imported by `run_import_jobs`;
+    `import_pool` records a job with the server path in `source` and runs it
+    at once. Pool files already imported unchanged are skipped, so a job
+    can be re-run after a crash.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+        FAILED = 'failed', 'Failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_jobs')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='import_jobs')
+    archive = models.FileField(upload_to='question_imports/', blank=True)
+    source = models.CharField(max_length=500, blank=True, help_text="Upload name, or the server path imported")
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+
+    # Progress
+    total_files = models.PositiveIntegerField(default=0)
+    files_done = models.PositiveIntegerField(default=0)
+    files_skipped = models.PositiveIntegerField(default=0, help_text="Unchanged since they were last imported")
+    questions_created = models.PositiveIntegerField(default=0)
+    questions_existing = models.PositiveIntegerField(default=0, help_text="Already in their bank")
+    file_errors = models.JSONField(default=list, blank=True, help_text="[{'path': ..., 'error': ...}]")
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def __str__(self):
+        return f"Import {self.id} ({self.status}, {self.files_done}/{self.total_files} files)"
+
+
+class ImportedFile(models.Model):
+    """A pool file as last imported into a course, keyed by its path from the pool directory"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='imported_files')
+    path = models.CharField(max_length=500, help_text="e.g. questionPool/recursion or quizPool/week3.txt")
+    sha256 = models.CharField(max_length=64)
+    job = models.ForeignKey(ImportJob, on_delete=models.SET_NULL, null=True, blank=True, related_name='files')
+    questions = models.PositiveIntegerField(default=0, help_text="Questions created from this version")
+    imported_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['course', 'path']
+
+    def __str__(self):
+        return f"{self.course.code}/{self.path}"
+
+
+class QuestionSignature(models.Model):
+    """MinHash signature of a question's normalized text, kept in sync on save"""
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='signature')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    fingerprint = models.CharField(max_length=32)
+    minhash = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"Signature of Question {self.question_id}"
+
+    @classmethod
+    def update_for(cls, questions):
+        """(Re)build signatures and LSH band keys for questions whose text or course changed"""
+        from .fingerprint import minhash, band_keys
+        questions = [q for q in questions]
+        current = {
+            s.question_id: s for s in cls.objects.filter(question_id__in=[q.id for q in questions])
+        }
+        changed = [
+            q for q in questions
+            if q.id not in current
+            or current[q.id].fingerprint != q.fingerprint
+            or current[q.id].course_id != q.course_id
+        ]
+        if not changed:
+            return 0
+        ids = [q.id for q in changed]
+        signatures, keys, by_text = [], [], {}
+        for q in changed:
+            if q.text not in by_text:  # linked copies share their text
+                by_text[q.text] = minhash(q.text)
+            sig = by_text[q.text]
+            signatures.append(cls(question_id=q.id, course_id=q.course_id, fingerprint=q.fingerprint, minhash=sig))
+            keys += [QuestionBandKey(question_id=q.id, course_id=q.course_id, key=k) for k in band_keys(sig)]
+        cls.objects.filter(question_id__in=ids).delete()
+        QuestionBandKey.objects.filter(question_id__in=ids).delete()
+        cls.objects.bulk_create(signatures)
+        QuestionBandKey.objects.bulk_create(keys)
+        return len(changed)
+
+    @classmethod
+    def similar_to(cls, text, course_id, exclude_id=None, threshold=None):
+        """[(question_id, similarity)] of live questions in a course that look like `text`.
+
+        Two indexed lookups: LSH band keys for candidates, then their signatures.
+        """
+        from .fingerprint import minhash, band_keys, similarity, SIMILARITY_THRESHOLD
+        threshold = SIMILARITY_THRESHOLD if threshold is None else threshold
+        sig = minhash(text)
+        candidates = QuestionBandKey.objects.filter(
+            course_id=course_id, key__in=band_keys(sig), question__deleted_at__isnull=True
+        ).exclude(question_id=exclude_id).values_list('question_id', flat=True).distinct()
+        matches = []
+        for other in cls.objects.filter(question_id__in=list(candidates)):
+            score = similarity(sig, other.minhash)
+            if score >= threshold:
+                matches.append((other.question_id, round(score, 2)))
+        return sorted(matches, key=lambda m: -m[1])
+
+
+class QuestionBandKey(models.Model):
+    """One LSH band of a question's signature; shared keys mark near-duplicate candidates"""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='band_keys')
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    key = models.CharField(max_length=16)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['course', 'key']),
+        ]
+
+
+class DuplicateCluster(models.Model):
+    """A group of near-duplicate questions in a course, computed by `cluster_duplicates`"""
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='duplicate_clusters')
+    questions = models.ManyToManyField(Question, related_name='duplicate_clusters')
+    size = models.PositiveIntegerField()
+    similarity = models.FloatField(help_text="Lowest similarity of the pairs that joined the cluster")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-size', '-similarity']
+
+    def __str__(self):
+        return f"{self.course.code}: {self.size} similar questions"
+
+    MAX_BUCKET_PAIRS = 50
+
+    @classmethod
+    def rebuild_for_course(cls, course, threshold=None):
+        """Recompute the course's clusters from the stored signatures. Returns the new clusters."""
+        from django.db import transaction
+        from .fingerprint import similarity, SIMILARITY_THRESHOLD
+        threshold = SIMILARITY_THRESHOLD if threshold is None else threshold
+
+        # Questions sharing an LSH band key are candidates
+        buckets = {}
+        rows = QuestionBandKey.objects.filter(
+            course=course, question__deleted_at__isnull=True
+        ).order_by().values_list('key', 'question_id')
+        for key, qid in rows:
+            buckets.setdefault(key, []).append(qid)
+        candidates = [b for b in buckets.values() if len(b) > 1]
+        if not candidates:
+            with transaction.atomic():
+                cls.objects.filter(course=course).delete()
+            return []
+
+        ids = {qid for bucket in candidates for qid in bucket}
+        signatures = dict(QuestionSignature.objects.filter(question_id__in=ids).values_list('question_id', 'minhash'))
+
+        # Union-find over verified pairs, remembering the weakest link per root
+        parent = {}
+        weakest = {}
+
+        def find(x):
+            parent.setdefault(x, x)
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        checked = set()
+        for bucket in candidates:
+            if len(bucket) > cls.MAX_BUCKET_PAIRS:
+                pairs = [(bucket[0], other) for other in bucket[1:]]
+            else:
+                pairs = [(a, b) for i, a in enumerate(bucket) for b in bucket[i + 1:]]
+            for a, b in pairs:
+                if (a, b) in checked:
+                    continue
+                checked.add((a, b))
+                score = similarity(signatures.get(a), signatures.get(b))
+                if score < threshold:
+                    continue
+                ra, rb = find(a), find(b)
+                low = min(score, weakest.get(ra, 1.0), weakest.get(rb, 1.0))
+                if ra != rb:
+                    parent[rb] = ra
+                weakest[ra] = low
+
+        groups = {}
+        for qid in parent:
+            groups.setdefault(find(qid), []).append(qid)
+        groups = {root: members for root, members in groups.items() if len(members) > 1}
+
+        with transaction.atomic():
+            cls.objects.filter(course=course).delete()
+            clusters = cls.objects.bulk_create([
+                cls(course=course, size=len(members), similarity=round(weakest.get(root, 1.0), 2))
+                for root, members in groups.items()
+            ])
+            Through = cls.questions.through
+            Through.objects.bulk_create([
+                Through(duplicatecluster_id=cluster.id, question_id=qid)
+                for cluster, members in zip(clusters, groups.values())
+                for qid in members
+            ])
+        return clusters
+
+
 def question_image_path(instance, filename):
     """Generate upload path for question images"""
     import os
@@ -335,9 +903,18 @@ def question_image_path(instance, filename):
 
 
 class QuestionImage(models.Model):
-    """Images attached to questions"""
+    """Images attached to questions.
+
+    Uploads are stored once per content hash and shared by every row with
+    that hash; `renditions` maps a kind (see questions/images.py) to the
+    derived file generated for it.
+    """
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='images', null=True, blank=True)
     image = models.ImageField(upload_to='question_images/')
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    renditions = models.JSONField(default=dict, blank=True)
     alt_text = models.CharField(max_length=200, blank=True, help_text="Alternative text for accessibility")
     caption = models.CharField(max_length=500, blank=True)
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
@@ -345,6 +922,10 @@ class QuestionImage(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Orphan collection
+            models.Index(fields=['created_at'], condition=models.Q(question__isnull=True), name='questionimage_orphan'),
+        ]
 
     def __str__(self):
         return f"Image for Q{self.question_id}: {self.alt_text or self.image.name}"
@@ -353,9 +934,16 @@ class QuestionImage(models.Model):
     def markdown_ref(self):
         """Return markdown reference to embed this image"""
         alt = self.alt_text or "image"
-        return f"![{alt}]({self.image.url})"
+        return f"![{alt}]({self.rendition_url('web')})"
+
+    def rendition_url(self, kind):
+        """URL of a derived rendition, or of the original until it has been generated"""
+        name = self.renditions.get(kind)
+        return self.image.storage.url(name) if name else self.image.url
 
     @property
     def latex_ref(self):
-        """Return LaTeX reference for PDF generation"""
-        return f"\\includegraphics[width=0.8\\textwidth]{{{self.image.path}}}"
+        """Return LaTeX reference for PDF generation (the size-capped print rendition)"""
+        name = self.renditions.get('print')
+        path = self.image.storage.path(name) if name else self.image.path
+        return f"\\includegraphics[width=0.8\\textwidth]{{{path}}}"
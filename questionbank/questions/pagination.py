@@ -0,0 +1,171 @@
+"""
+Pagination for the question list.
+
+Page numbers (?page=N) stay the default. Passing ?cursor= (empty for the
+first page) switches to keyset pagination: each page is fetched with
+`WHERE (sort_key, id) < (last_key, last_id)` instead of COUNT + OFFSET, so
+page 1000 costs the same as page 1. Follow `next` until it is null.
+"""
+import base64
+import binascii
+import json
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+COUNT_CACHE_KEY = 'questions:list-count:{}'
+COUNT_CACHE_TIMEOUT = 600
+
+
+def estimated_course_count(course_id):
+    """Number of questions the list shows for a course (ignoring other filters), cached"""
+    from .models import Question
+    key = COUNT_CACHE_KEY.format(course_id)
+    count = cache.get(key)
+    if count is None:
+        count = Question.objects.filter(
+            course_id=course_id, canonical__isnull=True
+        ).filter(
+            Q(block__isnull=True) | Q(variant_number__isnull=True) | Q(variant_number=1)
+        ).count()
+        cache.set(key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def invalidate_course_count(course_id):
+    if course_id:
+        cache.delete(COUNT_CACHE_KEY.format(course_id))
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination keyed on (ordering field, id).
+
+    Works for any ordering on a real model field. Orderings on computed
+    values (e.g. search rank) fall back to an offset stored in the cursor.
+    """
+    page_size = 500
+    page_size_query_param = 'page_size'
+    max_page_size = 2000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            return json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (ValueError, binascii.Error, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        encoded = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    @staticmethod
+    def _get(row, name):
+        # Rows are model instances, or dicts on the fast list path (see fastlist.py)
+        return row[name] if isinstance(row, dict) else getattr(row, name)
+
+    @staticmethod
+    def _key_value(value):
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        ordering = list(queryset.query.order_by) or ['-id']
+        first = ordering[0]
+        field = first.lstrip('-')
+        keyed = field in {f.name for f in queryset.model._meta.concrete_fields}
+        sort = first if keyed else ','.join(ordering)
+
+        if cursor is not None and cursor.get('o') != sort:
+            raise NotFound(self.invalid_cursor_message)
+
+        if keyed:
+            descending = first.startswith('-')
+            queryset = queryset.order_by(first, '-id' if descending else 'id')
+            if cursor is not None:
+                after = 'lt' if descending else 'gt'
+                queryset = queryset.filter(
+                    Q(**{f'{field}__{after}': cursor['v']}) |
+                    Q(**{field: cursor['v'], f'id__{after}': cursor['id']})
+                )
+            rows = list(queryset[:self.page_size + 1])
+        else:
+            offset = cursor['n'] if cursor is not None else 0
+            rows = list(queryset[offset:offset + self.page_size + 1])
+
+        self.next_url = None
+        if len(rows) > self.page_size:
+            rows = rows[:self.page_size]
+            last = rows[-1]
+            if keyed:
+                position = {'o': sort, 'v': self._key_value(self._get(last, field)), 'id': self._get(last, 'id')}
+            else:
+                position = {'o': sort, 'n': offset + self.page_size}
+            self.next_url = self.encode_cursor(position)
+
+        self.estimated_count = self.estimate(rows, request)
+        return rows
+
+    def estimate(self, rows, request):
+        """Approximate total for lists filtered to ?course=, None otherwise"""
+        if not request.query_params.get('course'):
+            return None
+        return estimated_course_count(self._get(rows[0], 'course_id')) if rows else 0
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_url,
+            'estimated_count': self.estimated_count,
+            'results': data,
+        })
+
+
+class HistoryPagination(KeysetPagination):
+    """Keyset pages of a question's version history"""
+    page_size = 20
+    max_page_size = 200
+
+    def estimate(self, rows, request):
+        return None  # versions aren't a course list, whatever ?course= says
+
+
+class QuestionPagination(PageNumberPagination):
+    """Page numbers by default (up to 2000 rows); keyset cursors when ?cursor= is present"""
+    page_size = 500
+    page_size_query_param = 'page_size'
+    max_page_size = 2000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if KeysetPagination.cursor_query_param in request.query_params:
+            self.keyset = KeysetPagination()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,97 @@
+"""
+Push a canonical question's content to its linked copies.
+
+Question.sync_from_canonical() updates one copy per click. Here every copy
+of a canonical question whose text, answer_data or question_type differs
+is updated in one bulk_update, and each copy's previous content is kept as
+a QuestionVersion, written in one bulk_create (see history.py). Copies in
+courses the user can't edit are reported and left alone.
+
+Opt-in, from GET/POST /api/questions/<id>/propagate/ (GET is the dry run)
+or ?propagate=1 on a question update. bulk_update bypasses save() and the
+post_save signals, so the hashes, search index, duplicate signatures, list
+counts, usage rollups and content versions are handled here.
+"""
+import hashlib
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import access, history, search, versioning
+from .fingerprint import fingerprint
+from .models import CourseUsage, Question, QuestionSignature
+from .pagination import invalidate_course_count
+
+FIELDS = ('text', 'answer_data', 'question_type')
+EDITABLE = (access.OWNER, 'edit')
+
+
+def plan(canonical, user, lock=False):
+    """What propagating `canonical` would do: (copies to update, {copy: changed fields}, [skipped])
+
+    `lock` holds the copies' rows (select_for_update) until the transaction ends.
+    """
+    permissions = access.get_access(user)['courses']
+    copies = canonical.linked_questions.select_related('course').order_by('id')
+    if lock:
+        copies = copies.select_for_update(of=('self',))
+    copies = list(copies)
+    updates, changed, skipped = [], {}, []
+    for copy in copies:
+        fields = [name for name in FIELDS if getattr(copy, name) != getattr(canonical, name)]
+        if not fields:
+            continue
+        if permissions.get(copy.course_id) not in EDITABLE:
+            skipped.append({'id': copy.id, 'course_code': copy.course.code if copy.course else None,
+                            'error': 'Read-only course'})
+            continue
+        updates.append(copy)
+        changed[copy.id] = fields
+    return updates, changed, skipped
+
+
+def dry_run(canonical, user):
+    """The copies propagation would change, with the fields that differ"""
+    updates, changed, skipped = plan(canonical, user)
+    return {
+        'canonical': canonical.id,
+        'linked': canonical.linked_questions.count(),
+        'changes': [
+            {'id': copy.id, 'course_code': copy.course.code if copy.course else None, 'fields': changed[copy.id]}
+            for copy in updates
+        ],
+        'skipped': skipped,
+    }
+
+
+def propagate(canonical, user):
+    """Copy `canonical`'s content to its linked copies. Returns (updated ids, [skipped])."""
+    with transaction.atomic():
+        # Locked, so a concurrent edit of a copy can't take the version number recorded here
+        updates, changed, skipped = plan(canonical, user, lock=True)
+        if not updates:
+            return [], skipped
+
+        ids = [copy.id for copy in updates]
+        previous = [(copy.id, copy.text, copy.answer_data) for copy in updates]
+
+        now = timezone.now()
+        # What save() would set, computed once for every copy
+        hashes = (hashlib.md5(canonical.text.encode()).hexdigest(), fingerprint(canonical.text))
+        for copy in updates:
+            for name in FIELDS:
+                setattr(copy, name, getattr(canonical, name))
+            copy.content_hash, copy.fingerprint = hashes
+            copy.updated_at = now
+
+        history.record(previous, user, f'Before update from canonical question {canonical.id}')
+        Question.all_objects.bulk_update(updates, [*FIELDS, 'content_hash', 'fingerprint', 'updated_at'])
+        search.index_questions(ids)
+        QuestionSignature.update_for(updates)
+        courses = {copy.course_id for copy in updates}
+        versioning.bump(courses)
+
+    for course_id in courses:
+        invalidate_course_count(course_id)
+    CourseUsage.objects.filter(course_id__in=courses, stale=False).update(stale=True)
+    return ids, skipped
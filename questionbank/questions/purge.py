@@ -0,0 +1,118 @@
+"""
+Permanent deletion of trashed questions in bounded batches.
+
+A cascading delete() over a whole trash makes Django collect every version,
+image, exam question and response row in memory and send post_delete for
+each question, which times out the worker and holds locks on big courses.
+Here each batch of PURGE_BATCH_SIZE questions is deleted in its own short
+transaction with set-based SQL: one DELETE per dependent table, one for the
+questions, and the bookkeeping the post_delete signal would do (search
+index, list counts, usage rollups, content versions, sync tombstones) once
+per batch. Image files and their renditions are removed after their batch
+commits, unless another image row still uses them.
+
+POST /api/questions/empty_trash/ creates a PurgeJob and returns its id at
+once; `run_purge_jobs` works through pending jobs and records progress on
+them. A job only ever deletes questions that are still in the trash, so a
+job interrupted by a crash is picked up again (see jobs.py) and finished.
+"""
+
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import images, search, versioning
+from .models import CourseUsage, PurgeJob, Question, QuestionImage, Tombstone
+from .pagination import invalidate_course_count
+
+PURGE_BATCH_SIZE = 500
+
+
+def trashed(job):
+    """The questions `job` may still delete"""
+    user = job.requested_by
+    questions = Question.all_objects.filter(
+        Q(course__owner=user) | Q(created_by=user), deleted_at__isnull=False, deleted_at__lte=job.created_at
+    )
+    if job.question_ids is not None:
+        questions = questions.filter(id__in=job.question_ids)
+    return questions
+
+
+def _delete_dependents(ids):
+    """Delete (or detach) every row that points at these questions"""
+    for rel in Question._meta.related_objects:
+        if rel.many_to_many:
+            through = rel.through
+            through.objects.filter(**{f'{rel.field.m2m_reverse_field_name()}__in': ids}).delete()
+        elif rel.on_delete is models.SET_NULL:
+            rel.related_model._base_manager.filter(**{f'{rel.field.name}__in': ids}).update(**{rel.field.name: None})
+        else:
+            rel.related_model._base_manager.filter(**{f'{rel.field.name}__in': ids}).delete()
+    for field in Question._meta.many_to_many:
+        field.remote_field.through.objects.filter(**{f'{field.m2m_field_name()}__in': ids}).delete()
+
+
+def purge(ids):
+    """Permanently delete the trashed questions among `ids`.
+
+    Returns (questions deleted, image files removed).
+    """
+    with transaction.atomic():
+        rows = dict(
+            Question.all_objects.select_for_update().filter(id__in=ids, deleted_at__isnull=False)
+            .values_list('id', 'course_id')
+        )
+        ids = list(rows)
+        if not ids:
+            return 0, 0
+        files = list(QuestionImage.objects.filter(question_id__in=ids).values_list('image', 'sha256'))
+        copies = dict(Question.all_objects.filter(canonical_id__in=ids).exclude(id__in=ids).values_list(
+            'id', 'course_id'))
+
+        _delete_dependents(ids)
+        if copies:
+            # Copies of a purged question become standalone; let synced clients see it
+            Question.all_objects.filter(id__in=copies).update(updated_at=timezone.now())
+        # Nothing points at these rows any more, so skip the collector and
+        # the per-row post_delete bookkeeping (done once for the batch below)
+        Question.all_objects.filter(id__in=ids)._raw_delete(Question.all_objects.db)
+
+        search.unindex_questions(ids)
+        by_course = {}
+        for pk, course_id in rows.items():
+            by_course.setdefault(course_id, []).append(pk)
+        for course_id, pks in by_course.items():
+            Tombstone.record('question', pks, course_id)
+        courses = set(by_course) | set(copies.values())
+        versioning.bump(courses, tags=True)
+
+    for course_id in courses:
+        invalidate_course_count(course_id)
+    CourseUsage.objects.filter(course_id__in=courses, stale=False).update(stale=True)
+    return len(ids), images.delete_files(files) if files else 0
+
+
+def run(job, batch_size=PURGE_BATCH_SIZE, progress=None):
+    """Purge `job` batch by batch, saving progress (and calling `progress(job)`) after each"""
+    job.total = job.deleted + trashed(job).count()
+    job.save(update_fields=['total', 'updated_at'])
+    try:
+        while True:
+            ids = list(trashed(job).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            deleted, files = purge(ids)
+            job.deleted += deleted
+            job.files_deleted += files
+            job.save(update_fields=['deleted', 'files_deleted', 'updated_at'])
+            if progress:
+                progress(job)
+    except Exception as e:
+        job.status = PurgeJob.Status.FAILED
+        job.error = str(e)
+    else:
+        job.status = PurgeJob.Status.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+    return job
@@ -0,0 +1,246 @@
+"""
+Full-text search index for questions.
+
+PostgreSQL: a stored `search_vector` tsvector column on questions_question
+with a GIN index.  SQLite: an FTS5 table, `questions_question_fts`, whose
+rowid is the question id.  Neither is a model field; both are created by
+migration 0011 and kept in sync from the signals in questions/signals.py.
+Run `python manage.py rebuild_search_index` after bulk changes that bypass
+signals (queryset.update(), bulk_create(), raw SQL).
+
+Documents have three weighted parts: question text (A), tag names (B) and
+the strings inside answer_data (C).
+"""
+import re
+from django.db import connection, transaction, OperationalError, ProgrammingError
+
+
+FTS_TABLE = 'questions_question_fts'
+QUESTION_TABLE = 'questions_question'
+PG_CONFIG = 'english'
+SNIPPET_START = '<mark>'
+SNIPPET_STOP = '</mark>'
+BATCH_SIZE = 500
+
+_backend = {}
+
+
+def backend():
+    """'postgres', 'fts5', or None if the index isn't available."""
+    alias = connection.settings_dict['NAME']
+    if alias not in _backend:
+        if connection.vendor == 'postgresql':
+            columns = [c.name for c in connection.introspection.get_table_description(
+                connection.cursor(), QUESTION_TABLE)]
+            _backend[alias] = 'postgres' if 'search_vector' in columns else None
+        elif connection.vendor == 'sqlite':
+            _backend[alias] = 'fts5' if FTS_TABLE in connection.introspection.table_names() else None
+        else:
+            _backend[alias] = None
+    return _backend[alias]
+
+
+# ==========================================
+# Schema (used by migration 0011)
+# ==========================================
+
+def create_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'ALTER TABLE {QUESTION_TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector')
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS questions_q_search_gin ON {QUESTION_TABLE} USING GIN (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+                f"USING fts5(text, tags, answers, tokenize='porter unicode61')"
+            )
+            # Default ranking for the `rank` column: bm25 weighted text > tags > answers
+            schema_editor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25(10.0, 4.0, 1.0)')"
+            )
+        except OperationalError:
+            # SQLite built without FTS5: search falls back to icontains
+            pass
+    _backend.clear()
+
+
+def drop_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS questions_q_search_gin')
+        schema_editor.execute(f'ALTER TABLE {QUESTION_TABLE} DROP COLUMN IF EXISTS search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+    _backend.clear()
+
+
+# ==========================================
+# Indexing
+# ==========================================
+
+def _answer_strings(data):
+    """Flatten the string values of answer_data"""
+    if isinstance(data, str):
+        yield data
+    elif isinstance(data, dict):
+        for value in data.values():
+            yield from _answer_strings(value)
+    elif isinstance(data, (list, tuple)):
+        for value in data:
+            yield from _answer_strings(value)
+
+
+def _documents(Question, ids):
+    tags = {}
+    rows = Question.tags.through.objects.filter(question_id__in=ids).values_list('question_id', 'tag__name')
+    for pk, name in rows:
+        tags.setdefault(pk, []).append(name)
+    for pk, text, answer_data in Question._base_manager.filter(id__in=ids).values_list('id', 'text', 'answer_data'):
+        yield pk, text, ' '.join(tags.get(pk, ())), ' '.join(_answer_strings(answer_data))
+
+
+def index_questions(ids, Question=None):
+    """(Re)index the given question ids. Ids that no longer exist are dropped."""
+    kind = backend()
+    if not kind:
+        return 0
+    if Question is None:
+        from .models import Question
+    ids = list(ids)
+    count = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), BATCH_SIZE):
+            chunk = ids[start:start + BATCH_SIZE]
+            docs = list(_documents(Question, chunk))
+            if kind == 'postgres':
+                cursor.executemany(
+                    f"UPDATE {QUESTION_TABLE} SET search_vector = "
+                    f"setweight(to_tsvector('{PG_CONFIG}', %s), 'A') || "
+                    f"setweight(to_tsvector('{PG_CONFIG}', %s), 'B') || "
+                    f"setweight(to_tsvector('{PG_CONFIG}', %s), 'C') WHERE id = %s",
+                    [(text, tags, answers, pk) for pk, text, tags, answers in docs]
+                )
+            else:
+                placeholders = ','.join(['%s'] * len(chunk))
+                cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', chunk)
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, text, tags, answers) VALUES (%s, %s, %s, %s)',
+                    docs
+                )
+            count += len(docs)
+    return count
+
+
+def unindex_questions(ids):
+    """Remove deleted questions from the FTS5 table (Postgres rows carry their own vector)"""
+    ids = list(ids)
+    if backend() != 'fts5' or not ids:
+        return
+    with connection.cursor() as cursor:
+        placeholders = ','.join(['%s'] * len(ids))
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', ids)
+
+
+def rebuild_index(Question=None):
+    """Reindex every question. Returns the number of questions indexed."""
+    kind = backend()
+    if not kind:
+        return 0
+    if Question is None:
+        from .models import Question
+    ids = list(Question._base_manager.order_by('id').values_list('id', flat=True))  # trash is searchable too
+    count = 0
+    with transaction.atomic():
+        if kind == 'fts5':
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        for start in range(0, len(ids), BATCH_SIZE):
+            count += index_questions(ids[start:start + BATCH_SIZE], Question)
+    if kind == 'fts5':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return count
+
+
+# ==========================================
+# Querying
+# ==========================================
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def _match_expression(terms, kind):
+    # Every word must match, each as a prefix (like the old icontains search)
+    if kind == 'postgres':
+        return ' & '.join(f'{t}:*' for t in terms)
+    return ' '.join(f'"{t}"*' for t in terms)
+
+
+def search(queryset, query):
+    """Filter a Question queryset to matches of `query`, best first.
+
+    Returns None when no index is available so the caller can fall back.
+    Each row gets a `_search_rank`; use attach_snippets() for highlights.
+    """
+    kind = backend()
+    if not kind:
+        return None
+    terms = _terms(query)
+    if not terms:
+        return queryset.extra(select={'_search_rank': '0'})
+    match = _match_expression(terms, kind)
+    if kind == 'postgres':
+        tsquery = f"to_tsquery('{PG_CONFIG}', %s)"
+        return queryset.extra(
+            select={'_search_rank': f'ts_rank({QUESTION_TABLE}.search_vector, {tsquery})'},
+            select_params=[match],
+            where=[f'{QUESTION_TABLE}.search_vector @@ {tsquery}'],
+            params=[match],
+        ).order_by('-_search_rank', '-updated_at')
+    # `rank` is the weighted bm25() set up in create_index(), lower is better.
+    # (bm25() itself can't be called once Django wraps the query for COUNT/DISTINCT.)
+    return queryset.extra(
+        select={'_search_rank': f'-{FTS_TABLE}.rank'},
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE} MATCH %s', f'{FTS_TABLE}.rowid = {QUESTION_TABLE}.id'],
+        params=[match],
+    ).order_by('-_search_rank', '-updated_at')
+
+
+def snippets(ids, query):
+    """{question id: highlighted text excerpt} for the given ids, in one query"""
+    kind = backend()
+    terms = _terms(query)
+    if not kind or not terms or not ids:
+        return {}
+    match = _match_expression(terms, kind)
+    placeholders = ','.join(['%s'] * len(ids))
+    if kind == 'postgres':
+        sql = (
+            f"SELECT id, ts_headline('{PG_CONFIG}', text, to_tsquery('{PG_CONFIG}', %s), "
+            f"'StartSel={SNIPPET_START},StopSel={SNIPPET_STOP},MaxWords=30,MinWords=10,MaxFragments=2') "
+            f"FROM {QUESTION_TABLE} WHERE id IN ({placeholders})"
+        )
+    else:
+        sql = (
+            f"SELECT rowid, snippet({FTS_TABLE}, 0, '{SNIPPET_START}', '{SNIPPET_STOP}', '...', 24) "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({placeholders})"
+        )
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [match] + list(ids))
+            return dict(cursor.fetchall())
+    except (OperationalError, ProgrammingError):
+        return {}
+
+
+def attach_snippets(questions, query):
+    """Set `_search_snippet` (highlighted text excerpt) on a page of questions in one query"""
+    questions = list(questions)
+    found = snippets([q.id for q in questions], query)
+    for q in questions:
+        q._search_snippet = found.get(q.id)
@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Tag, Course, QuestionBank, QuestionBlock, Question, QuestionVersion, Week, CourseShare, QuestionBankShare, QuestionImage
+from django.db.models import Count
+from django.db.models.functions import Substr
+from . import search
+from .fastlist import ValuesSerializer
+from .models import Tag, Course, QuestionBank, QuestionBlock, Question, QuestionVersion, Week, CourseShare, QuestionBankShare, QuestionImage, PurgeJob, ImportJob, count_subquery
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -18,9 +22,18 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'color', 'question_count']
 
     def get_question_count(self, obj):
+        # Use annotated value if available (from list views)
+        if hasattr(obj, '_question_count'):
+            return obj._question_count
         return obj.questions.count()
 
 
+class TagValuesSerializer(ValuesSerializer):
+    """TagSerializer for the tag list's values() rows (see fastlist.py)"""
+    serializer_class = TagSerializer
+    columns = {'question_count': '_question_count'}
+
+
 class CourseSerializer(serializers.ModelSerializer):
     question_count = serializers.SerializerMethodField()
     owner_username = serializers.CharField(source='owner.username', read_only=True, allow_null=True)
@@ -33,17 +46,23 @@ class CourseSerializer(serializers.ModelSerializer):
         read_only_fields = ['owner']
 
     def get_question_count(self, obj):
+        # Use annotated value if available (from list view)
+        if hasattr(obj, '_question_count'):
+            return obj._question_count
         return obj.questions.count()
 
     def get_is_owner(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.owner == request.user
+            return obj.owner_id == request.user.id
         return False
 
     def get_is_shared(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated and obj.owner != request.user:
+        if request and request.user.is_authenticated and obj.owner_id != request.user.id:
+            # Use annotated value if available (from list view)
+            if hasattr(obj, '_is_shared'):
+                return obj._is_shared
             return obj.shares.filter(shared_with=request.user).exists()
         return False
 
@@ -84,16 +103,34 @@ class QuestionBankSerializer(serializers.ModelSerializer):
     def get_is_owner(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return obj.owner == request.user
+            return obj.owner_id == request.user.id
         return False
 
     def get_is_shared(self, obj):
         request = self.context.get('request')
-        if request and request.user.is_authenticated and obj.owner != request.user:
+        if request and request.user.is_authenticated and obj.owner_id != request.user.id:
+            # Use annotated value if available (from list view)
+            if hasattr(obj, '_is_shared'):
+                return obj._is_shared
             return obj.shares.filter(shared_with=request.user).exists()
         return False
 
 
+class QuestionBankValuesSerializer(ValuesSerializer):
+    """QuestionBankSerializer for the bank list's values() rows (see fastlist.py)"""
+    serializer_class = QuestionBankSerializer
+    columns = {'is_shared': '_is_shared'}
+    computed = ('is_owner',)
+
+    def extend(self, rows, context):
+        request = context.get('request')
+        user_id = request.user.id if request and request.user.is_authenticated else None
+        for row in rows:
+            row['is_owner'] = user_id is not None and row['owner'] == user_id
+            if row['is_owner'] or user_id is None:
+                row['_is_shared'] = False
+
+
 class QuestionBankShareSerializer(serializers.ModelSerializer):
     shared_with_username = serializers.CharField(source='shared_with.username', read_only=True)
     shared_by_username = serializers.CharField(source='shared_by.username', read_only=True)
@@ -114,10 +151,61 @@ class QuestionBlockSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'question_bank', 'bank_name', 'course_code', 'max_questions', 'description', 'question_count', 'created_at', 'updated_at']
 
     def get_question_count(self, obj):
+        # Use annotated value if available (from list view)
+        if hasattr(obj, '_question_count'):
+            return obj._question_count
         return obj.questions.count()
 
 
-class QuestionListSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Honours the `fieldset` in the serializer context (see fieldsets.py).
+
+    Drops unrequested readable fields, renders tags as ids in compact mode
+    and truncates text. Write-only fields are left alone.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fieldset = self.context.get('fieldset')
+        if fieldset is None:
+            return
+        for name, field in list(self.fields.items()):
+            if not field.write_only and name not in fieldset:
+                self.fields.pop(name)
+        if 'tags' in self.fields and fieldset.tag_ids:
+            self.fields['tags'] = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        fieldset = self.context.get('fieldset')
+        if fieldset is not None and 'text' in data:
+            data['text'] = fieldset.truncate(data['text'])
+        return data
+
+
+def block_variants(block_ids):
+    """{block id: [variant summary]} for the given blocks, in one query.
+
+    Only the first 151 characters of each variant's text are fetched for
+    the preview.
+    """
+    if not block_ids:
+        return {}
+    variants = {}
+    rows = Question.objects.filter(block_id__in=block_ids).order_by(
+        'block_id', 'variant_number', 'id'
+    ).values_list('block_id', 'id', 'question_type', 'points', Substr('text', 1, 151))
+    for block_id, pk, question_type, points, preview in rows:
+        variants.setdefault(block_id, []).append({
+            'id': pk,
+            'type': question_type,
+            'text': preview[:150] + ('...' if len(preview) > 150 else ''),
+            'points': int(points)
+        })
+    return variants
+
+
+class QuestionListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Lightweight serializer for list views"""
     tags = TagSerializer(many=True, read_only=True)
     course_code = serializers.CharField(source='course.code', read_only=True)
@@ -130,6 +218,7 @@ class QuestionListSerializer(serializers.ModelSerializer):
     block_samples = serializers.SerializerMethodField()
     week_number = serializers.IntegerField(source='week.number', read_only=True, allow_null=True)
     week_name = serializers.CharField(source='week.name', read_only=True, allow_null=True)
+    search_snippet = serializers.SerializerMethodField()
 
     class Meta:
         model = Question
@@ -139,6 +228,7 @@ class QuestionListSerializer(serializers.ModelSerializer):
             'is_bonus', 'is_required', 'canonical', 'linked_count',
             'block', 'block_name', 'block_max_questions', 'variant_number', 'block_variant_count', 'block_types', 'block_samples',
             'week', 'week_number', 'week_name',
+            'search_snippet',
             'deleted_at',
             'created_at', 'updated_at'
         ]
@@ -168,9 +258,13 @@ class QuestionListSerializer(serializers.ModelSerializer):
         """Get all variants in the block with their types"""
         if not obj.block:
             return None
+        # Use variants attached for the whole page if available (from list view)
+        if hasattr(obj, '_block_types'):
+            return obj._block_types or None
+        block_questions = obj.block.questions.all().order_by('variant_number')
         # Return list of all variants with id, type, text preview, and points
         variants = []
-        for q in obj.block.questions.all().order_by('variant_number'):
+        for q in block_questions:
             variants.append({
                 'id': q.id,
                 'type': q.question_type,
@@ -183,8 +277,83 @@ class QuestionListSerializer(serializers.ModelSerializer):
         """Deprecated - data is now in block_types"""
         return None
 
-
-class QuestionDetailSerializer(serializers.ModelSerializer):
+    def get_search_snippet(self, obj):
+        """Highlighted excerpt for ?search= results (<mark>...</mark>), else None"""
+        return getattr(obj, '_search_snippet', None)
+
+
+class QuestionValuesSerializer(ValuesSerializer):
+    """QuestionListSerializer for the question list's values() rows (see fastlist.py).
+
+    Tags, block variants, linked counts and search snippets take one query
+    each per page, as the prefetches and attach_* helpers do for instances,
+    and only when the fieldset asks for them.
+    """
+    serializer_class = QuestionListSerializer
+    computed = ('tags', 'linked_count', 'block_variant_count', 'block_types', 'block_samples', 'search_snippet')
+    requires = {
+        'linked_count': ('canonical',),
+        'block_variant_count': ('block',),
+        'block_types': ('block',),
+    }
+    hidden = ('id', 'course_id')
+    optional = ('_linked_count',)
+
+    def extend(self, rows, context):
+        fieldset = context.get('fieldset')
+        wants = fieldset.wants if fieldset is not None else (lambda *names: True)
+        ids = [row['id'] for row in rows]
+
+        if wants('tags'):
+            tags = {}
+            through = Question.tags.through.objects.filter(question_id__in=ids).order_by('tag__name')
+            if fieldset is not None and fieldset.tag_ids:
+                for question_id, tag_id in through.values_list('question_id', 'tag_id'):
+                    tags.setdefault(question_id, []).append(tag_id)
+            else:
+                through = through.annotate(
+                    question_count=count_subquery(Question.tags.through.objects, 'tag', outer='tag_id')
+                ).values_list('question_id', 'tag_id', 'tag__name', 'tag__color', 'question_count')
+                for question_id, tag_id, name, color, count in through:
+                    tags.setdefault(question_id, []).append(
+                        {'id': tag_id, 'name': name, 'color': color, 'question_count': count}
+                    )
+            for row in rows:
+                row['tags'] = tags.get(row['id'], [])
+
+        if wants('linked_count'):
+            if rows and '_linked_count' not in rows[0]:
+                # Trash lists aren't annotated: count every copy group on the page at once
+                groups = {row['canonical'] or row['id'] for row in rows}
+                copies = dict(Question.objects.filter(canonical_id__in=groups).order_by().values(
+                    'canonical_id').annotate(n=Count('*')).values_list('canonical_id', 'n'))
+                for row in rows:
+                    row['_linked_count'] = copies.get(row['canonical'] or row['id'], 0)
+            for row in rows:
+                linked = row['_linked_count'] or 0
+                row['linked_count'] = linked + 1 if linked > 0 or row['canonical'] else 0
+
+        if wants('block_types', 'block_variant_count'):
+            variants = block_variants({row['block'] for row in rows if row['block']})
+            for row in rows:
+                types = variants.get(row['block'], []) if row['block'] else None
+                row['block_types'] = types or None
+                row['block_variant_count'] = len(types) if types else 0
+
+        if wants('search_snippet'):
+            request = context.get('request')
+            query = request.query_params.get('search', '').strip() if request else ''
+            snippets = search.snippets(ids, query) if query else {}
+            for row in rows:
+                row['search_snippet'] = snippets.get(row['id'])
+
+        for row in rows:
+            row['block_samples'] = None
+            if fieldset is not None and 'text' in row:
+                row['text'] = fieldset.truncate(row['text'])
+
+
+class QuestionDetailSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Full serializer with answer data"""
     tags = TagSerializer(many=True, read_only=True)
     tag_ids = serializers.PrimaryKeyRelatedField(
@@ -228,19 +397,64 @@ class QuestionVersionSerializer(serializers.ModelSerializer):
         fields = ['id', 'version_number', 'text', 'answer_data', 'change_summary', 'created_by', 'created_at']
 
 
+class QuestionVersionSummarySerializer(serializers.ModelSerializer):
+    """A version without its content, for the history list"""
+    class Meta:
+        model = QuestionVersion
+        fields = ['id', 'version_number', 'is_snapshot', 'size', 'change_summary', 'created_by', 'created_at']
+
+
 class QuestionImageSerializer(serializers.ModelSerializer):
     markdown_ref = serializers.ReadOnlyField()
     url = serializers.SerializerMethodField()
+    web_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
 
     class Meta:
         model = QuestionImage
-        fields = ['id', 'question', 'image', 'url', 'alt_text', 'caption', 'markdown_ref', 'uploaded_by', 'created_at']
-        read_only_fields = ['uploaded_by', 'markdown_ref']
+        fields = ['id', 'question', 'image', 'url', 'web_url', 'thumbnail_url', 'width', 'height', 'alt_text',
+                  'caption', 'markdown_ref', 'uploaded_by', 'created_at']
+        read_only_fields = ['uploaded_by', 'markdown_ref', 'width', 'height']
 
-    def get_url(self, obj):
+    def _absolute(self, url):
         request = self.context.get('request')
-        if obj.image and request:
-            return request.build_absolute_uri(obj.image.url)
-        elif obj.image:
-            return obj.image.url
-        return None
+        return request.build_absolute_uri(url) if request else url
+
+    def get_url(self, obj):
+        return self._absolute(obj.image.url) if obj.image else None
+
+    def get_web_url(self, obj):
+        return self._absolute(obj.rendition_url('web')) if obj.image else None
+
+    def get_thumbnail_url(self, obj):
+        return self._absolute(obj.rendition_url('thumb')) if obj.image else None
+
+
+class PurgeJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PurgeJob
+        fields = ['id', 'status', 'total', 'deleted', 'files_deleted', 'progress', 'error',
+                  'created_at', 'started_at', 'finished_at']
+
+    def get_progress(self, obj):
+        """Fraction of the job done, 0 to 1"""
+        if obj.status == PurgeJob.Status.DONE:
+            return 1.0
+        return round(obj.deleted / obj.total, 3) if obj.total else 0.0
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'status', 'source', 'total_files', 'files_done', 'files_skipped', 'questions_created',
+                  'questions_existing', 'file_errors', 'progress', 'error', 'created_at', 'started_at', 'finished_at']
+
+    def get_progress(self, obj):
+        """Fraction of the files done, 0 to 1"""
+        if obj.status == ImportJob.Status.DONE:
+            return 1.0
+        return round(obj.files_done / obj.total_files, 3) if obj.total_files else 0.0
@@ -0,0 +1,164 @@
+"""
+Keep derived question data in sync: the full-text search index
+(questions/search.py), the cached per-course list counts
+(questions/pagination.py), the per-user access cache (questions/access.py),
+the CourseUsage dashboard rollups, near-duplicate signatures
+(QuestionSignature), the per-course content versions behind the list
+ETags (questions/versioning.py) and the Tombstone log read by delta sync
+(questions/sync.py).
+"""
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import (
+    Question, Tag, Course, CourseShare, QuestionBank, QuestionBankShare, QuestionBlock, Week, CourseUsage,
+    QuestionSignature, Tombstone
+)
+from . import access, search, versioning
+from .pagination import invalidate_course_count
+
+
+def _question_courses(ids):
+    return set(Question.all_objects.filter(id__in=list(ids)).values_list('course_id', flat=True))
+
+
+def _tagged(tag):
+    """Ids of every question with `tag`, trashed ones too (the trash is searchable)"""
+    return list(Question.tags.through.objects.filter(tag=tag).values_list('question_id', flat=True))
+
+
+@receiver(pre_save, sender=Question)
+@receiver(pre_save, sender=QuestionBank)
+def remember_previous_course(sender, instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_course_id = sender.objects.filter(pk=instance.pk).values_list(
+            'course_id', flat=True).first()
+
+
+@receiver(post_save, sender=Question)
+def index_saved_question(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_questions([instance.id])
+        invalidate_course_count(instance.course_id)
+        CourseUsage.mark_stale(instance.course_id)
+        QuestionSignature.update_for([instance])
+        previous = getattr(instance, '_previous_course_id', None)
+        if previous and previous != instance.course_id:
+            Tombstone.record('question', [instance.id], previous)
+        versioning.bump({instance.course_id, previous})
+
+
+@receiver(post_delete, sender=Question)
+def unindex_deleted_question(sender, instance, **kwargs):
+    search.unindex_questions([instance.id])
+    invalidate_course_count(instance.course_id)
+    CourseUsage.mark_stale(instance.course_id)
+    versioning.bump([instance.course_id], tags=True)  # its tag rows went with it
+    Tombstone.record('question', [instance.id], instance.course_id)
+
+
+@receiver(m2m_changed, sender=Question.tags.through)
+def index_retagged_questions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # tag.questions.clear(): remember who loses the tag
+        instance._search_cleared = _tagged(instance)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            ids = [instance.id]
+        elif action == 'post_clear':
+            ids = getattr(instance, '_search_cleared', [])
+        else:
+            ids = pk_set
+        search.index_questions(ids)
+        # The questions' tags changed: show that to delta sync (and in the list order)
+        Question.all_objects.filter(id__in=list(ids)).update(updated_at=timezone.now())
+        # Tag counts are part of the tag list
+        versioning.bump([instance.course_id] if not reverse else _question_courses(ids), tags=True)
+
+
+@receiver(post_save, sender=Tag)
+def index_renamed_tag(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        versioning.bump(tags=True)
+    else:
+        ids = _tagged(instance)
+        search.index_questions(ids)
+        versioning.bump(_question_courses(ids), tags=True)
+
+
+@receiver(pre_delete, sender=Tag)
+def remember_tagged_questions(sender, instance, **kwargs):
+    instance._search_tagged = _tagged(instance)
+
+
+@receiver(post_delete, sender=Tag)
+def index_untagged_questions(sender, instance, **kwargs):
+    ids = getattr(instance, '_search_tagged', [])
+    search.index_questions(ids)
+    versioning.bump(_question_courses(ids), tags=True)
+    Tombstone.record('tag', [instance.id])
+
+
+@receiver(post_save, sender=QuestionBank)
+@receiver(post_delete, sender=QuestionBank)
+@receiver(post_save, sender=Week)
+@receiver(post_delete, sender=Week)
+def bump_course_version(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versioning.bump({instance.course_id, getattr(instance, '_previous_course_id', None)})
+
+
+@receiver(post_delete, sender=Week)
+def record_deleted_week(sender, instance, **kwargs):
+    Tombstone.record('week', [instance.id], instance.course_id)
+
+
+@receiver(post_save, sender=QuestionBlock)
+def bump_block_course_version(sender, instance, raw=False, **kwargs):
+    if not raw:
+        versioning.bump(QuestionBank.objects.filter(pk=instance.question_bank_id).values_list('course_id', flat=True))
+
+
+@receiver(pre_delete, sender=QuestionBlock)
+def remember_block_course(sender, instance, **kwargs):
+    # The bank may be deleted first when the block goes with it
+    instance._course_id = QuestionBank.objects.filter(pk=instance.question_bank_id).values_list(
+        'course_id', flat=True).first()
+
+
+@receiver(post_delete, sender=QuestionBlock)
+def record_deleted_block(sender, instance, **kwargs):
+    course_id = getattr(instance, '_course_id', None)
+    versioning.bump([course_id])
+    Tombstone.record('block', [instance.id], course_id)
+
+
+@receiver(pre_save, sender=Course)
+def remember_course_owner(sender, instance, **kwargs):
+    if instance.pk:
+        instance._previous_owner_id = Course.objects.filter(pk=instance.pk).values_list(
+            'owner_id', flat=True).first()
+
+
+@receiver(post_save, sender=Course)
+def invalidate_course_owner_access(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_owner_id', None)
+    if created or previous != instance.owner_id:
+        access.invalidate(instance.owner_id, previous)
+    versioning.bump([instance.id])
+
+
+@receiver(post_delete, sender=Course)
+def invalidate_deleted_course_access(sender, instance, **kwargs):
+    access.invalidate(instance.owner_id)
+
+
+@receiver(post_save, sender=CourseShare)
+@receiver(post_delete, sender=CourseShare)
+@receiver(post_save, sender=QuestionBankShare)
+@receiver(post_delete, sender=QuestionBankShare)
+def invalidate_share_access(sender, instance, **kwargs):
+    access.invalidate(instance.shared_with_id)
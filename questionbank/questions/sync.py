@@ -0,0 +1,129 @@
+"""
+Delta sync for GET /api/courses/<code>/changes/?since=<token>.
+
+The SPA keeps a local (IndexedDB) copy of a course. A call without `since`
+returns every live question, block and week in the course and the tags its
+questions use. Later calls return only rows created, updated or trashed
+since the token they were handed, plus the ids of rows that went away:
+trashed questions by `deleted_at`, hard deletes and moves out of the course
+from the Tombstone log.
+
+Tokens carry the server time the sync started and the course's
+ContentVersion; if the version hasn't moved the delta is empty after one
+query. Rows are matched from SYNC_OVERLAP before the token's time so a
+transaction that committed late with an earlier timestamp isn't missed;
+clients upsert by id, so the overlap is harmless. Tokens older than
+TOMBSTONE_RETENTION get a full snapshot (`"full": true`) instead.
+
+Rows are raw values, not the list serializer's output: derived fields
+(block variants, linked counts) depend on other rows and are rebuilt on the
+client. times_used/last_used only travel with other changes to a question.
+"""
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import versioning
+from .models import ContentVersion, Question, QuestionBlock, Tag, Tombstone, Week
+
+SYNC_OVERLAP = timedelta(seconds=30)
+TOMBSTONE_RETENTION = timedelta(days=30)
+
+QUESTION_FIELDS = [
+    'id', 'question_type', 'text', 'points', 'difficulty', 'block', 'variant_number', 'canonical', 'week',
+    'question_bank', 'is_bonus', 'is_required', 'quiz_only', 'exam_only', 'times_used', 'last_used',
+    'deleted_at', 'created_at', 'updated_at',
+]
+BLOCK_FIELDS = ['id', 'name', 'question_bank', 'max_questions', 'description', 'updated_at']
+WEEK_FIELDS = ['id', 'number', 'name', 'description', 'updated_at']
+TAG_FIELDS = ['id', 'name', 'color']
+KINDS = ('questions', 'tags', 'blocks', 'weeks')
+
+
+def encode_token(at, version):
+    return base64.urlsafe_b64encode(json.dumps({'t': at.isoformat(), 'v': version}).encode()).decode()
+
+
+def decode_token(token):
+    """(time, version) from a token; ValueError if it isn't one of ours"""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+        at = parse_datetime(data['t'])
+        version = int(data['v'])
+    except (ValueError, KeyError, TypeError, binascii.Error, UnicodeDecodeError):
+        raise ValueError('Invalid sync token')
+    if at is None:
+        raise ValueError('Invalid sync token')
+    return at, version
+
+
+def _version(course):
+    return ContentVersion.objects.filter(scope=versioning.course_scope(course.id)).values_list(
+        'version', flat=True).first() or 0
+
+
+def _questions(queryset):
+    """Question rows with their tag ids, in two queries"""
+    rows = list(queryset.order_by('id').values(*QUESTION_FIELDS))
+    tags = {}
+    through = Question.tags.through.objects.filter(question_id__in=[r['id'] for r in rows])
+    for question_id, tag_id in through.values_list('question_id', 'tag_id'):
+        tags.setdefault(question_id, []).append(tag_id)
+    for row in rows:
+        row['points'] = str(row['points'])
+        row['tags'] = tags.get(row['id'], [])
+    return rows
+
+
+def changes(course, token=None):
+    """Everything in `course` that changed since `token` (all of it without one)"""
+    now = timezone.now()
+    version = _version(course)
+    since = None
+    if token:
+        at, token_version = decode_token(token)
+        if now - at <= TOMBSTONE_RETENTION:
+            since = at - SYNC_OVERLAP
+            if token_version == version:
+                return {'token': encode_token(now, version), 'full': False,
+                        **{kind: [] for kind in KINDS}, 'deleted': {kind: [] for kind in KINDS}}
+
+    questions = Question.all_objects.filter(course=course)
+    blocks = QuestionBlock.objects.filter(question_bank__course=course)
+    weeks = Week.objects.filter(course=course)
+    deleted = {kind: [] for kind in KINDS}
+
+    if since is None:
+        Tombstone.objects.filter(deleted_at__lt=now - TOMBSTONE_RETENTION).delete()
+        question_rows = _questions(questions.filter(deleted_at__isnull=True))
+        tags = Tag.objects.filter(id__in={t for row in question_rows for t in row['tags']})
+    else:
+        changed = _questions(questions.filter(Q(updated_at__gte=since) | Q(deleted_at__gte=since)))
+        question_rows = [r for r in changed if r['deleted_at'] is None]
+        deleted['questions'] += [r['id'] for r in changed if r['deleted_at'] is not None]
+        blocks = blocks.filter(updated_at__gte=since)
+        weeks = weeks.filter(updated_at__gte=since)
+        tags = Tag.objects.filter(
+            Q(id__in={t for row in question_rows for t in row['tags']}) |
+            Q(updated_at__gte=since, questions__course=course)
+        ).distinct()
+        gone = Tombstone.objects.filter(Q(course=course) | Q(course__isnull=True), deleted_at__gte=since)
+        live = {row['id'] for row in question_rows}
+        for kind, object_id in gone.values_list('kind', 'object_id'):
+            if not (kind == 'question' and object_id in live):  # moved away and back
+                deleted[kind + 's'].append(object_id)
+
+    return {
+        'token': encode_token(now, version),
+        'full': since is None,
+        'questions': question_rows,
+        'tags': list(tags.order_by('id').values(*TAG_FIELDS)),
+        'blocks': list(blocks.order_by('id').values(*BLOCK_FIELDS)),
+        'weeks': list(weeks.order_by('number').values(*WEEK_FIELDS)),
+        'deleted': deleted,
+    }
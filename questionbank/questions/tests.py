@@ -1,3 +1,1549 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+from contextlib import redirect_stdout
+from io import BytesIO, StringIO
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from .models import (
+    Tag, Course, CourseShare, CourseUsage, ImportedFile, ImportJob, PurgeJob, QuestionBank, QuestionBankShare,
+    QuestionBlock, Question, QuestionImage, QuestionVersion, Tombstone, Week
+)
+from . import export, history, images, importer, jobs, search
+from .sync import encode_token
+
+
+class SeededAPITestCase(APITestCase):
+    """Base class for API tests that need a realistic slice of courses, banks
+    and questions; `seed()` can be called again to add another round of it."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner', password='pw')
+        self.other = User.objects.create_user('colleague', password='pw')
+        self.client.force_authenticate(self.user)
+        self.rounds = 0
+        self.seed()
+
+    def seed(self, courses=3, banks=2, blocks=2, variants=3, questions=4):
+        """Create a realistic slice of data owned by (or shared with) self.user."""
+        self.rounds += 1
+        prefix = f"R{self.rounds}"
+        tags = [Tag.objects.create(name=f"{prefix}-tag{i}") for i in range(3)]
+
+        for c in range(courses):
+            # Every other course is someone else's, shared with the user
+            owner = self.user if c % 2 == 0 else self.other
+            course = Course.objects.create(name=f"Course {c}", code=f"{prefix}C{c}", owner=owner)
+            if owner != self.user:
+                CourseShare.objects.create(course=course, shared_with=self.user, shared_by=owner)
+            week = Week.objects.create(course=course, number=1)
+
+            for b in range(banks):
+                bank = QuestionBank.objects.create(name=f"Bank {b}", course=course, owner=owner)
+                if owner != self.user:
+                    QuestionBankShare.objects.create(bank=bank, shared_with=self.user, shared_by=owner)
+
+                for k in range(blocks):
+                    block = QuestionBlock.objects.create(name=f"Block {k}", question_bank=bank)
+                    for v in range(variants):
+                        q = Question.objects.create(
+                            course=course, question_bank=bank, block=block, variant_number=v + 1,
+                            question_type=Question.QuestionType.SHORT_ANSWER,
+                            text=f"{prefix} {course.code} block {k} variant {v}", week=week,
+                            created_by=owner,
+                        )
+                        q.tags.set(tags[:2])
+
+                for i in range(questions):
+                    q = Question.objects.create(
+                        course=course, question_bank=bank,
+                        question_type=Question.QuestionType.MULTIPLE_CHOICE,
+                        text=f"{prefix} {course.code} loose question {i}", week=week,
+                        created_by=owner,
+                    )
+                    q.tags.set(tags)
+
+
+class QueryBudgetTestCase(SeededAPITestCase):
+    """Base class for list endpoints that must run in a fixed number of queries.
+
+    Budgets are absolute, so a serializer that starts issuing a query per row
+    fails here instead of in production. `seed()` doubles the data; the query
+    count must not change when it does.
+    """
+
+    def count_queries(self, url, **params):
+        # A fresh user object per request, as in production (access is memoized on it)
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        return len(ctx.captured_queries), ctx.captured_queries
+
+    def assertQueryBudget(self, budget, url, **params):
+        """Assert that GET `url` stays within `budget` queries, and still does
+        after the data set is doubled."""
+        counts = []
+        for _ in range(2):
+            n, queries = self.count_queries(url, **params)
+            sql = '\n'.join(q['sql'] for q in queries)
+            self.assertLessEqual(n, budget, f"{url} ran {n} queries (budget {budget}):\n{sql}")
+            counts.append(n)
+            self.seed()
+        self.assertEqual(counts[0], counts[1], f"{url} query count grows with rows: {counts}")
+
+    def assertFastListMatches(self, url, **params):
+        """Assert that GET `url` returns the same bytes with and without the fast list path"""
+        bodies = []
+        for fast in (False, True):
+            cache.clear()  # no cached payloads across the two paths
+            self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+            with override_settings(FAST_LISTS=fast):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200, response.content[:500])
+            bodies.append(response.content)
+        self.assertEqual(bodies[0], bodies[1])
+        return json.loads(bodies[1])
+
+
+class QuestionsQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_question_list(self):
+        self.assertQueryBudget(6, '/api/questions/')
+
+    def test_question_list_filtered_by_course(self):
+        self.assertQueryBudget(6, '/api/questions/', course='R1C0')
+
+    def test_course_list(self):
+        self.assertQueryBudget(3, '/api/courses/')
+
+    def test_bank_list(self):
+        self.assertQueryBudget(4, '/api/banks/')
+
+    def test_block_list(self):
+        self.assertQueryBudget(3, '/api/blocks/')
+
+    def test_tag_list(self):
+        self.assertQueryBudget(3, '/api/tags/')
+
+    def test_question_list_block_variants(self):
+        response = self.client.get('/api/questions/', {'course': 'R1C0'})
+        blocks = [q for q in response.json()['results'] if q['block']]
+        self.assertEqual(len(blocks), 4)
+        for q in blocks:
+            self.assertEqual(q['block_variant_count'], 3)
+            self.assertEqual([v['text'][-9:] for v in q['block_types']], ['variant 0', 'variant 1', 'variant 2'])
+
+
+class QuestionSearchTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='pw')
+        self.client.force_authenticate(self.user)
+        self.course = Course.objects.create(name='Data Structures', code='CS2', owner=self.user)
+        self.tree = Question.objects.create(
+            course=self.course, question_type=Question.QuestionType.SHORT_ANSWER,
+            text='Describe how a binary search tree keeps its keys ordered.'
+        )
+        self.heap = Question.objects.create(
+            course=self.course, question_type=Question.QuestionType.SHORT_ANSWER,
+            text='What is the height of a binary heap?',
+            answer_data={'solution': 'logarithmic in the number of nodes'}
+        )
+
+    def search(self, query):
+        response = self.client.get('/api/questions/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_all_words_must_match(self):
+        self.assertEqual([q['id'] for q in self.search('binary tree')], [self.tree.id])
+        self.assertEqual({q['id'] for q in self.search('binary')}, {self.tree.id, self.heap.id})
+        self.assertEqual(self.search('binary queue'), [])
+
+    def test_prefix_and_answer_matches(self):
+        self.assertEqual([q['id'] for q in self.search('ord')], [self.tree.id])
+        self.assertEqual([q['id'] for q in self.search('logarithmic')], [self.heap.id])
+
+    def test_snippet_highlights_terms(self):
+        [result] = self.search('heap')
+        self.assertIn('<mark>heap</mark>', result['search_snippet'])
+
+    def test_index_follows_edits_and_tags(self):
+        self.heap.text = 'What is the height of a complete tree?'
+        self.heap.save()
+        self.assertEqual({q['id'] for q in self.search('tree')}, {self.tree.id, self.heap.id})
+
+        tag = Tag.objects.create(name='priorityqueues')
+        self.heap.tags.add(tag)
+        self.assertEqual([q['id'] for q in self.search('priorityqueues')], [self.heap.id])
+        tag.questions.clear()
+        self.assertEqual(self.search('priorityqueues'), [])
+
+        self.heap.delete()
+        self.assertEqual([q['id'] for q in self.search('tree')], [self.tree.id])
+
+    def test_tag_changes_reach_trashed_questions(self):
+        tag = Tag.objects.create(name='priorityqueues')
+        self.heap.tags.add(tag)
+        self.heap.soft_delete(self.user)
+
+        def trash(query):
+            response = self.client.get('/api/questions/', {'search': query, 'trash': 'true'})
+            return [q['id'] for q in response.json()['results']]
+        self.assertEqual(trash('priorityqueues'), [self.heap.id])
+        tag.name = 'heapsort'
+        tag.save()
+        self.assertEqual((trash('priorityqueues'), trash('heapsort')), ([], [self.heap.id]))
+        tag.delete()
+        self.assertEqual(trash('heapsort'), [])
+
+    def test_punctuation_only_query(self):
+        self.assertEqual(len(self.search('"*-')), 2)
+
+
+class KeysetPaginationTests(SeededAPITestCase):
+
+    def walk(self, **params):
+        """Follow `next` from the first cursor page, returning ids and page count"""
+        ids, pages = [], 0
+        response = self.client.get('/api/questions/', {'cursor': '', **params})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            self.assertNotIn('count', data)
+            ids += [q['id'] for q in data['results']]
+            pages += 1
+            if not data['next']:
+                return ids, pages, data
+            response = self.client.get(data['next'])
+
+    def test_cursor_walk_matches_page_numbers(self):
+        expected = [q['id'] for q in self.client.get('/api/questions/', {'page_size': 2000}).json()['results']]
+        for ordering in ('-updated_at', 'points', '-created_at', 'difficulty'):
+            ids, pages, _ = self.walk(page_size=7, ordering=ordering)
+            self.assertEqual(sorted(ids), sorted(expected), ordering)
+            self.assertEqual(len(ids), len(set(ids)), ordering)
+            self.assertEqual(pages, -(-len(expected) // 7), ordering)
+        ids, _, _ = self.walk(page_size=7)
+        self.assertEqual(ids, expected)
+
+    def test_deep_page_costs_the_same(self):
+        url = '/api/questions/?cursor=&page_size=5'
+        self.client.get('/api/questions/?cursor=&page_size=1')  # warm the access cache
+        with CaptureQueriesContext(connection) as first:
+            url = self.client.get(url).json()['next']
+        for _ in range(4):
+            url = self.client.get(url).json()['next']
+        with CaptureQueriesContext(connection) as deep:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(len(first.captured_queries), len(deep.captured_queries))
+        for q in deep.captured_queries:
+            self.assertFalse(q['sql'].upper().startswith('SELECT COUNT('), q['sql'])
+            self.assertNotIn('OFFSET', q['sql'].upper())
+
+    def test_estimated_count_for_course(self):
+        _, _, data = self.walk(course='R1C0', page_size=1000)
+        exact = self.client.get('/api/questions/', {'course': 'R1C0'}).json()['count']
+        self.assertEqual(data['estimated_count'], exact)
+        Question.objects.create(course=Course.objects.get(code='R1C0'), question_type='trueFalse', text='new')
+        _, _, data = self.walk(course='R1C0', page_size=1000)
+        self.assertEqual(data['estimated_count'], exact + 1)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/questions/', {'cursor': 'garbage!'}).status_code, 404)
+
+
+class AccessCacheTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner', password='pw')
+        self.ta = User.objects.create_user('ta', password='pw')
+        self.course = Course.objects.create(name='Algorithms', code='CS3', owner=self.owner)
+        self.bank = QuestionBank.objects.create(name='Midterm', course=self.course, owner=self.owner)
+        Question.objects.create(course=self.course, question_type='trueFalse', text='P = NP')
+
+    def visible(self, url):
+        self.client.force_authenticate(User.objects.get(pk=self.ta.pk))
+        data = self.client.get(url).json()
+        return len(data['results'] if isinstance(data, dict) else data)
+
+    def test_shares_are_picked_up_and_revoked(self):
+        self.assertEqual(self.visible('/api/questions/'), 0)
+        share = CourseShare.objects.create(course=self.course, shared_with=self.ta, shared_by=self.owner)
+        self.assertEqual(self.visible('/api/questions/'), 1)
+        self.assertEqual(self.visible('/api/courses/'), 1)
+        share.delete()
+        self.assertEqual(self.visible('/api/questions/'), 0)
+        self.assertEqual(self.visible('/api/courses/'), 0)
+
+    def test_bank_share_and_ownership_transfer(self):
+        self.assertEqual(self.visible('/api/banks/'), 0)
+        QuestionBankShare.objects.create(bank=self.bank, shared_with=self.ta, shared_by=self.owner)
+        self.assertEqual(self.visible('/api/banks/'), 1)
+        self.assertEqual(self.visible('/api/questions/'), 0)
+        self.course.owner = self.ta
+        self.course.save()
+        self.assertEqual(self.visible('/api/questions/'), 1)
+
+
+class UsageStatsTests(QueryBudgetTestCase):
+
+    def test_usage_stats_budget(self):
+        url = '/api/questions/usage_stats/'
+        self.seed()
+        self.count_queries(url)  # build the rollups
+        n_small, _ = self.count_queries(url)
+        self.seed(questions=20)
+        self.count_queries(url)
+        n_large, _ = self.count_queries(url)
+        self.assertEqual(n_small, n_large)
+        self.assertLessEqual(n_large, 2)
+
+    def test_usage_stats_numbers(self):
+        from django.db.models import F
+        from django.utils import timezone
+        course = Course.objects.get(code='R1C0')
+        questions = list(Question.objects.filter(course=course, question_type='shortAnswer')[:3])
+        Question.objects.filter(id__in=[q.id for q in questions]).update(
+            times_used=F('times_used') + 2, last_used=timezone.now()
+        )
+        CourseUsage.refresh([course.id])
+
+        data = self.client.get('/api/questions/usage_stats/', {'course': 'R1C0'}).json()
+        live = Question.objects.filter(course=course)
+        self.assertEqual(data['total_questions'], live.count())
+        self.assertEqual(data['questions_used'], 3)
+        self.assertEqual(data['by_type']['shortAnswer'], {
+            'total': live.filter(question_type='shortAnswer').count(), 'used': 3, 'times_used': 6
+        })
+        self.assertEqual({q['id'] for q in data['most_used']}, {q.id for q in questions})
+
+        # A new question marks the rollup stale; the next read recomputes it
+        Question.objects.create(course=course, question_type='trueFalse', text='fresh')
+        data = self.client.get('/api/questions/usage_stats/', {'course': 'R1C0'}).json()
+        self.assertEqual(data['total_questions'], live.count())
+
+
+class DuplicateDetectionTests(APITestCase):
+
+    TEXT = ('Explain why quicksort runs in O(n log n) time on average but '
+            'degrades to quadratic time when the pivot is always the smallest element.')
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner', password='pw')
+        self.other = User.objects.create_user('other', password='pw')
+        self.client.force_authenticate(self.user)
+        self.course = Course.objects.create(name='Algorithms', code='CS3', owner=self.user)
+        self.hidden = Course.objects.create(name='Private', code='CS9', owner=self.other)
+
+    def make(self, text, course=None):
+        return Question.objects.create(course=course or self.course, question_type='shortAnswer', text=text)
+
+    def test_fingerprint_ignores_markup(self):
+        from .fingerprint import fingerprint
+        self.assertEqual(
+            fingerprint('What is **$\\frac{1}{2}$** of 10?'),
+            fingerprint('what is  1 2 of 10')
+        )
+        self.assertNotEqual(fingerprint('What is half of 10?'), fingerprint('What is half of 12?'))
+
+    def test_cluster_command_groups_near_duplicates(self):
+        from io import StringIO
+        from django.core.management import call_command
+        original = self.make(self.TEXT)
+        reworded = self.make('**' + self.TEXT.replace('Explain', 'explain,') + '**')
+        self.make('Define a spanning tree of an undirected graph and give an example.')
+        self.make(self.TEXT, course=self.hidden)
+        call_command('cluster_duplicates', stdout=StringIO())
+
+        clusters = self.client.get('/api/questions/duplicates/').json()
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(clusters[0]['course_code'], 'CS3')
+        self.assertEqual({q['id'] for q in clusters[0]['questions']}, {original.id, reworded.id})
+
+        self.assertEqual(self.client.get('/api/questions/duplicates/', {'course': 'CS9'}).json(), [])
+
+    def test_create_warns_about_possible_duplicates(self):
+        original = self.make(self.TEXT)
+        response = self.client.post('/api/questions/', {
+            'course': self.course.id, 'question_type': 'shortAnswer',
+            'text': self.TEXT.replace('smallest', 'largest'),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([d['id'] for d in response.json()['possible_duplicates']], [original.id])
+
+        response = self.client.post('/api/questions/', {
+            'course': self.course.id, 'question_type': 'shortAnswer', 'text': 'Something unrelated entirely.',
+        }, format='json')
+        self.assertEqual(response.json()['possible_duplicates'], [])
+
+
+class BankCopyTests(SeededAPITestCase):
+
+    def test_copy_remaps_blocks_and_keeps_tags(self):
+        bank = QuestionBank.objects.get(course__code='R1C1', name='Bank 0')
+        response = self.client.post(f'/api/banks/{bank.id}/copy/', {'name': 'Mine'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        copy = QuestionBank.objects.get(pk=response.json()['id'])
+        self.assertEqual(copy.owner, self.user)
+
+        originals = {q.text: q for q in bank.questions.all()}
+        copies = list(copy.questions.select_related('block').prefetch_related('tags'))
+        self.assertEqual(len(copies), len(originals))
+        self.assertEqual(copy.blocks.count(), bank.blocks.count())
+        for q in copies:
+            original = originals[q.text]
+            self.assertEqual(q.canonical_id, original.id)
+            self.assertEqual(q.course_id, bank.course_id)
+            self.assertEqual(q.week_id, original.week_id)
+            self.assertEqual(q.content_hash, original.content_hash)
+            self.assertEqual({t.name for t in q.tags.all()}, {t.name for t in original.tags.all()})
+            if original.block_id:
+                self.assertEqual(q.block.question_bank_id, copy.id)
+                self.assertEqual(q.block.name, original.block.name)
+                self.assertEqual(q.variant_number, original.variant_number)
+
+        # Copies are indexed for search without a rebuild
+        from . import search
+        text = next(iter(originals))
+        self.assertEqual(search.search(copy.questions.all(), text).count(), 1)
+
+    def test_copy_query_count_does_not_grow(self):
+        bank = QuestionBank.objects.get(course__code='R1C0', name='Bank 0')
+
+        def copy_queries():
+            with CaptureQueriesContext(connection) as ctx:
+                bank.copy_to_user(self.other, f'Copy {QuestionBank.objects.count()}')
+            return len(ctx.captured_queries)
+
+        small = copy_queries()
+        for i in range(20):
+            q = Question.objects.create(course=bank.course, question_bank=bank, question_type='trueFalse',
+                                        text=f'extra {i}')
+            q.tags.set(Tag.objects.all()[:1])
+        self.assertEqual(copy_queries(), small)
+
+
+class CourseShareCascadeTests(SeededAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        from exams.models import ExamTemplate
+        self.course = Course.objects.get(code='R1C0')
+        for i in range(3):
+            ExamTemplate.objects.create(name=f'Exam {i}', course=self.course, owner=self.user)
+        self.tas = [User.objects.create_user(f'ta{i}', password='pw') for i in range(3)]
+
+    def share_many(self, **data):
+        return self.client.post(f'/api/courses/{self.course.code}/share_many/', data, format='json')
+
+    def test_share_many_cascades_and_upserts(self):
+        from exams.models import ExamTemplateShare
+        response = self.share_many(usernames=[ta.username for ta in self.tas], permission='view')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+        banks = self.course.question_banks.count()
+        self.assertEqual(QuestionBankShare.objects.filter(shared_with__in=self.tas).count(), 3 * banks)
+        self.assertEqual(ExamTemplateShare.objects.filter(shared_with__in=self.tas).count(), 9)
+
+        # Sharing again updates the permission in place
+        self.share_many(usernames=[self.tas[0].username], permission='edit')
+        self.assertEqual(
+            set(QuestionBankShare.objects.filter(shared_with=self.tas[0]).values_list('permission', flat=True)),
+            {'edit'}
+        )
+        self.assertEqual(CourseShare.objects.filter(course=self.course).count(), 3)
+
+        # The TA's access cache picks up the bulk-written share
+        self.client.force_authenticate(User.objects.get(pk=self.tas[1].pk))
+        self.assertEqual([c['code'] for c in self.client.get('/api/courses/').json()], ['R1C0'])
+
+        self.client.force_authenticate(self.user)
+        self.client.delete(f'/api/courses/{self.course.code}/unshare/', {'username': 'ta1'}, format='json')
+        self.assertFalse(QuestionBankShare.objects.filter(shared_with=self.tas[1]).exists())
+        self.client.force_authenticate(User.objects.get(pk=self.tas[1].pk))
+        self.assertEqual(self.client.get('/api/courses/').json(), [])
+
+    def test_share_query_count_does_not_grow(self):
+        def share_queries():
+            cache.clear()
+            self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+            with CaptureQueriesContext(connection) as ctx:
+                self.share_many(usernames=[ta.username for ta in self.tas])
+            return len(ctx.captured_queries)
+
+        small = share_queries()
+        for i in range(5):
+            QuestionBank.objects.create(name=f'Extra {i}', course=self.course, owner=self.user)
+        self.assertEqual(share_queries(), small)
+
+    def test_unknown_usernames(self):
+        response = self.share_many(usernames=['ta0', 'nobody'])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['usernames'], ['nobody'])
+        self.assertFalse(CourseShare.objects.filter(course=self.course).exists())
+
+
+class BulkEditTests(SeededAPITestCase):
+
+    def bulk(self, operations, ids=None, **params):
+        from urllib.parse import urlencode
+        url = '/api/questions/bulk/' + (f'?{urlencode(params)}' if params else '')
+        body = {'operations': operations}
+        if ids is not None:
+            body['ids'] = ids
+        return self.client.post(url, body, format='json')
+
+    def test_retag_by_filter_in_a_handful_of_queries(self):
+        self.seed(questions=40)
+        course = Course.objects.get(code='R2C0')
+        ids = set(Question.objects.filter(course=course).values_list('id', flat=True))
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.bulk({'add_tags': ['midterm', 'R2-tag0'], 'remove_tags': ['R2-tag2']}, course='R2C0')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.json()['ids']), ids)
+        self.assertLessEqual(len(ctx.captured_queries), 15)
+
+        midterm = Tag.objects.get(name='midterm')
+        self.assertEqual(set(midterm.questions.values_list('id', flat=True)), ids)
+        self.assertFalse(Question.objects.filter(id__in=ids, tags__name='R2-tag2').exists())
+        # The search index sees the new tag
+        found = self.client.get('/api/questions/', {'search': 'midterm', 'course': 'R2C0'}).json()['results']
+        self.assertTrue(found)
+
+    def test_fields_trash_and_per_item_errors(self):
+        mine = list(Question.objects.filter(course__code='R1C0').values_list('id', flat=True)[:3])
+        shared = Question.objects.filter(course__code='R1C1').values_list('id', flat=True).first()
+        week = Week.objects.get(course__code='R1C0')
+        response = self.bulk(
+            {'difficulty': 'hard', 'points': '2.5', 'week': week.id}, ids=mine + [shared, 999999]
+        )
+        data = response.json()
+        self.assertEqual(sorted(data['ids']), sorted(mine))
+        self.assertEqual(
+            sorted((e['id'], e['error']) for e in data['errors']),
+            [(shared, 'Read-only course'), (999999, 'Not found')]
+        )
+        for q in Question.objects.filter(id__in=mine):
+            self.assertEqual((q.difficulty, str(q.points), q.week_id), ('hard', '2.50', week.id))
+
+        self.bulk({'trash': True}, ids=mine)
+        self.assertEqual(Question.all_objects.filter(id__in=mine, deleted_by=self.user).count(), 3)
+        self.bulk({'trash': False}, ids=mine)
+        self.assertFalse(Question.all_objects.filter(id__in=mine, deleted_at__isnull=False).exists())
+
+    def test_move_to_bank_in_another_course(self):
+        q = Question.objects.filter(course__code='R1C0', block__isnull=False).first()
+        bank = QuestionBank.objects.get(course__code='R1C2', name='Bank 1')
+        response = self.bulk({'bank': bank.id}, ids=[q.id])
+        self.assertEqual(response.json()['updated'], 1)
+        q.refresh_from_db()
+        self.assertEqual((q.course_id, q.question_bank_id, q.block_id, q.week_id), (bank.course_id, bank.id, None, None))
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.bulk({'difficulty': 'impossible'}, course='R1C0').status_code, 400)
+        self.assertEqual(self.bulk({'explode': True}, course='R1C0').status_code, 400)
+        self.assertEqual(self.bulk({'difficulty': 'easy'}).status_code, 400)
+        shared = QuestionBank.objects.get(course__code='R1C1', name='Bank 0')
+        mine = Question.objects.filter(course__code='R1C0').values_list('id', flat=True).first()
+        self.assertEqual(self.bulk({'bank': shared.id}, ids=[mine]).status_code, 403)
+
+
+class VersionedListCacheTests(SeededAPITestCase):
+
+    def get(self, url, etag=None, **params):
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, params, **headers)
+
+    def test_not_modified_and_cached_payload(self):
+        first = self.get('/api/questions/', course='R1C0')
+        etag = first['ETag']
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        url = '/api/questions/?course=R1C0'
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 1)  # just the versions; access is cached
+        with CaptureQueriesContext(connection) as ctx:
+            cached = self.client.get(url)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(cached.json(), first.json())
+        self.assertEqual(cached['ETag'], etag)
+
+    def test_writes_change_the_etag(self):
+        course = Course.objects.get(code='R1C0')
+        urls = ['/api/questions/', '/api/courses/', '/api/banks/', '/api/tags/', '/api/weeks/', '/api/blocks/']
+        etags = {url: self.get(url)['ETag'] for url in urls}
+
+        def changed():
+            new = {url: self.get(url, etags[url]) for url in urls}
+            etags.update({url: r['ETag'] for url, r in new.items()})
+            return {url for url, r in new.items() if r.status_code == 200}
+
+        q = Question.objects.filter(course=course).first()
+        self.client.patch(f'/api/questions/{q.id}/', {'points': 7}, format='json')
+        self.assertTrue({'/api/questions/', '/api/courses/', '/api/banks/'} <= changed())
+        self.assertIn('7.00', [r['points'] for r in self.get('/api/questions/', course='R1C0').json()['results']])
+
+        Tag.objects.create(name='brand-new')
+        # The question list nests tags with their counts, so it follows the tag table too
+        self.assertEqual(changed(), {'/api/tags/', '/api/questions/'})
+
+        self.client.post('/api/questions/bulk/', {'ids': [q.id], 'operations': {'add_tags': ['brand-new']}},
+                         format='json')
+        self.assertTrue({'/api/questions/', '/api/tags/'} <= changed())
+
+        Week.objects.create(course=course, number=2)
+        self.assertIn('/api/weeks/', changed())
+        self.assertEqual(changed(), set())
+
+    def test_tag_counts_from_other_courses(self):
+        tag = Tag.objects.create(name='shared-tag')
+        Question.objects.filter(course__code='R1C0').first().tags.add(tag)
+        private = Course.objects.create(name='Private', code='PRIV', owner=self.other)
+
+        def count():
+            rows = self.get('/api/questions/', course='R1C0').json()['results']
+            return next(t['question_count'] for row in rows for t in row['tags'] if t['name'] == 'shared-tag')
+        self.assertEqual(count(), 1)
+        compact = self.get('/api/questions/', course='R1C0', compact=1)['ETag']
+
+        Question.objects.create(course=private, question_type='trueFalse', text='not mine').tags.add(tag)
+        self.assertEqual(count(), 2)
+        # Tag ids alone don't change with other courses' tagging
+        self.assertEqual(self.get('/api/questions/', compact, course='R1C0', compact=1).status_code, 304)
+
+    def test_other_users_writes_dont_invalidate(self):
+        private = Course.objects.create(name='Private', code='PRIV', owner=self.other)
+        etag = self.get('/api/questions/')['ETag']
+        Question.objects.create(course=private, question_type='trueFalse', text='not mine')
+        self.assertEqual(self.get('/api/questions/', etag).status_code, 304)
+        CourseShare.objects.create(course=private, shared_with=self.user, shared_by=self.other)
+        self.assertEqual(self.get('/api/questions/', etag).status_code, 200)
+
+
+class DeltaSyncTests(SeededAPITestCase):
+    url = '/api/courses/R1C0/changes/'
+
+    def sync(self, token=None, **headers):
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        response = self.client.get(self.url, {'since': token} if token else {}, **headers)
+        if response.get('Content-Encoding') == 'gzip':
+            return response, json.loads(gzip.decompress(response.content))
+        return response, json.loads(response.content) if response.content else None
+
+    def test_full_sync(self):
+        response, data = self.sync()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(data['full'])
+        course = Course.objects.get(code='R1C0')
+        self.assertEqual({q['id'] for q in data['questions']},
+                         set(Question.objects.filter(course=course).values_list('id', flat=True)))
+        self.assertEqual(len(data['blocks']), 4)
+        self.assertEqual(len(data['weeks']), 1)
+        self.assertEqual({t['name'] for t in data['tags']}, {'R1-tag0', 'R1-tag1', 'R1-tag2'})
+
+    def test_unchanged_course_is_an_empty_delta(self):
+        token = self.sync()[1]['token']
+        Question.objects.create(course=Course.objects.get(code='R1C1'), question_type='trueFalse', text='elsewhere')
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, {'since': token})
+        self.assertLessEqual(len(ctx.captured_queries), 2)  # the course and its version
+        data = response.json()
+        self.assertFalse(data['full'])
+        self.assertEqual(data['questions'], [])
+        self.assertEqual(data['deleted'], {'questions': [], 'tags': [], 'blocks': [], 'weeks': []})
+
+    def test_changes_and_deletions(self):
+        token = self.sync()[1]['token']
+        course = Course.objects.get(code='R1C0')
+        edited, trashed, removed, retagged = Question.objects.filter(course=course, block__isnull=True)[:4]
+        self.client.patch(f'/api/questions/{edited.id}/', {'points': 7}, format='json')
+        trashed.soft_delete(self.user)
+        removed_id = removed.id
+        removed.delete()
+        retagged.tags.remove(Tag.objects.get(name='R1-tag2'))
+        week = Week.objects.create(course=course, number=2)
+        block = QuestionBlock.objects.filter(question_bank__course=course).first()
+        block_id = block.id
+        block.delete()
+
+        data = self.sync(token)[1]
+        self.assertFalse(data['full'])
+        rows = {q['id']: q for q in data['questions']}
+        self.assertEqual(rows[edited.id]['points'], '7.00')
+        self.assertNotIn(Tag.objects.get(name='R1-tag2').id, rows[retagged.id]['tags'])
+        self.assertIn(trashed.id, data['deleted']['questions'])
+        self.assertIn(removed_id, data['deleted']['questions'])
+        self.assertEqual(data['deleted']['blocks'], [block_id])
+        self.assertIn(week.id, [w['id'] for w in data['weeks']])  # (plus anything inside SYNC_OVERLAP)
+        self.assertNotIn(trashed.id, rows)
+
+        # Tags: renames reach courses that use the tag, deletions reach everyone
+        tag = Tag.objects.get(name='R1-tag0')
+        tag.name = 'renamed'
+        tag.save()
+        data = self.sync(data['token'])[1]
+        self.assertIn('renamed', [t['name'] for t in data['tags']])
+        tag_id = tag.id
+        tag.delete()
+        self.assertIn(tag_id, self.sync(data['token'])[1]['deleted']['tags'])
+
+    def test_moved_question_is_deleted_from_old_course(self):
+        token = self.sync()[1]['token']
+        q = Question.objects.filter(course__code='R1C0', block__isnull=True).first()
+        self.client.post('/api/questions/bulk/', {'ids': [q.id], 'operations': {'course': 'R1C2'}}, format='json')
+        self.assertEqual(self.sync(token)[1]['deleted']['questions'], [q.id])
+
+    def test_bad_and_expired_tokens(self):
+        response, data = self.sync('not-a-token')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', data)
+        old = encode_token(timezone.now() - timedelta(days=90), 0)
+        self.assertTrue(self.sync(old)[1]['full'])
+
+    def test_gzip(self):
+        response, data = self.sync(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertTrue(data['full'])
+        plain = self.sync()[0]
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertLess(len(response.content), len(plain.content))
+
+
+class FastListTests(QueryBudgetTestCase):
+
+    def test_question_list_matches_serializer(self):
+        course = Course.objects.get(code='R1C0')
+        q = Question.objects.filter(course=course, block__isnull=True).first()
+        q.text = 'Unicode \u00e9\u2028 "quotes" <b>'
+        q.points = 2.5
+        q.week = None
+        q.save()
+        Question.objects.create(course=course, canonical=q, question_type='trueFalse', text='a copy')
+        q.tags.add(Tag.objects.create(name='A-first'))
+        Question.objects.filter(course=course).last().soft_delete(self.user)
+
+        self.assertGreater(len(self.assertFastListMatches('/api/questions/')['results']), 0)
+        data = self.assertFastListMatches('/api/questions/', course='R1C0', page_size=5, page=2)
+        self.assertEqual(len(data['results']), 5)
+        self.assertFastListMatches('/api/questions/', course='R1C0', cursor='', ordering='points')
+        self.assertFastListMatches('/api/questions/', course='R1C0', cursor='', page_size=5)
+        self.assertFastListMatches('/api/questions/', trash='true')
+        self.assertFastListMatches('/api/questions/', search='loose question')
+        self.assertFastListMatches('/api/questions/', search='Unicode')
+        data = self.assertFastListMatches('/api/questions/', course='R1C0', type='multipleChoice')
+        row = next(r for r in data['results'] if r['id'] == q.id)
+        self.assertEqual(row['linked_count'], 2)
+        self.assertEqual(row['points'], '2.50')
+        self.assertEqual(row['tags'][0]['name'], 'A-first')
+
+    def test_tag_and_bank_lists_match_serializer(self):
+        self.assertFastListMatches('/api/tags/')
+        self.assertFastListMatches('/api/tags/', course='R1C1')
+        data = self.assertFastListMatches('/api/banks/')
+        self.assertEqual({b['is_shared'] for b in data if not b['is_owner']}, {True})
+
+    def test_renderer_falls_back_to_stdlib(self):
+        from rest_framework.renderers import JSONRenderer
+        from .fastlist import FastJSONRenderer
+
+        class ListView:
+            action = 'list'
+        context = {'view': ListView()}
+        for data in [
+            [{'s': '\u2028\x00\x1f\u00e9\U0001F600', 'n': None, 1: True}],
+            {'big': 2 ** 70, 'when': timezone.now(), 'day': timezone.now().date()},
+        ]:
+            self.assertEqual(FastJSONRenderer().render(data, renderer_context=context),
+                             JSONRenderer().render(data, renderer_context=context))
+
+
+class SparseFieldsetTests(QueryBudgetTestCase):
+
+    def test_fields(self):
+        data = self.assertFastListMatches('/api/questions/', course='R1C0', fields='id,points')
+        self.assertEqual({tuple(row) for row in data['results']}, {('id', 'points')})
+        q = Question.objects.filter(course__code='R1C0').first()
+        detail = self.client.get(f'/api/questions/{q.id}/', {'fields': 'id,answer_data'}).json()
+        self.assertEqual(set(detail), {'id', 'answer_data'})
+
+    def test_compact_and_expand(self):
+        q = Question.objects.filter(course__code='R1C0', block__isnull=True).first()
+        q.text = 'x' * 500
+        q.save()
+        data = self.assertFastListMatches('/api/questions/', course='R1C0', compact='1')
+        row = next(r for r in data['results'] if r['id'] == q.id)
+        self.assertEqual(row['text'], 'x' * 200 + '...')
+        self.assertEqual(row['tags'], sorted(row['tags'], key=lambda pk: Tag.objects.get(pk=pk).name))
+        self.assertTrue(all(isinstance(pk, int) for pk in row['tags']))
+        self.assertNotIn('block_types', row)
+        self.assertNotIn('created_at', row)
+
+        data = self.assertFastListMatches('/api/questions/', course='R1C0', compact='1', expand='tags,block')
+        blocked = next(r for r in data['results'] if r['block'])
+        self.assertEqual(len(blocked['block_types']), 3)
+        self.assertIn('name', blocked['tags'][0])
+
+    def test_unused_fields_cost_no_queries(self):
+        full, _ = self.count_queries('/api/questions/', course='R1C0')
+        compact, queries = self.count_queries('/api/questions/', course='R1C0', fields='id,question_type,points')
+        self.assertLess(compact, full)
+        sql = '\n'.join(q['sql'] for q in queries)
+        self.assertNotIn('questions_tag', sql)
+        self.assertNotIn('JOIN "questions_week"', sql)
+
+    def test_bad_names_and_writes(self):
+        response = self.client.get('/api/questions/', {'fields': 'id,nope', 'expand': 'everything'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {'fields', 'expand'})
+        q = Question.objects.filter(course__code='R1C0').first()
+        response = self.client.patch(f'/api/questions/{q.id}/?fields=id', {'points': 9}, format='json')
+        self.assertEqual(response.status_code, 200)
+        q.refresh_from_db()
+        self.assertEqual(q.points, 9)
+
+
+class LiveQuestionManagerTests(SeededAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.trashed = Question.objects.filter(course__code='R1C0', block__isnull=False).first()
+        self.trashed.soft_delete(self.user)
+
+    def test_default_manager_skips_trash(self):
+        self.assertFalse(Question.objects.filter(pk=self.trashed.pk).exists())
+        self.assertTrue(Question.all_objects.filter(pk=self.trashed.pk).exists())
+        self.assertNotIn(self.trashed, self.trashed.block.questions.all())
+        stats = self.client.get('/api/questions/stats/', {'course': 'R1C0'}).json()
+        self.assertEqual(stats['total'], Question.all_objects.filter(course__code='R1C0').count() - 1)
+
+    def test_trash_views(self):
+        trash = self.client.get('/api/questions/', {'trash': 'true'}).json()['results']
+        self.assertEqual([row['id'] for row in trash], [self.trashed.id])
+        self.assertEqual(self.client.get('/api/questions/trash_count/').json()['count'], 1)
+        response = self.client.post(f'/api/questions/{self.trashed.id}/restore/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Question.objects.filter(pk=self.trashed.pk).exists())
+
+    def test_hot_queries_use_partial_indexes(self):
+        course = Course.objects.get(code='R1C0')
+        live = Question.objects.filter(course=course, canonical__isnull=True)
+        plans = {
+            'question_live_course_updated': live.order_by('-updated_at', '-id')[:50],
+            'question_live_course_type': live.values('question_type').annotate(n=Count('id')).order_by(),
+            'question_live_block_variant': Question.objects.filter(
+                block=self.trashed.block_id).order_by('variant_number', 'id'),
+            'question_trash': Question.all_objects.filter(deleted_at__isnull=False).order_by('-deleted_at'),
+        }
+        for index, queryset in plans.items():
+            with self.subTest(index=index):
+                self.assertIn(index, queryset.explain())
+
+
+class PurgeJobTests(SeededAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.trash = list(Question.objects.filter(course__code='R1C0').order_by('id')[:5])
+        for q in self.trash:
+            QuestionVersion.objects.create(question=q, text=q.text, version_number=1)
+            q.soft_delete(self.user)
+
+    def image(self, question, name='figure.png'):
+        return QuestionImage.objects.create(question=question, image=SimpleUploadedFile(name, b'png'))
+
+    def run_jobs(self, **options):
+        call_command('run_purge_jobs', stdout=StringIO(), **options)
+
+    def test_empty_trash_returns_a_job_and_purges_in_batches(self):
+        image = self.image(self.trash[0])
+        path = image.image.path
+        response = self.client.post('/api/questions/empty_trash/')
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual((job['status'], job['total'], job['deleted']), ('pending', 5, 0))
+        self.assertEqual(Question.all_objects.filter(deleted_at__isnull=False).count(), 5)
+
+        self.run_jobs(batch_size=2)
+        status = self.client.get(f"/api/questions/purge_jobs/{job['id']}/").json()
+        self.assertEqual((status['status'], status['deleted'], status['files_deleted']), ('done', 5, 1))
+        self.assertEqual(status['progress'], 1.0)
+        ids = [q.id for q in self.trash]
+        self.assertFalse(Question.all_objects.filter(id__in=ids).exists())
+        self.assertFalse(QuestionVersion.objects.filter(question_id__in=ids).exists())
+        self.assertFalse(Question.tags.through.objects.filter(question_id__in=ids).exists())
+        self.assertFalse(QuestionImage.objects.filter(pk=image.pk).exists())
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(set(Tombstone.objects.filter(kind='question').values_list('object_id', flat=True)), set(ids))
+
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(f"/api/questions/purge_jobs/{job['id']}/").status_code, 404)
+
+    def test_only_questions_still_in_trash_when_their_batch_runs(self):
+        job = self.client.post('/api/questions/empty_trash/', {'ids': [q.id for q in self.trash[:3]]},
+                               format='json').json()
+        self.assertEqual(job['total'], 3)
+        self.trash[0].restore()
+        later = Question.objects.filter(course__code='R1C0').exclude(id__in=[q.id for q in self.trash]).first()
+        later.soft_delete(self.user)
+        shared = self.image(self.trash[1], 'shared.png')
+        keeper = QuestionImage.objects.create(question=later, image=shared.image.name)
+
+        self.run_jobs()
+        self.assertEqual(PurgeJob.objects.get(pk=job['id']).deleted, 2)
+        self.assertTrue(Question.objects.filter(pk=self.trash[0].pk).exists())
+        self.assertEqual(Question.all_objects.filter(pk__in=[later.pk, self.trash[3].pk]).count(), 2)
+        self.assertTrue(keeper.image.storage.exists(keeper.image.name))
+
+    def test_copies_outlive_their_canonical(self):
+        copy = Question.objects.filter(course__code='R1C2').first()
+        copy.canonical = self.trash[0]
+        copy.save()
+        response = self.client.delete(f'/api/questions/{self.trash[0].id}/permanent_delete/')
+        self.assertEqual(response.status_code, 204)
+        copy.refresh_from_db()
+        self.assertIsNone(copy.canonical_id)
+        response = self.client.delete(f'/api/questions/{self.trash[0].id}/permanent_delete/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_images_other_questions_embed_are_kept(self):
+        from PIL import Image
+        out = BytesIO()
+        Image.new('RGB', (800, 600), 'blue').save(out, 'PNG')
+        question = Question.objects.filter(course__code='R1C0', deleted_at__isnull=True).first()
+        upload = SimpleUploadedFile('plot.png', out.getvalue(), content_type='image/png')
+        image = QuestionImage.objects.get(pk=self.client.post(
+            f'/api/questions/{question.id}/upload_image/', {'image': upload}, format='multipart').json()['id'])
+        self.client.patch(f'/api/questions/{question.id}/', {'text': f'See {image.markdown_ref}'}, format='json')
+        clone = self.client.post(f'/api/questions/{question.id}/clone/').json()
+
+        question.soft_delete(self.user)
+        self.assertEqual(self.client.delete(f'/api/questions/{question.id}/permanent_delete/').status_code, 204)
+        self.assertFalse(QuestionImage.objects.filter(pk=image.pk).exists())
+        self.assertIn(image.renditions['web'], Question.objects.get(pk=clone['id']).text)
+        storage = image.image.storage
+        self.assertTrue(storage.exists(image.image.name))
+        self.assertTrue(storage.exists(image.renditions['web']))
+
+    def test_permanent_delete_is_limited_to_the_users_courses(self):
+        private = Course.objects.create(code='PRIVATE', name='Private', owner=self.other)
+        theirs = Question.objects.create(course=private, question_type='trueFalse', text='not mine')
+        theirs.soft_delete(self.other)
+        response = self.client.delete(f'/api/questions/{theirs.id}/permanent_delete/')
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Question.all_objects.filter(pk=theirs.pk).exists())
+
+    def test_abandoned_jobs_are_resumed(self):
+        job = PurgeJob.objects.create(requested_by=self.user)
+        PurgeJob.objects.filter(pk=job.pk).update(
+            status=PurgeJob.Status.RUNNING, updated_at=timezone.now() - timedelta(hours=1))
+        self.run_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.deleted), (PurgeJob.Status.DONE, 5))
+
+
+class PropagationTests(SeededAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.canonical = Question.objects.filter(course__code='R1C0', block__isnull=True).first()
+
+    def link(self, course, n=1):
+        copies = []
+        for _ in range(n):
+            copies.append(Question.objects.create(
+                course=Course.objects.get(code=course), canonical=self.canonical, text=self.canonical.text,
+                question_type=self.canonical.question_type, answer_data=self.canonical.answer_data,
+            ))
+        return copies
+
+    def edit(self, text):
+        self.canonical.text = text
+        self.canonical.answer_data = {'solution': text}
+        self.canonical.save()
+
+    def propagate(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f'/api/questions/{self.canonical.id}/propagate/')
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx)
+
+    def test_dry_run_lists_changes_and_read_only_copies(self):
+        mine, = self.link('R1C2')
+        shared, = self.link('R1C1')  # shared with view permission
+        self.link('R1C2')[0].soft_delete()
+        self.edit('Explain amortized analysis of a dynamic array.')
+        plan = self.client.get(f'/api/questions/{self.canonical.id}/propagate/').json()
+        self.assertEqual(plan['changes'], [{'id': mine.id, 'course_code': 'R1C2', 'fields': ['text', 'answer_data']}])
+        self.assertEqual([s['id'] for s in plan['skipped']], [shared.id])
+        mine.refresh_from_db()
+        self.assertNotEqual(mine.text, self.canonical.text)
+
+    def test_bulk_update_with_version_snapshots(self):
+        copies = self.link('R1C2', 3)
+        old_text = copies[0].text
+        self.edit('Explain amortized analysis of a dynamic array.')
+        result, queries = self.propagate()
+        self.assertEqual(sorted(result['updated']), [c.id for c in copies])
+        for copy in copies:
+            copy.refresh_from_db()
+            self.assertEqual((copy.text, copy.answer_data), (self.canonical.text, self.canonical.answer_data))
+            self.assertEqual(copy.fingerprint, self.canonical.fingerprint)
+            [version] = copy.versions.all()
+            self.assertEqual((version.version_number, version.text), (1, old_text))
+        found = search.search(Question.objects.filter(course__code='R1C2'), 'amortized')
+        self.assertEqual({q.id for q in found}, {c.id for c in copies})
+
+        # Query count doesn't grow with the number of copies
+        self.link('R1C2', 6)
+        self.edit('Explain the potential method.')
+        result, more = self.propagate()
+        self.assertEqual(len(result['updated']), 9)
+        self.assertLessEqual(more, queries)
+        self.assertEqual(set(QuestionVersion.objects.filter(question__in=copies).values_list(
+            'version_number', flat=True)), {1, 2})
+
+    def test_opt_in_on_update(self):
+        copy, = self.link('R1C2')
+        url = f'/api/questions/{self.canonical.id}/'
+        self.client.patch(url, {'text': 'Not propagated'}, format='json')
+        copy.refresh_from_db()
+        self.assertNotEqual(copy.text, 'Not propagated')
+        self.client.patch(f'{url}?propagate=1', {'text': 'Propagated'}, format='json')
+        copy.refresh_from_db()
+        self.assertEqual(copy.text, 'Propagated')
+        response = self.client.post(f'/api/questions/{copy.id}/propagate/')
+        self.assertEqual(response.status_code, 400)
+
+
+class VersionHistoryTests(SeededAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.question = Question.objects.filter(course__code='R1C0', block__isnull=True).first()
+        self.texts = []
+        words = [f'word{i}' for i in range(40)]
+        text = '\n'.join(' '.join(words[(i + j) % 40] for j in range(12)) for i in range(30))
+        for n in range(25):
+            text = text.replace(f'word{n} ', f'edit{n} ', 1)
+            self.texts.append(self.question.text)
+            response = self.client.patch(
+                f'/api/questions/{self.question.id}/', {'text': text, 'answer_data': {'solution': f'v{n}'}},
+                format='json'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.question.refresh_from_db()
+
+    def test_snapshots_and_deltas(self):
+        versions = QuestionVersion.objects.filter(question=self.question)
+        self.assertEqual(versions.count(), 25)
+        self.assertEqual(list(versions.filter(is_snapshot=True).values_list('version_number', flat=True)
+                              .order_by('version_number')), [1, 2, 12, 22])  # v1 predates any long text
+        delta = versions.get(version_number=5)
+        self.assertEqual(delta.text, '')
+        self.assertLess(len(json.dumps(delta.delta)), delta.size / 10)
+
+        for number in (1, 2, 9, 12, 25):
+            with self.assertNumQueries(1):
+                text, answer_data = history.content(self.question.id, number)
+            self.assertEqual(text, self.texts[number - 1])
+        self.assertEqual(history.content(self.question.id, 25)[1], {'solution': 'v23'})
+        self.assertIsNone(history.content(self.question.id, 26))
+
+    def test_paginated_summaries(self):
+        url = f'/api/questions/{self.question.id}/versions/'
+        page = self.client.get(url, {'page_size': 10}).json()
+        self.assertEqual([v['version_number'] for v in page['results']], list(range(25, 15, -1)))
+        self.assertNotIn('text', page['results'][0])
+        page = self.client.get(page['next']).json()
+        self.assertEqual(page['results'][0]['version_number'], 15)
+
+        detail = self.client.get(f'{url}9/').json()
+        self.assertEqual(detail['text'], self.texts[8])
+        self.assertEqual(self.client.get(f'{url}99/').status_code, 404)
+
+        # The app's list filters ride along; history has no course count to estimate
+        page = self.client.get(url, {'page_size': 10, 'course': 'R1C0'}).json()
+        self.assertIsNone(page['estimated_count'])
+        self.assertEqual(len(page['results']), 10)
+
+    def test_reads_back_to_the_nearest_snapshot(self):
+        versions = QuestionVersion.objects.filter(question=self.question)
+        # Rewrite snapshot 22 as a delta: 25 is then 13 rows past its snapshot
+        (old_text, old_answers), (text, answers) = (history.content(self.question.id, n) for n in (21, 22))
+        versions.filter(version_number=22).update(is_snapshot=False, text='', answer_data={}, delta={
+            'text': history.diff(old_text, text),
+            'answer_data': history.diff(json.dumps(old_answers, indent=1), json.dumps(answers, indent=1)),
+        })
+        with self.assertNumQueries(1):
+            self.assertEqual(history.content(self.question.id, 25)[0], self.texts[24])
+        # A row gone from the chain (deleted in the admin, say) leaves later deltas unreadable
+        versions.filter(version_number=12).delete()
+        self.assertEqual(history.content(self.question.id, 11)[0], self.texts[10])
+        self.assertIsNone(history.content(self.question.id, 13))
+        self.assertEqual(self.client.get(f'/api/questions/{self.question.id}/versions/13/').status_code, 404)
+        versions.filter(is_snapshot=True).delete()
+        self.assertIsNone(history.content(self.question.id, 25))
+
+    def test_compact_old_history(self):
+        QuestionVersion.objects.filter(question=self.question).delete()
+        for number, text in enumerate(self.texts, 1):
+            QuestionVersion.objects.create(question=self.question, version_number=number, text=text,
+                                           size=history.size(text, {}))
+        out = StringIO()
+        call_command('version_storage', compact=True, stdout=out)
+        self.assertIn('21 versions rewritten', out.getvalue())
+        self.assertIn('4 snapshots, 21 deltas', out.getvalue())
+        for number in (3, 11, 25):
+            self.assertEqual(history.content(self.question.id, number)[0], self.texts[number - 1])
+
+
+class ImagePipelineTests(SeededAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.question = Question.objects.filter(course__code='R1C0').first()
+
+    def png(self, size=(3000, 1000), color='red', name='diagram.png'):
+        from PIL import Image
+        out = BytesIO()
+        Image.new('RGBA', size, color).save(out, 'PNG')
+        return SimpleUploadedFile(name, out.getvalue(), content_type='image/png')
+
+    def upload(self, upload, url='/api/images/'):
+        return self.client.post(url, {'image': upload, 'alt_text': 'graph'}, format='multipart')
+
+    def stored(self):
+        return sorted(os.path.relpath(os.path.join(root, name), self.media)
+                      for root, _, names in os.walk(self.media) for name in names)
+
+    def test_duplicate_uploads_share_one_file_and_renditions(self):
+        from PIL import Image
+        first = self.upload(self.png()).json()
+        second = self.upload(self.png(name='copy.png'), f'/api/questions/{self.question.id}/upload_image/').json()
+        self.assertNotEqual(first['id'], second['id'])
+        self.assertEqual(first['image'], second['image'])
+        self.assertEqual(len(self.stored()), 4)  # original + thumb, web, print
+        self.assertEqual((second['width'], second['height']), (3000, 1000))
+
+        row = QuestionImage.objects.get(pk=second['id'])
+        with Image.open(os.path.join(self.media, row.renditions['thumb'])) as thumb:
+            self.assertEqual((thumb.format, thumb.size), ('WEBP', (320, 107)))
+        with Image.open(os.path.join(self.media, row.renditions['web'])) as web:
+            self.assertEqual(web.size, (1600, 533))
+        with Image.open(os.path.join(self.media, row.renditions['print'])) as printed:
+            self.assertEqual((printed.format, printed.mode, printed.size), ('PNG', 'RGB', (2400, 800)))
+        self.assertIn(row.renditions['print'], row.latex_ref)
+        self.assertTrue(second['thumbnail_url'].endswith('thumb.webp'))
+        self.assertIn('web.webp', row.markdown_ref)
+
+    def test_rejects_files_that_are_not_images(self):
+        fake = SimpleUploadedFile('x.png', b'not an image', content_type='image/png')
+        response = self.upload(fake)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.stored(), [])
+
+    def test_orphans_are_collected(self):
+        unused = QuestionImage.objects.get(pk=self.upload(self.png(color='blue')).json()['id'])
+        used = QuestionImage.objects.get(pk=self.upload(self.png(color='green')).json()['id'])
+        self.question.text += f'\n\n![graph]({used.rendition_url("web")})'
+        self.question.save()
+        shared = QuestionImage.objects.get(pk=self.upload(self.png(color='red')).json()['id'])
+        attached = self.upload(self.png(color='red'), f'/api/questions/{self.question.id}/upload_image/').json()
+        fresh = QuestionImage.objects.get(pk=self.upload(self.png(color='white')).json()['id'])
+        QuestionImage.objects.exclude(pk=fresh.pk).update(created_at=timezone.now() - timedelta(days=2))
+
+        out = StringIO()
+        call_command('process_images', stdout=out)
+        self.assertIn('2 orphan images removed (1 files deleted)', out.getvalue())
+        self.assertEqual(set(QuestionImage.objects.values_list('id', flat=True)), {used.id, attached['id'], fresh.id})
+        self.assertNotIn(unused.image.name, self.stored())
+        self.assertNotIn(unused.renditions['thumb'], self.stored())
+        self.assertIn(shared.image.name, self.stored())
+        self.assertIn(shared.renditions['thumb'], self.stored())
+
+    def test_orphan_references_are_found_in_one_pass(self):
+        keep = self.question
+        keep.answer_data = {'solution': 'See figure-3.png'}
+        keep.save()
+        stale = timezone.now() - timedelta(days=2)
+        for n in range(6):
+            QuestionImage.objects.create(image=f'question_images/legacy/figure-{n}.png', sha256=f'{n}' * 64)
+        QuestionImage.objects.update(created_at=stale)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(images.collect_orphans(), (5, 0))
+        scans = [q for q in ctx.captured_queries if 'FROM "questions_question"' in q['sql']]
+        self.assertEqual(len(scans), 1)
+        self.assertEqual(list(QuestionImage.objects.values_list('image', flat=True)),
+                         ['question_images/legacy/figure-3.png'])
+
+    def test_bank_copies_keep_renditions(self):
+        attached = self.upload(self.png(), f'/api/questions/{self.question.id}/upload_image/').json()
+        original = QuestionImage.objects.get(pk=attached['id'])
+        copy = self.question.question_bank.copy_to_user(self.other)
+        image = QuestionImage.objects.get(question__question_bank=copy)
+        self.assertEqual(
+            (image.image.name, image.sha256, image.width, image.height, image.renditions),
+            (original.image.name, original.sha256, 3000, 1000, original.renditions)
+        )
+        self.assertIn('web.webp', image.markdown_ref)
+
+    def test_backfill_legacy_uploads(self):
+        legacy = QuestionImage.objects.create(question=self.question, image=self.png(name='old.png'))
+        out = StringIO()
+        call_command('process_images', backfill=True, stdout=out)
+        self.assertIn('1 images hashed and rendered', out.getvalue())
+        legacy.refresh_from_db()
+        self.assertEqual(len(legacy.sha256), 64)
+        self.assertEqual(set(legacy.renditions), set(images.RENDITIONS))
+
+
+class CourseExportTests(SeededAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.course = Course.objects.get(code='R1C0')
+        self.bank = self.course.question_banks.get(name='Bank 0')
+        Question.objects.filter(course=self.course).first().soft_delete(self.user)
+        self.live = Question.objects.filter(course=self.course).count()
+        add = dict(course=self.course, question_bank=self.bank, points=3)
+        Question.objects.create(question_type='multipleChoice', text='Pick the "prime" quickly', answer_data={
+            'correct': '7', 'wrong': ['4', "it's 9", 'six, or "6" maybe']
+        }, is_bonus=True, **add)
+        Question.objects.create(question_type='trueFalse', text="It's **true**", answer_data={'correct': False}, **add)
+        Question.objects.create(question_type='matching', text='Match them', answer_data={
+            'choices': ['Albany', 'Boston'], 'solutions': ['New York', 'Massachusetts']
+        }, **add)
+        Question.objects.create(question_type='longAnswer', text='Explain:\n\n- why "it" works\n- in café terms', answer_data={
+            'solution': 'Line one\nline "two" here'
+        }, **add)
+        # Markdown the legacy LaTeX import would rewrite: backslashes, '' and quotes at the edges
+        Question.objects.create(question_type='shortAnswer', text='He said "hi"', answer_data={
+            'solution': '`print("a\\nb")` costs \\$5, or \'\'nothing\'\''
+        }, week=Week.objects.get(course=self.course, number=1), **add)
+        self.live += 5
+
+    def download(self, fmt, **params):
+        response = self.client.get(f'/api/courses/{self.course.code}/export/{fmt}/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn(export.filename(self.course, fmt), response['Content-Disposition'])
+        return b''.join(response.streaming_content)
+
+    def test_csv_has_a_row_per_live_question(self):
+        rows = list(csv.DictReader(StringIO(self.download('csv').decode())))
+        self.assertEqual(len(rows), self.live)
+        mc = next(row for row in rows if row['is_bonus'] == 'True')
+        self.assertEqual(json.loads(mc['answer_data'])['wrong'][2], 'six, or "6" maybe')
+        self.assertEqual(mc['points'], '3')
+        blocked = next(row for row in rows if row['block'])
+        self.assertEqual((blocked['bank'], blocked['week'], blocked['tags']), ('Bank 0', '1', 'R1-tag0; R1-tag1'))
+        essay = next(row for row in rows if row['question_type'] == 'longAnswer')
+        self.assertIn('café', essay['text'])
+
+    def test_moodle_xml(self):
+        quiz = ET.fromstring(self.download('moodle'))
+        kinds = [q.get('type') for q in quiz]
+        self.assertEqual(kinds.count('category'), 2)
+        self.assertEqual(len(kinds) - 2, self.live)
+        tf = next(q for q in quiz if q.get('type') == 'truefalse')
+        self.assertEqual([a.find('text').text for a in tf.findall('answer') if a.get('fraction') == '100'], ['false'])
+        matching = next(q for q in quiz if q.get('type') == 'matching')
+        self.assertEqual(len(matching.findall('subquestion')), 2)
+
+    def test_qti_package(self):
+        archive = zipfile.ZipFile(BytesIO(self.download('qti')))
+        manifest, assessment = archive.namelist()
+        self.assertEqual(manifest, 'imsmanifest.xml')
+        self.assertIn(assessment, archive.read(manifest).decode())
+        ns = {'qti': 'http://www.imsglobal.org/xsd/ims_qtiasiv1p2'}
+        items = ET.fromstring(archive.read(assessment)).findall('.//qti:item', ns)
+        self.assertEqual(len(items), self.live)
+        mc = next(item for item in items if 'prime' in item.get('title'))
+        self.assertEqual(len(mc.findall('.//qti:response_label', ns)), 4)
+        tf = next(item for item in items if 'true' in item.get('title'))
+        self.assertEqual(tf.find('.//qti:mattext', ns).text, "<p>It's <strong>true</strong></p>")
+
+    def test_mkt_round_trips_through_import_questions(self):
+        import import_questions
+        archive = zipfile.ZipFile(BytesIO(self.download('mkt')))
+        self.assertEqual(sorted(archive.namelist()), ['R1C0/questionPool/Bank 0', 'R1C0/questionPool/Bank 1'])
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        archive.extractall(root)
+        os.rename(os.path.join(root, 'R1C0'), os.path.join(root, 'COPY'))
+        with redirect_stdout(StringIO()):
+            import_questions.import_course(os.path.join(root, 'COPY'))
+
+        def content(questions):
+            # import_questions fills in empty answer fields the export leaves out
+            return sorted(
+                (q.question_bank.name, q.block.name if q.block else '', q.variant_number if q.block else 0,
+                 q.question_type, q.text, json.dumps({k: v for k, v in q.answer_data.items() if v}, sort_keys=True),
+                 float(q.points), q.is_bonus, q.difficulty, q.week.number if q.week else None,
+                 sorted(tag.name for tag in q.tags.all()))
+                for q in questions.select_related('question_bank', 'block', 'week').prefetch_related('tags')
+            )
+        copy = Question.objects.filter(question_bank__course__code='COPY')
+        self.assertEqual(content(copy), content(Question.objects.filter(course=self.course)))
+        self.assertEqual(copy.filter(text='He said "hi"').get().answer_data['solution'],
+                         '`print("a\\nb")` costs \\$5, or \'\'nothing\'\'')
+        self.assertEqual(copy.filter(week__number=1).count(),
+                         Question.objects.filter(course=self.course, week__number=1).count())
+        block = QuestionBlock.objects.get(question_bank__course__code='COPY', question_bank__name='Bank 1', name='Block 0')
+        self.assertEqual(block.max_questions, 1)
+        self.assertEqual(block.questions.count(), 3)
+
+    def test_mkt_images(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        with override_settings(MEDIA_ROOT=media):
+            QuestionImage.objects.create(
+                question=Question.objects.filter(course=self.course).first(),
+                image=SimpleUploadedFile('graph.png', b'png bytes', content_type='image/png')
+            )
+            archive = zipfile.ZipFile(BytesIO(self.download('mkt', images=1)))
+        self.assertEqual(archive.read('R1C0/images/graph.png'), b'png bytes')
+
+    def test_reads_in_chunks(self):
+        with CaptureQueriesContext(connection) as ctx:
+            size = sum(len(chunk) for chunk in export.stream(self.course, 'csv', chunk_size=5))
+        self.assertGreater(size, 0)
+        # The question cursor, then one tag query per chunk of 5 rows
+        tag_queries = [q for q in ctx.captured_queries if 'questions_question_tags' in q['sql']]
+        self.assertEqual(len(ctx.captured_queries), 1 + len(tag_queries))
+        self.assertEqual(len(tag_queries), -(-self.live // 5))
+
+    def test_errors(self):
+        self.assertEqual(self.client.get(f'/api/courses/{self.course.code}/export/pdf/').status_code, 400)
+        private = Course.objects.create(code='PRIVATE', name='Private', owner=self.other)
+        self.assertEqual(self.client.get(f'/api/courses/{private.code}/export/csv/').status_code, 404)
+
+    def test_command(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'out.xml')
+        out = StringIO()
+        call_command('export_course', 'R1C0', format='moodle', output=path, stdout=out)
+        self.assertIn(f'Wrote {path}', out.getvalue())
+        self.assertEqual(len(ET.parse(path).getroot()) - 2, self.live)
+
+
+class BulkImportTests(SeededAPITestCase):
+
+    CHAP1 = """
+[intro]
+type = shortAnswer
+question = "What does \\textbf{mkt} stand for?"
+solution = "Make test"
+tags = chapter1, basics
+difficulty = easy
+
+[pick]
+maxQuestions = 1
+    [[1]]
+    type = multipleChoice
+    question = "Pick one"
+    correctAnswer = "A"
+    wrongAnswers = "B", "\\texttt{C}"
+    [[2]]
+    type = trueFalse
+    question = "True?"
+    solution = false
+"""
+    WEEK3 = """
+[q1]
+type = shortAnswer
+question = "Week three question"
+solution = "It is"
+"""
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=self.media)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.course = Course.objects.create(code='POOLS', name='Pools', owner=self.user)
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.write('POOLS/questionPool/chap1', self.CHAP1)
+        self.write('POOLS/quizPool/week3.txt', self.WEEK3)
+
+    def write(self, path, text):
+        path = os.path.join(self.root, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def import_pool(self, **options):
+        out = StringIO()
+        call_command('import_pool', self.root, course='POOLS', workers=1, stdout=out, **options)
+        return ImportJob.objects.filter(course=self.course).first(), out.getvalue()
+
+    def test_imports_banks_blocks_tags_and_weeks(self):
+        job, out = self.import_pool()
+        self.assertIn('4 questions created from 2 files', out)
+        self.assertEqual((job.status, job.files_done, job.file_errors), (ImportJob.Status.DONE, 2, []))
+        questions = Question.objects.filter(course=self.course)
+        self.assertEqual(questions.count(), 4)
+        intro = questions.get(question_bank__name='chap1', block__isnull=True)
+        self.assertEqual(intro.text, 'What does **mkt** stand for?')
+        self.assertEqual((intro.difficulty, intro.points), ('easy', 2))
+        self.assertEqual(set(intro.tags.values_list('name', flat=True)), {'chapter1', 'basics'})
+        block = QuestionBlock.objects.get(question_bank__course=self.course, name='pick')
+        self.assertEqual(sorted(block.questions.values_list('variant_number', 'question_type', 'answer_data')), [
+            (1, 'multipleChoice', {'correct': 'A', 'wrong': ['B', '`C`']}),
+            (2, 'trueFalse', {'correct': False}),
+        ])
+        self.assertEqual(intro.answer_data, {'solution': 'Make test'})
+        weekly = questions.get(question_bank__name='quizPool')
+        self.assertEqual((weekly.week.number, weekly.points), (3, 1))
+        self.assertEqual(list(weekly.tags.values_list('name', flat=True)), ['Week 3'])
+        self.assertEqual(set(ImportedFile.objects.filter(course=self.course).values_list('path', flat=True)),
+                         {'questionPool/chap1', 'quizPool/week3.txt'})
+        # Found by search without a save() per question
+        self.assertEqual(list(search.search(Question.objects.all(), 'stand').values_list('id', flat=True)), [intro.id])
+
+    def test_course_directory_files_are_banks(self):
+        # As import_questions.py always did: files beside questionPool, and atop the imported directory
+        self.write('POOLS/sample.ini', '[loose]\nquestion = "Beside the pools"\n')
+        self.write('top.ini', '[top]\nquestion = "At the top"\n')
+        self.write('POOLS/images/figure.ini', '[no]\nquestion = "Not a course directory"\n')
+        job, _ = self.import_pool()
+        self.assertEqual((job.total_files, job.questions_created, job.file_errors), (4, 6, []))
+        self.assertEqual(
+            set(Question.objects.filter(course=self.course, question_bank__name__in=['sample', 'top'])
+                .values_list('question_bank__name', 'text')),
+            {('sample', 'Beside the pools'), ('top', 'At the top')}
+        )
+        self.assertTrue(ImportedFile.objects.filter(course=self.course, path='sample.ini').exists())
+
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, 'w') as z:
+            for path in ('POOLS/sample.ini', 'POOLS/questionPool/chap1', 'POOLS/images/figure.ini'):
+                z.write(os.path.join(self.root, path), path)
+        copy = Course.objects.create(code='COPY', name='Copy', owner=self.user)
+        job = ImportJob.objects.create(requested_by=self.user, course=copy, source='pools.zip',
+                                       archive=SimpleUploadedFile('pools.zip', archive.getvalue()))
+        job = importer.run(job, workers=1)
+        self.assertEqual((job.total_files, job.questions_created), (2, 4))
+
+    def test_reruns_only_import_changed_files(self):
+        self.import_pool()
+        ImportJob.objects.all().delete()
+        job, out = self.import_pool()
+        self.assertEqual((job.files_skipped, job.questions_created), (2, 0))
+
+        self.write('POOLS/questionPool/chap1', self.CHAP1 + '\n[extra]\nquestion = "One more"\ntags = new\n')
+        ImportJob.objects.all().delete()
+        job, _ = self.import_pool()
+        self.assertEqual((job.files_skipped, job.questions_created, job.questions_existing), (1, 1, 3))
+        self.assertEqual(Question.objects.filter(course=self.course).count(), 5)
+
+    def test_bad_files_are_reported_and_skipped(self):
+        self.write('POOLS/questionPool/broken', '[a]\nquestion = "x"\n[a]\nquestion = "y"\n')
+        job, out = self.import_pool()
+        self.assertEqual(job.status, ImportJob.Status.DONE)
+        self.assertEqual([e['path'] for e in job.file_errors], ['questionPool/broken'])
+        self.assertIn('questionPool/broken', out)
+        self.assertEqual(Question.objects.filter(course=self.course).count(), 4)
+        self.assertFalse(ImportedFile.objects.filter(path='questionPool/broken').exists())
+
+    def test_parses_in_a_process_pool(self):
+        for n in range(6):
+            self.write(f'POOLS/questionPool/extra{n}', f'[q]\nquestion = "Extra {n}"\n')
+        job = ImportJob.objects.create(requested_by=self.user, course=self.course, source=self.root)
+        job = importer.run(job, workers=2, batch_size=3)
+        self.assertEqual((job.status, job.total_files, job.questions_created), (ImportJob.Status.DONE, 8, 10))
+
+    def test_writes_a_batch_in_a_fixed_number_of_queries(self):
+        def queries(files):
+            for n in range(files):
+                self.write(f'POOLS/questionPool/more{files}-{n}', self.CHAP1.replace('mkt', f'mkt {files} {n}'))
+            job = ImportJob.objects.create(requested_by=self.user, course=self.course, source=self.root)
+            with CaptureQueriesContext(connection) as ctx:
+                importer.run(job, workers=1)
+            return len(ctx.captured_queries)
+        queries(1)
+        # Each new bank is an insert and its post_save bump; nothing else grows with the files
+        self.assertEqual(queries(8) - queries(2), 2 * 6)
+
+    def test_upload_runs_in_the_background(self):
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, 'w') as z:
+            for path in ('POOLS/questionPool/chap1', 'POOLS/quizPool/week3.txt'):
+                z.write(os.path.join(self.root, path), path)
+        upload = SimpleUploadedFile('pools.zip', archive.getvalue(), content_type='application/zip')
+        response = self.client.post('/api/courses/POOLS/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        job = response.json()
+        self.assertEqual((job['status'], job['source']), ('pending', 'pools.zip'))
+        stored = ImportJob.objects.get(pk=job['id']).archive
+
+        call_command('run_import_jobs', workers=1, stdout=StringIO())
+        status = self.client.get(f"/api/courses/POOLS/import_jobs/{job['id']}/").json()
+        self.assertEqual((status['status'], status['questions_created'], status['progress']), ('done', 4, 1.0))
+        self.assertFalse(stored.storage.exists(stored.name))
+        self.assertEqual(Question.objects.filter(course=self.course).count(), 4)
+
+        self.client.force_authenticate(self.other)
+        self.assertEqual(self.client.get(f"/api/courses/POOLS/import_jobs/{job['id']}/").status_code, 404)
+
+    def test_abandoned_jobs_are_resumed(self):
+        job = ImportJob.objects.create(requested_by=self.user, course=self.course, source=self.root)
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.Status.RUNNING, updated_at=timezone.now() - jobs.STALE_AFTER * 2)
+        fresh = ImportJob.objects.create(requested_by=self.user, course=self.course, source=self.root)
+        ImportJob.objects.filter(pk=fresh.pk).update(status=ImportJob.Status.RUNNING)
+        call_command('run_import_jobs', workers=1, stdout=StringIO())
+        job.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual((job.status, job.questions_created), (ImportJob.Status.DONE, 4))
+        self.assertEqual(fresh.status, ImportJob.Status.RUNNING)  # its worker may still be at it
+
+    def test_upload_errors(self):
+        text = SimpleUploadedFile('pools.zip', b'not a zip')
+        self.assertEqual(self.client.post('/api/courses/POOLS/import/', {'file': text}, format='multipart').status_code, 400)
+        self.assertEqual(self.client.post('/api/courses/POOLS/import/', {}, format='multipart').status_code, 400)
+        # R1C1 is shared with self.user view-only
+        archive = BytesIO()
+        zipfile.ZipFile(archive, 'w').close()
+        upload = SimpleUploadedFile('pools.zip', archive.getvalue())
+        self.assertEqual(self.client.post('/api/courses/R1C1/import/', {'file': upload}, format='multipart').status_code, 403)
+        self.assertFalse(ImportJob.objects.exists())
@@ -1,34 +1,50 @@
+import zipfile
+
 from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
-from django.db.models import Q, Count, Avg
+from rest_framework.renderers import JSONRenderer
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.text import compress_string
+from django.db.models import Q, Count, Avg, Exists, OuterRef, Prefetch
+from django.db import transaction
 from django.contrib.auth.models import User
-from django.conf import settings
-from .models import Tag, Course, QuestionBank, QuestionBlock, Question, QuestionVersion, Week, CourseShare, QuestionBankShare, QuestionImage
-from exams.models import ExamTemplate, ExamTemplateShare
-
-# Try to import PostgreSQL full-text search, fall back gracefully
-try:
-    from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
-    HAS_POSTGRES_SEARCH = 'postgresql' in settings.DATABASES.get('default', {}).get('ENGINE', '')
-except ImportError:
-    HAS_POSTGRES_SEARCH = False
+from .models import Tag, Course, QuestionBank, QuestionBlock, Question, QuestionVersion, Week, CourseShare, QuestionBankShare, CourseUsage, QuestionSignature, DuplicateCluster, PurgeJob, ImportJob, count_subquery
+from exams.models import ExamTemplate
+
+from . import search as question_search
+from . import bulk as bulk_edit
+from . import export, history, images, propagation, purge
+from . import sync
+from .pagination import HistoryPagination, QuestionPagination
+from .access import OWNER, accessible_course_ids, course_permission, shared_bank_ids
+from .versioning import VersionedListMixin
+from .fastlist import FastListMixin
+from .fieldsets import FieldSet
 from .serializers import (
     TagSerializer, CourseSerializer, QuestionBankSerializer, QuestionBlockSerializer,
-    QuestionListSerializer, QuestionDetailSerializer, QuestionVersionSerializer, WeekSerializer,
-    CourseShareSerializer, QuestionBankShareSerializer, UserSerializer, QuestionImageSerializer
+    QuestionListSerializer, QuestionDetailSerializer, QuestionVersionSerializer, QuestionVersionSummarySerializer,
+    WeekSerializer, CourseShareSerializer, QuestionBankShareSerializer, UserSerializer, QuestionImageSerializer,
+    TagValuesSerializer, QuestionBankValuesSerializer, QuestionValuesSerializer, PurgeJobSerializer, ImportJobSerializer, block_variants
 )
 
+SYNC_GZIP_MIN_BYTES = 1024
+UUID_PATTERN = r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+
 
-class TagViewSet(viewsets.ModelViewSet):
+class TagViewSet(VersionedListMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    fast_serializer = TagValuesSerializer
     search_fields = ['name']
     pagination_class = None
+    content_tags = True
 
     def get_queryset(self):
-        queryset = Tag.objects.all()
+        queryset = Tag.objects.annotate(
+            _question_count=count_subquery(Question.tags.through.objects, 'tag')
+        )
         course = self.request.query_params.get('course')
         if course:
             # Get tags used by questions in this course
@@ -37,8 +53,11 @@ class TagViewSet(viewsets.ModelViewSet):
             ).distinct()
         return queryset.order_by('name')
 
+    def content_course_ids(self):
+        return None  # Tags and their counts span every course
 
-class CourseViewSet(viewsets.ModelViewSet):
+
+class CourseViewSet(VersionedListMixin, viewsets.ModelViewSet):
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
     search_fields = ['name', 'code']
@@ -50,9 +69,13 @@ class CourseViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return Course.objects.none()
         # Show courses user owns or that are shared with them
-        return Course.objects.filter(
-            Q(owner=user) | Q(shares__shared_with=user)
-        ).distinct()
+        # Annotate counts and share status to avoid N+1 queries in the serializer
+        return Course.objects.select_related('owner').filter(
+            id__in=accessible_course_ids(user)
+        ).annotate(
+            _question_count=count_subquery(Question.objects, 'course'),
+            _is_shared=Exists(CourseShare.objects.filter(course=OuterRef('pk'), shared_with=user))
+        )
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -72,30 +95,29 @@ class CourseViewSet(viewsets.ModelViewSet):
         except User.DoesNotExist:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        # Share the course
-        share, created = CourseShare.objects.update_or_create(
-            course=course,
-            shared_with=target_user,
-            defaults={'permission': permission, 'shared_by': request.user}
-        )
+        # Share the course and cascade to the owner's banks and templates in it
+        share = course.share_with([target_user], permission, request.user).get()
+        return Response(CourseShareSerializer(share).data)
 
-        # Cascade: share all question banks in this course
-        for bank in course.question_banks.filter(owner=request.user):
-            QuestionBankShare.objects.update_or_create(
-                bank=bank,
-                shared_with=target_user,
-                defaults={'permission': permission, 'shared_by': request.user}
-            )
+    @action(detail=True, methods=['post'])
+    def share_many(self, request, code=None):
+        """Share this course with a list of users (e.g. all TAs) in one call"""
+        course = self.get_object()
+        if course.owner != request.user:
+            return Response({'error': 'Only the owner can share'}, status=status.HTTP_403_FORBIDDEN)
 
-        # Cascade: share all exam templates in this course
-        for template in course.exam_templates.filter(owner=request.user):
-            ExamTemplateShare.objects.update_or_create(
-                template=template,
-                shared_with=target_user,
-                defaults={'permission': permission, 'shared_by': request.user}
-            )
+        usernames = request.data.get('usernames') or []
+        permission = request.data.get('permission', 'view')
+        if not isinstance(usernames, list) or not usernames:
+            return Response({'error': 'usernames must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(CourseShareSerializer(share).data)
+        users = list(User.objects.filter(username__in=usernames))
+        missing = sorted(set(usernames) - {u.username for u in users})
+        if missing:
+            return Response({'error': 'User not found', 'usernames': missing}, status=status.HTTP_404_NOT_FOUND)
+
+        shares = course.share_with(users, permission, request.user)
+        return Response(CourseShareSerializer(shares, many=True).data)
 
     @action(detail=True, methods=['delete'])
     def unshare(self, request, code=None):
@@ -105,24 +127,7 @@ class CourseViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Only the owner can manage sharing'}, status=status.HTTP_403_FORBIDDEN)
 
         username = request.data.get('username')
-
-        # Unshare the course
-        CourseShare.objects.filter(course=course, shared_with__username=username).delete()
-
-        # Cascade: unshare all question banks in this course
-        QuestionBankShare.objects.filter(
-            bank__course=course,
-            bank__owner=request.user,
-            shared_with__username=username
-        ).delete()
-
-        # Cascade: unshare all exam templates in this course
-        ExamTemplateShare.objects.filter(
-            template__course=course,
-            template__owner=request.user,
-            shared_with__username=username
-        ).delete()
-
+        course.unshare_with(User.objects.filter(username=username), request.user)
         return Response({'status': 'unshared'})
 
     @action(detail=True, methods=['get'])
@@ -134,8 +139,72 @@ class CourseViewSet(viewsets.ModelViewSet):
         shares = course.shares.all()
         return Response(CourseShareSerializer(shares, many=True).data)
 
+    @action(detail=True, methods=['get'])
+    def changes(self, request, code=None):
+        """Delta sync: rows changed since ?since=<token> (everything without one), see questions/sync.py"""
+        course = self.get_object()
+        try:
+            data = sync.changes(course, request.query_params.get('since'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        body = JSONRenderer().render(data)
+        response = HttpResponse(content_type='application/json')
+        if len(body) > SYNC_GZIP_MIN_BYTES and 'gzip' in request.headers.get('Accept-Encoding', ''):
+            body = compress_string(body)
+            response['Content-Encoding'] = 'gzip'
+        response.content = body
+        response['Vary'] = 'Accept-Encoding'
+        response['Cache-Control'] = 'private, no-store'
+        return response
+
+    @action(detail=True, methods=['get'], url_path=r'export/(?P<fmt>[a-z]+)')
+    def export(self, request, code=None, fmt=None):
+        """Stream every live question in the course as csv, moodle, qti or mkt (?images=1 packs image files), see questions/export.py"""
+        course = self.get_object()
+        if fmt not in export.WRITERS:
+            return Response({'error': f"Unknown format. Use one of: {', '.join(export.WRITERS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        with_images = request.query_params.get('images') in ('1', 'true')
+        response = StreamingHttpResponse(
+            export.stream(course, fmt, images=with_images), content_type=export.WRITERS[fmt].content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="{export.filename(course, fmt)}"'
+        response['Cache-Control'] = 'private, no-store'
+        return response
+
+    @action(detail=True, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def import_pool(self, request, code=None):
+        """Queue an import of an uploaded zip of mkt question pools (see questions/importer.py).
 
-class WeekViewSet(viewsets.ModelViewSet):
+        Returns 202 with the import job; `run_import_jobs` imports it and
+        import_jobs/<id>/ reports its progress.
+        """
+        course = self.get_object()
+        if course_permission(request.user, course.id) not in (OWNER, 'edit'):
+            return Response({'error': 'You need edit access to import into this course'},
+                            status=status.HTTP_403_FORBIDDEN)
+        upload = request.FILES.get('file')
+        if not upload:
+            return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
+        if not zipfile.is_zipfile(upload):
+            return Response({'error': 'Upload a zip of questionPool/quizPool files'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        upload.seek(0)
+        job = ImportJob.objects.create(requested_by=request.user, course=course, archive=upload, source=upload.name)
+        return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'], url_path=rf'import_jobs/(?P<job_id>{UUID_PATTERN})')
+    def import_job(self, request, code=None, job_id=None):
+        """Status and progress of one of the user's imports into this course"""
+        course = self.get_object()
+        job = ImportJob.objects.filter(pk=job_id, course=course, requested_by=request.user.id).first()
+        if job is None:
+            return Response({'error': 'Import job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ImportJobSerializer(job).data)
+
+
+class WeekViewSet(VersionedListMixin, viewsets.ModelViewSet):
     queryset = Week.objects.select_related('course').all()
     serializer_class = WeekSerializer
     pagination_class = None
@@ -149,10 +218,14 @@ class WeekViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(course__code=course)
         return queryset.order_by('course', 'number')
 
+    def content_course_ids(self):
+        return None  # Not limited to the user's courses
+
 
-class QuestionBankViewSet(viewsets.ModelViewSet):
+class QuestionBankViewSet(VersionedListMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = QuestionBank.objects.select_related('course').all()
     serializer_class = QuestionBankSerializer
+    fast_serializer = QuestionBankValuesSerializer
     search_fields = ['name', 'description']
     pagination_class = None  # Return all banks without pagination
 
@@ -161,22 +234,31 @@ class QuestionBankViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return QuestionBank.objects.none()
 
-        # Use annotate to avoid N+1 queries for question_count and block_count
+        # Use annotate to avoid N+1 queries for question_count, block_count and is_shared.
+        # Subquery counts keep the two reverse joins from multiplying each other.
         queryset = QuestionBank.objects.select_related('course', 'owner').annotate(
-            question_count=Count('questions'),
-            block_count=Count('blocks')
+            question_count=count_subquery(Question.objects, 'question_bank'),
+            block_count=count_subquery(QuestionBlock.objects, 'question_bank'),
+            _is_shared=Exists(QuestionBankShare.objects.filter(bank=OuterRef('pk'), shared_with=user))
         )
 
         # Filter by ownership or sharing
         queryset = queryset.filter(
-            Q(owner=user) | Q(shares__shared_with=user) | Q(course__owner=user) | Q(course__shares__shared_with=user)
-        ).distinct()
+            Q(owner=user) | Q(id__in=shared_bank_ids(user)) | Q(course_id__in=accessible_course_ids(user))
+        )
 
         course = self.request.query_params.get('course')
         if course:
             queryset = queryset.filter(course__code=course)
         return queryset
 
+    def content_course_ids(self):
+        # Owned and directly shared banks can sit in courses the user can't otherwise see
+        user = self.request.user
+        return set(accessible_course_ids(user)) | set(QuestionBank.objects.filter(
+            Q(owner=user) | Q(id__in=shared_bank_ids(user))
+        ).values_list('course_id', flat=True))
+
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
@@ -231,14 +313,16 @@ class QuestionBankViewSet(viewsets.ModelViewSet):
         return Response(QuestionBankShareSerializer(shares, many=True).data)
 
 
-class QuestionBlockViewSet(viewsets.ModelViewSet):
+class QuestionBlockViewSet(VersionedListMixin, viewsets.ModelViewSet):
     queryset = QuestionBlock.objects.select_related('question_bank__course').all()
     serializer_class = QuestionBlockSerializer
     search_fields = ['name', 'description']
     pagination_class = None
 
     def get_queryset(self):
-        queryset = QuestionBlock.objects.select_related('question_bank__course').all()
+        queryset = QuestionBlock.objects.select_related('question_bank__course').annotate(
+            _question_count=count_subquery(Question.objects, 'block')
+        )
         course = self.request.query_params.get('course')
         if course:
             queryset = queryset.filter(question_bank__course__code=course)
@@ -247,6 +331,9 @@ class QuestionBlockViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(question_bank_id=bank)
         return queryset
 
+    def content_course_ids(self):
+        return None  # Not limited to the user's courses
+
     @action(detail=True, methods=['get'])
     def questions(self, request, pk=None):
         """Get all questions in this block"""
@@ -255,18 +342,25 @@ class QuestionBlockViewSet(viewsets.ModelViewSet):
         return Response(QuestionListSerializer(questions, many=True).data)
 
 
-from rest_framework.pagination import PageNumberPagination
+def attach_block_variants(questions):
+    """Load the variant summaries of every block on a page in one query.
+
+    Sets `_block_types` and `_block_variant_count` on each question so
+    QuestionListSerializer doesn't query per row.
+    """
+    variants = block_variants({q.block_id for q in questions if q.block_id})
+    for q in questions:
+        if q.block_id:
+            q._block_types = variants.get(q.block_id, [])
+            q._block_variant_count = len(q._block_types)
 
-class LargeResultsSetPagination(PageNumberPagination):
-    page_size = 500
-    page_size_query_param = 'page_size'
-    max_page_size = 2000
 
-class QuestionViewSet(viewsets.ModelViewSet):
+class QuestionViewSet(VersionedListMixin, FastListMixin, viewsets.ModelViewSet):
     queryset = Question.objects.all()
-    pagination_class = LargeResultsSetPagination
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['text', 'tags__name']
+    fast_serializer = QuestionValuesSerializer
+    pagination_class = QuestionPagination
+    # ?search= is handled in get_queryset by the full-text index, not SearchFilter
+    filter_backends = [filters.OrderingFilter]
     ordering_fields = ['created_at', 'updated_at', 'points', 'difficulty', 'times_used']
     ordering = ['-updated_at']
 
@@ -275,34 +369,66 @@ class QuestionViewSet(viewsets.ModelViewSet):
             return QuestionListSerializer
         return QuestionDetailSerializer
 
+    def get_fieldset(self):
+        """?fields= / ?expand= / ?compact=1 for reads (see questions/fieldsets.py), else None"""
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = None
+            if self.action in ('list', 'retrieve'):
+                self._fieldset = FieldSet.from_request(self.request, self.get_serializer_class())
+        return self._fieldset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fieldset'] = self.get_fieldset()
+        return context
+
+    def wants(self, *names):
+        fieldset = self.get_fieldset()
+        return fieldset is None or fieldset.wants(*names)
+
+    @property
+    def content_tags(self):
+        # Nested tags carry question_count, which counts across every course
+        fieldset = self.get_fieldset()
+        return self.wants('tags') and not (fieldset is not None and fieldset.tag_ids)
+
     def get_queryset(self):
         user = self.request.user
         if not user.is_authenticated:
             return Question.objects.none()
 
-        queryset = Question.objects.select_related(
-            'course',
-            'question_bank',  # Keep for backwards compatibility
-            'block',  # Add block to avoid N+1 for block info
-            'week'   # Add week to avoid N+1 for week info
-        ).prefetch_related('tags')
-
-        # Filter by course ownership/sharing
-        # User can see questions if they own the course or it's shared with them
-        queryset = queryset.filter(
-            Q(course__owner=user) |
-            Q(course__shares__shared_with=user)
-        ).distinct()
-
+        # Only join and prefetch what the requested fields use
+        related = [
+            name for name, fields in (
+                ('course', ('course_code',)),
+                ('question_bank', ('bank_name',)),  # Keep for backwards compatibility
+                ('block', ('block_name', 'block_max_questions', 'block_variant_count')),
+                ('week', ('week_number', 'week_name')),
+            ) if self.wants(*fields)
+        ]
         # Check if we're viewing trash
         show_trash = self.request.query_params.get('trash') == 'true'
-
         if show_trash:
             # Only show deleted questions
-            queryset = queryset.filter(deleted_at__isnull=False)
+            queryset = Question.all_objects.filter(deleted_at__isnull=False)
         else:
-            # Exclude deleted questions by default
-            queryset = queryset.filter(deleted_at__isnull=True)
+            queryset = Question.objects.all()
+        if related:
+            queryset = queryset.select_related(*related)
+        fieldset = self.get_fieldset()
+        if fieldset is not None and fieldset.tag_ids:
+            if 'tags' in fieldset:
+                queryset = queryset.prefetch_related(Prefetch('tags', queryset=Tag.objects.only('id')))
+        elif self.wants('tags'):
+            queryset = queryset.prefetch_related(
+                Prefetch('tags', queryset=Tag.objects.annotate(
+                    _question_count=count_subquery(Question.tags.through.objects, 'tag')
+                ))
+            )
+
+        # Filter by course ownership/sharing
+        # User can see questions if they own the course or it's shared with them
+        queryset = queryset.filter(course_id__in=accessible_course_ids(user))
 
         # For list view, only show canonical questions (not duplicates)
         # and only show one question per block (variant 1 or first)
@@ -313,10 +439,11 @@ class QuestionViewSet(viewsets.ModelViewSet):
                 Q(block__isnull=True) | Q(variant_number__isnull=True) | Q(variant_number=1)
             )
             # Annotate with counts to avoid N+1 queries in serializers
-            queryset = queryset.annotate(
-                _linked_count=Count('linked_questions', distinct=True),
-                _block_variant_count=Count('block__questions', distinct=True)
-            )
+            # (block variants and their counts are attached per page, see paginate_queryset)
+            if self.wants('linked_count'):
+                queryset = queryset.annotate(
+                    _linked_count=count_subquery(Question.objects, 'canonical')
+                )
 
         # Filter by course
         course = self.request.query_params.get('course')
@@ -341,27 +468,26 @@ class QuestionViewSet(viewsets.ModelViewSet):
         # Filter by tags
         tags = self.request.query_params.getlist('tags')
         if tags:
-            queryset = queryset.filter(tags__name__in=tags).distinct()
+            queryset = queryset.filter(
+                id__in=Question.tags.through.objects.filter(tag__name__in=tags).values('question_id')
+            )
 
         # Filter by week
         week = self.request.query_params.get('week')
         if week:
             queryset = queryset.filter(week_id=week)
 
-        # Enhanced search (overrides default DRF search)
+        # Full-text search (see questions/search.py)
         search = self.request.query_params.get('search')
         if search:
             search = search.strip()
-            if HAS_POSTGRES_SEARCH:
-                # Use PostgreSQL full-text search with ranking
-                search_vector = SearchVector('text', weight='A') + SearchVector('tags__name', weight='B')
-                search_query = SearchQuery(search)
-                queryset = queryset.annotate(
-                    search=search_vector,
-                    rank=SearchRank(search_vector, search_query)
-                ).filter(search=search_query).order_by('-rank')
+            results = question_search.search(queryset, search)
+            if results is not None:
+                # Ranked full-text search; keep rank order unless ?ordering= is given
+                queryset = results
+                self.ordering = ['-_search_rank', '-updated_at']
             else:
-                # SQLite fallback: improved multi-word search
+                # No search index (SQLite built without FTS5): multi-word icontains
                 # Split search into words and require all words to match
                 words = search.split()
                 for word in words:
@@ -374,12 +500,49 @@ class QuestionViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and self.action == 'list':
+            if self.wants('block_types', 'block_variant_count'):
+                attach_block_variants(page)
+            search = self.request.query_params.get('search', '').strip()
+            if search and self.wants('search_snippet'):
+                question_search.attach_snippets(page, search)
+        return page
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        # Warn about near-duplicates already in the course (LSH index lookup)
+        question = self._created
+        response.data['possible_duplicates'] = [
+            {'id': qid, 'similarity': score}
+            for qid, score in QuestionSignature.similar_to(question.text, question.course_id, exclude_id=question.id)
+        ] if question.course_id else []
+        return response
+
     def perform_create(self, serializer):
         # If question_bank provided but not course, derive course from bank (backwards compatibility)
         validated_data = serializer.validated_data
         if validated_data.get('question_bank') and not validated_data.get('course'):
             validated_data['course'] = validated_data['question_bank'].course
-        serializer.save(created_by=self.request.user if self.request.user.is_authenticated else None)
+        self._created = serializer.save(created_by=self.request.user if self.request.user.is_authenticated else None)
+
+    def perform_update(self, serializer):
+        # ?propagate=1 pushes content changes on to the question's copies
+        with transaction.atomic():
+            # Concurrent edits of a question take their version numbers one at a time
+            locked = Question.all_objects.select_for_update().get(pk=serializer.instance.pk)
+            before = {name: getattr(locked, name) for name in propagation.FIELDS}
+            question = serializer.save()
+            if question.text != before['text'] or question.answer_data != before['answer_data']:
+                user = self.request.user if self.request.user.is_authenticated else None
+                history.record([(question.id, before['text'], before['answer_data'])], user,
+                               self.request.data.get('change_summary', ''))
+            propagate = self.request.query_params.get('propagate', '').lower() in ('1', 'true', 'yes')
+            if propagate and question.canonical_id is None and any(
+                getattr(question, name) != value for name, value in before.items()
+            ):
+                propagation.propagate(question, self.request.user)
 
     def destroy(self, request, *args, **kwargs):
         """Soft delete instead of hard delete"""
@@ -391,7 +554,7 @@ class QuestionViewSet(viewsets.ModelViewSet):
     def restore(self, request, pk=None):
         """Restore a soft-deleted question from trash"""
         # Get the question even if it's deleted
-        question = Question.objects.filter(pk=pk).first()
+        question = Question.all_objects.filter(pk=pk).first()
         if not question:
             return Response({'error': 'Question not found'}, status=status.HTTP_404_NOT_FOUND)
         if not question.deleted_at:
@@ -402,29 +565,41 @@ class QuestionViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['delete'])
     def permanent_delete(self, request, pk=None):
         """Permanently delete a question from trash"""
-        question = Question.objects.filter(pk=pk, deleted_at__isnull=False).first()
-        if not question:
+        trashed = Question.all_objects.filter(
+            pk=pk, deleted_at__isnull=False, course_id__in=accessible_course_ids(request.user)
+        ).values_list('id', flat=True)
+        deleted, _ = purge.purge(list(trashed))
+        if not deleted:
             return Response({'error': 'Question not found in trash'}, status=status.HTTP_404_NOT_FOUND)
-        question.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['post'])
     def empty_trash(self, request):
-        """Permanently delete all trashed questions for the current user's courses"""
+        """Queue permanent deletion of the trashed questions in the current user's courses.
+
+        Body: optional {"ids": [...]} to purge only those. Returns 202 with the
+        purge job; `run_purge_jobs` deletes the questions in batches and
+        purge_jobs/<id>/ reports its progress.
+        """
         user = request.user
         if not user.is_authenticated:
             return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
-
-        # Get questions in trash from user's courses
-        deleted = Question.objects.filter(
-            deleted_at__isnull=False
-        ).filter(
-            Q(course__owner=user) |
-            Q(created_by=user)
-        )
-        count = deleted.count()
-        deleted.delete()
-        return Response({'deleted': count})
+        ids = request.data.get('ids')
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids)):
+            return Response({'error': 'ids must be a list of question ids'}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = PurgeJob.objects.create(requested_by=user, question_ids=ids)
+        job.total = purge.trashed(job).count()
+        job.save(update_fields=['total'])
+        return Response(PurgeJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=rf'purge_jobs/(?P<job_id>{UUID_PATTERN})')
+    def purge_job(self, request, job_id=None):
+        """Status and progress of one of the user's purge jobs"""
+        job = PurgeJob.objects.filter(pk=job_id, requested_by=request.user.id).first()
+        if job is None:
+            return Response({'error': 'Purge job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(PurgeJobSerializer(job).data)
 
     @action(detail=False, methods=['get'])
     def trash_count(self, request):
@@ -433,7 +608,7 @@ class QuestionViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return Response({'count': 0})
 
-        count = Question.objects.filter(
+        count = Question.all_objects.filter(
             deleted_at__isnull=False
         ).filter(
             Q(course__owner=user) |
@@ -441,6 +616,33 @@ class QuestionViewSet(viewsets.ModelViewSet):
         ).count()
         return Response({'count': count})
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Apply one set of changes to many questions in a single transaction.
+
+        Body: {"ids": [...], "operations": {...}} (see questions/bulk.py). Without
+        ids, the list filters in the query string pick the questions; ?course=
+        is required then so a request can't touch every course at once.
+        """
+        ids = request.data.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+                return Response({'error': 'ids must be a list of question ids'}, status=status.HTTP_400_BAD_REQUEST)
+            # Trashed questions too, so they can be restored
+            questions = Question.all_objects.filter(id__in=ids, course_id__in=accessible_course_ids(request.user))
+        elif request.query_params.get('course'):
+            questions = self.get_queryset().prefetch_related(None)
+        else:
+            return Response({'error': 'Give ids or a ?course= filter'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            changed, errors = bulk_edit.apply(request.user, questions, request.data.get('operations'), ids)
+        except PermissionError as e:
+            return Response({'error': str(e)}, status=status.HTTP_403_FORBIDDEN)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'updated': len(changed), 'ids': changed, 'errors': errors})
+
     @action(detail=False, methods=['get'])
     def usage_stats(self, request):
         """Get question usage statistics"""
@@ -448,93 +650,95 @@ class QuestionViewSet(viewsets.ModelViewSet):
         if not user.is_authenticated:
             return Response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
 
-        # Get all questions accessible to user (not deleted)
-        queryset = Question.objects.filter(
-            deleted_at__isnull=True
-        ).filter(
-            Q(question_bank__course__owner=user) |
-            Q(question_bank__owner=user) |
-            Q(created_by=user)
-        ).distinct()
-
-        # Filter by course if provided
+        # Precomputed per-course rollups for the courses the user can access
+        course_ids = accessible_course_ids(user)
         course = request.query_params.get('course')
         if course:
-            queryset = queryset.filter(question_bank__course__code=course)
+            course_ids = Course.objects.filter(id__in=course_ids, code=course).values_list('id', flat=True)
+        usages = CourseUsage.for_courses(course_ids)
 
-        total = queryset.count()
-        used = queryset.filter(times_used__gt=0).count()
+        total = sum(u.total for u in usages)
+        used = sum(u.used for u in usages)
         never_used = total - used
 
-        # Most used questions
-        most_used = queryset.filter(times_used__gt=0).order_by('-times_used')[:10]
-
-        # Recently used
-        recently_used = queryset.filter(last_used__isnull=False).order_by('-last_used')[:10]
-
-        # Usage by type
         by_type = {}
-        for q in queryset:
-            qtype = q.question_type
-            if qtype not in by_type:
-                by_type[qtype] = {'total': 0, 'used': 0, 'times_used': 0}
-            by_type[qtype]['total'] += 1
-            by_type[qtype]['times_used'] += q.times_used
-            if q.times_used > 0:
-                by_type[qtype]['used'] += 1
+        for usage in usages:
+            for qtype, counts in usage.by_type.items():
+                totals = by_type.setdefault(qtype, {'total': 0, 'used': 0, 'times_used': 0})
+                for key in totals:
+                    totals[key] += counts[key]
+
+        # Each rollup keeps its course's top 10, so the overall top 10 is among them
+        most_used = sorted(
+            (q for u in usages for q in u.most_used), key=lambda q: q['times_used'], reverse=True
+        )[:CourseUsage.TOP_N]
+        recently_used = sorted(
+            (q for u in usages for q in u.recently_used), key=lambda q: q['last_used'], reverse=True
+        )[:CourseUsage.TOP_N]
 
         return Response({
             'total_questions': total,
             'questions_used': used,
             'questions_never_used': never_used,
             'usage_rate': round(used / total * 100, 1) if total > 0 else 0,
-            'most_used': [
-                {
-                    'id': q.id,
-                    'text': q.text[:80] + '...' if len(q.text) > 80 else q.text,
-                    'type': q.question_type,
-                    'times_used': q.times_used,
-                    'last_used': q.last_used
-                } for q in most_used
-            ],
-            'recently_used': [
-                {
-                    'id': q.id,
-                    'text': q.text[:80] + '...' if len(q.text) > 80 else q.text,
-                    'type': q.question_type,
-                    'times_used': q.times_used,
-                    'last_used': q.last_used
-                } for q in recently_used
-            ],
+            'most_used': most_used,
+            'recently_used': recently_used,
             'by_type': by_type
         })
 
     @action(detail=True, methods=['get'])
     def versions(self, request, pk=None):
-        """Get version history for a question"""
+        """Version history for a question, newest first, in keyset pages of summaries.
+
+        The content of one version comes from versions/<number>/.
+        """
         question = self.get_object()
-        versions = question.versions.all()
-        serializer = QuestionVersionSerializer(versions, many=True)
-        return Response(serializer.data)
+        versions = question.versions.only(
+            'id', 'question_id', 'version_number', 'is_snapshot', 'size', 'change_summary', 'created_by',
+            'created_at'
+        ).order_by('-version_number')
+        paginator = HistoryPagination()
+        page = paginator.paginate_queryset(versions, request, view=self)
+        return paginator.get_paginated_response(QuestionVersionSummarySerializer(page, many=True).data)
+
+    @action(detail=True, methods=['get'], url_path=r'versions/(?P<number>\d+)')
+    def version(self, request, pk=None, number=None):
+        """One version of a question with its text and answers rebuilt from the history"""
+        question = self.get_object()
+        version = question.versions.filter(version_number=number).defer('text', 'answer_data', 'delta').first()
+        content = history.content(question.id, int(number)) if version else None
+        if content is None:
+            return Response({'error': 'Version not found'}, status=status.HTTP_404_NOT_FOUND)
+        version.text, version.answer_data = content
+        return Response(QuestionVersionSerializer(version).data)
 
     @action(detail=False, methods=['get'])
     def duplicates(self, request):
-        """Find potential duplicate questions"""
-        duplicates = (
-            Question.objects
-            .values('content_hash')
-            .annotate(count=Count('id'))
-            .filter(count__gt=1)
-        )
-        result = []
-        for dup in duplicates:
-            questions = Question.objects.filter(content_hash=dup['content_hash'])
-            result.append({
-                'hash': dup['content_hash'],
-                'count': dup['count'],
-                'questions': QuestionListSerializer(questions, many=True).data
-            })
-        return Response(result)
+        """Near-duplicate clusters for the user's courses (precomputed by `cluster_duplicates`)"""
+        course_ids = accessible_course_ids(request.user)
+        course = request.query_params.get('course')
+        clusters = DuplicateCluster.objects.filter(course_id__in=course_ids).select_related('course')
+        if course:
+            clusters = clusters.filter(course__code=course)
+        clusters = clusters.prefetch_related(Prefetch(
+            'questions',
+            queryset=Question.objects.only(
+                'id', 'question_type', 'text', 'points'
+            ).order_by('id')
+        ))
+        return Response([{
+            'id': cluster.id,
+            'course_code': cluster.course.code,
+            'size': cluster.size,
+            'similarity': cluster.similarity,
+            'created_at': cluster.created_at,
+            'questions': [{
+                'id': q.id,
+                'type': q.question_type,
+                'text': q.text[:150] + ('...' if len(q.text) > 150 else ''),
+                'points': float(q.points)
+            } for q in cluster.questions.all()]
+        } for cluster in clusters])
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
@@ -568,6 +772,22 @@ class QuestionViewSet(viewsets.ModelViewSet):
         question.sync_from_canonical()
         return Response({'status': 'synced'})
 
+    @action(detail=True, methods=['get', 'post'])
+    def propagate(self, request, pk=None):
+        """Push this canonical question's text, answers and type to its copies.
+
+        GET is a dry run listing the copies that would change and the fields
+        that differ; POST updates them (see questions/propagation.py).
+        """
+        question = self.get_object()
+        if question.canonical_id:
+            return Response({'error': 'Only a canonical question can be propagated'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if request.method == 'GET':
+            return Response(propagation.dry_run(question, request.user))
+        updated, skipped = propagation.propagate(question, request.user)
+        return Response({'updated': updated, 'skipped': skipped})
+
     @action(detail=True, methods=['post'])
     def clone(self, request, pk=None):
         """Create a clone of this question"""
@@ -610,19 +830,17 @@ class QuestionViewSet(viewsets.ModelViewSet):
         if not image_file:
             return Response({'error': 'No image file provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Validate file type
-        allowed_types = ['image/jpeg', 'image/png', 'image/gif', 'image/webp']
-        if image_file.content_type not in allowed_types:
-            return Response({'error': 'Invalid file type. Use JPEG, PNG, GIF, or WebP.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Create the image record
-        image = QuestionImage.objects.create(
-            question=question,
-            image=image_file,
-            alt_text=request.data.get('alt_text', ''),
-            caption=request.data.get('caption', ''),
-            uploaded_by=request.user
-        )
+        # Stored once per content hash, with its renditions
+        try:
+            image = images.save_upload(
+                image_file,
+                question=question,
+                alt_text=request.data.get('alt_text', ''),
+                caption=request.data.get('caption', ''),
+                uploaded_by=request.user
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = QuestionImageSerializer(image, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -638,19 +856,17 @@ class ImageUploadViewSet(viewsets.ViewSet):
         if not image_file:
             return Response({'error': 'No image file provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Validate file type
-        allowed_types = ['image/jpeg', 'image/png', 'image/gif', 'image/webp']
-        if image_file.content_type not in allowed_types:
-            return Response({'error': 'Invalid file type. Use JPEG, PNG, GIF, or WebP.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Create orphan image (no question yet)
-        image = QuestionImage.objects.create(
-            question=None,
-            image=image_file,
-            alt_text=request.data.get('alt_text', ''),
-            caption=request.data.get('caption', ''),
-            uploaded_by=request.user
-        )
+        # Create orphan image (no question yet; collected by `process_images` if never used)
+        try:
+            image = images.save_upload(
+                image_file,
+                question=None,
+                alt_text=request.data.get('alt_text', ''),
+                caption=request.data.get('caption', ''),
+                uploaded_by=request.user
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = QuestionImageSerializer(image, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -5,6 +5,7 @@ from rest_framework import serializers
 from .models import QuizSession, StudentSubmission, QuestionResponse, ScannedExam, QuizInvitation
 from questions.serializers import QuestionListSerializer
 from exams.serializers import ExamTemplateSerializer
+from questions.fastlist import ValuesSerializer
 
 
 class QuestionResponseSerializer(serializers.ModelSerializer):
@@ -66,6 +67,11 @@ class StudentSubmissionListSerializer(serializers.ModelSerializer):
         ]
 
 
+class StudentSubmissionValuesSerializer(ValuesSerializer):
+    """StudentSubmissionListSerializer for values() rows (see questions/fastlist.py)."""
+    serializer_class = StudentSubmissionListSerializer
+
+
 class StudentSubmissionDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer for a single submission with responses."""
     quiz_name = serializers.CharField(source='quiz_session.name', read_only=True)
@@ -101,6 +107,9 @@ class QuizSessionListSerializer(serializers.ModelSerializer):
         ]
 
     def get_submission_count(self, obj):
+        # Use annotated value if available (from list view)
+        if hasattr(obj, '_submission_count'):
+            return obj._submission_count
         return obj.submissions.count()
 
 
@@ -176,21 +185,20 @@ class QuizSessionCreateSerializer(serializers.ModelSerializer):
         template = quiz.template
 
         # Priority 1: If quiz has a specific generated_exam, use its questions
-        if quiz.generated_exam and quiz.generated_exam.questions.exists():
-            quiz.questions.set(quiz.generated_exam.questions.all())
+        if quiz.generated_exam and quiz.generated_exam.questions(manager='all_objects').exists():
+            quiz.questions.set(quiz.generated_exam.questions(manager='all_objects').all())
             return
 
         # Priority 2: Use the most recent generated exam from the template
         latest_exam = template.generated_exams.order_by('-created_at').first()
-        if latest_exam and latest_exam.questions.exists():
-            quiz.questions.set(latest_exam.questions.all())
+        if latest_exam and latest_exam.questions(manager='all_objects').exists():
+            quiz.questions.set(latest_exam.questions(manager='all_objects').all())
             return
 
         # Priority 3: Use filter_banks if defined
         if template.filter_banks.exists():
             questions = Question.objects.filter(
-                question_bank__in=template.filter_banks.all(),
-                deleted_at__isnull=True
+                question_bank__in=template.filter_banks.all()
             ).filter(
                 Q(block__isnull=True) | Q(variant_number=1)
             )
@@ -221,7 +229,7 @@ class QuizSessionCreateSerializer(serializers.ModelSerializer):
         from django.db.models import Q
 
         # Start with base queryset
-        queryset = Question.objects.filter(deleted_at__isnull=True)
+        queryset = Question.objects.all()
 
         # Filter by course
         course = section.get('course') or (template.course.code if template.course else None)
@@ -294,7 +294,7 @@ def create_submission_from_scan(scanned_exam, grading_service=None):
     scanned_exam.save(update_fields=['submission'])
 
     # Create responses for each extracted answer
-    questions = list(quiz.questions.all())
+    questions = list(quiz.questions(manager='all_objects').all())
     extracted = scanned_exam.extracted_answers or {}
 
     total_points = 0
@@ -1,3 +1,36 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.utils import timezone
+
+from exams.models import ExamTemplate
+from questions.tests import QueryBudgetTestCase
+
+from .models import QuizSession, StudentSubmission
+
+
+class QuizzesQueryBudgetTests(QueryBudgetTestCase):
+
+    def seed(self, **kwargs):
+        super().seed(**kwargs)
+        prefix = f"R{self.rounds}"
+        for course in self.user.owned_courses.filter(code__startswith=prefix):
+            template = ExamTemplate.objects.create(name=f"{prefix} quiz", course=course, owner=self.user)
+            session = QuizSession.objects.create(template=template, name=f"{prefix} quiz", created_by=self.user)
+            for i in range(4):
+                StudentSubmission.objects.create(
+                    quiz_session=session, student_name=f"Student {i}",
+                    session_token=f"{prefix}-{course.code}-{i}",
+                )
+
+    def test_session_list(self):
+        self.assertQueryBudget(2, '/api/quizzes/sessions/')
+
+    def test_submission_list(self):
+        self.assertQueryBudget(2, '/api/quizzes/submissions/')
+
+    def test_submission_list_matches_serializer(self):
+        StudentSubmission.objects.filter(student_name='Student 0').update(
+            submitted_at=timezone.now(), percentage_score=Decimal('87.5'), status='graded', is_late=True
+        )
+        data = self.assertFastListMatches('/api/quizzes/submissions/')
+        self.assertEqual(data['count'], StudentSubmission.objects.count())
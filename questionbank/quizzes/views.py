@@ -16,10 +16,12 @@ import random
 import csv
 import secrets
 
+from questions.models import count_subquery
+from questions.fastlist import FastListMixin
 from .models import QuizSession, StudentSubmission, QuestionResponse, ScannedExam, QuizInvitation
 from .serializers import (
     QuizSessionListSerializer, QuizSessionDetailSerializer, QuizSessionCreateSerializer,
-    StudentSubmissionListSerializer, StudentSubmissionDetailSerializer,
+    StudentSubmissionListSerializer, StudentSubmissionDetailSerializer, StudentSubmissionValuesSerializer,
     QuestionResponseSerializer, ScannedExamSerializer,
     QuizInfoSerializer, QuizQuestionSerializer, QuizInvitationSerializer
 )
@@ -43,7 +45,9 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
         # Show quizzes created by user or for templates they own
         return QuizSession.objects.filter(
             Q(created_by=user) | Q(template__owner=user)
-        ).select_related('template', 'template__course').distinct()
+        ).select_related('template', 'template__course').distinct().annotate(
+            _submission_count=count_subquery(StudentSubmission.objects, 'quiz_session')
+        )
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -95,20 +99,20 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
         quiz = self.get_object()
 
         # Get questions from various sources
-        questions = list(quiz.questions.all())
+        questions = list(quiz.questions(manager='all_objects').all())
 
         if not questions and quiz.generated_exam:
-            questions = list(quiz.generated_exam.questions.all())
+            questions = list(quiz.generated_exam.questions(manager='all_objects').all())
 
         if not questions and quiz.template:
             latest_exam = quiz.template.generated_exams.order_by('-created_at').first()
             if latest_exam:
-                questions = list(latest_exam.questions.all())
+                questions = list(latest_exam.questions(manager='all_objects').all())
 
         serializer = QuestionListSerializer(questions, many=True)
         return Response({
             'questions': serializer.data,
-            'source': 'direct' if quiz.questions.exists() else 'generated_exam' if quiz.generated_exam else 'template'
+            'source': 'direct' if quiz.questions(manager='all_objects').exists() else 'generated_exam' if quiz.generated_exam else 'template'
         })
 
     @action(detail=True, methods=['get'])
@@ -143,9 +147,10 @@ class QuizSessionViewSet(viewsets.ModelViewSet):
         return response
 
 
-class StudentSubmissionViewSet(viewsets.ReadOnlyModelViewSet):
+class StudentSubmissionViewSet(FastListMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet for viewing student submissions (instructor)."""
     permission_classes = [IsAuthenticated]
+    fast_serializer = StudentSubmissionValuesSerializer
 
     def get_queryset(self):
         user = self.request.user
@@ -441,21 +446,21 @@ class QuizStartView(APIView):
                 return Response({'error': 'Maximum attempts reached'}, status=status.HTTP_403_FORBIDDEN)
 
         # Get questions
-        questions = list(quiz.questions.all())
+        questions = list(quiz.questions(manager='all_objects').all())
         if not questions and quiz.template:
             # Try generated_exam first
-            if quiz.generated_exam and quiz.generated_exam.questions.exists():
-                questions = list(quiz.generated_exam.questions.all())
+            if quiz.generated_exam and quiz.generated_exam.questions(manager='all_objects').exists():
+                questions = list(quiz.generated_exam.questions(manager='all_objects').all())
             # Then try latest generated exam from template
             if not questions:
                 latest_exam = quiz.template.generated_exams.order_by('-created_at').first()
-                if latest_exam and latest_exam.questions.exists():
-                    questions = list(latest_exam.questions.all())
+                if latest_exam and latest_exam.questions(manager='all_objects').exists():
+                    questions = list(latest_exam.questions(manager='all_objects').all())
             # Then try filter_banks
             if not questions and quiz.template.filter_banks.exists():
                 from django.db.models import Q
                 for bank in quiz.template.filter_banks.all():
-                    bank_questions = list(bank.questions.filter(deleted_at__isnull=True).filter(
+                    bank_questions = list(bank.questions.filter(
                         Q(block__isnull=True) | Q(variant_number=1)
                     )[:50])
                     if bank_questions:
@@ -548,7 +553,8 @@ class QuizQuestionsView(APIView):
 
         # Get questions in order
         from questions.models import Question
-        questions = Question.objects.filter(id__in=submission.question_order)
+        # Questions trashed after the quiz started still belong to it
+        questions = Question.all_objects.filter(id__in=submission.question_order)
         question_map = {q.id: q for q in questions}
         ordered_questions = [question_map[qid] for qid in submission.question_order if qid in question_map]
 
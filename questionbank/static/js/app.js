@@ -368,6 +368,22 @@
             return json;
         }
 
+        // Fetch every page of a list endpoint using keyset cursors (?cursor=),
+        // calling onPage(results) as each page arrives. Returns all results.
+        async function apiAll(endpoint, onPage = null) {
+            const sep = endpoint.includes('?') ? '&' : '?';
+            let next = `${endpoint}${sep}cursor=`;
+            let all = [];
+            while (next) {
+                const data = await api(next);
+                const results = data.results || [];
+                all = all.concat(results);
+                if (onPage) onPage(results, all);
+                next = data.next ? data.next.split('/api/')[1] : null;
+            }
+            return all;
+        }
+
         // Data Loading
         async function loadCourses() {
             const data = await api('courses/');
@@ -493,17 +509,100 @@
             renderQuestions(questions, totalPages);
         }
 
+        // Local copy of a course kept current with /api/courses/<code>/changes/
+        // (delta sync, see questions/sync.py). Stored in IndexedDB when the
+        // browser has it, otherwise kept in memory for the page's lifetime.
+        const syncMemory = {};
+        const SYNC_KINDS = ['questions', 'tags', 'blocks', 'weeks'];
+
+        function syncStore(mode, fn) {
+            return new Promise(resolve => {
+                if (!window.indexedDB) return resolve(null);
+                const req = indexedDB.open('mkt-sync', 1);
+                req.onupgradeneeded = () => req.result.createObjectStore('courses', { keyPath: 'code' });
+                req.onerror = () => resolve(null);
+                req.onsuccess = () => {
+                    const tx = req.result.transaction('courses', mode);
+                    const result = fn(tx.objectStore('courses'));
+                    tx.oncomplete = () => resolve(result && 'result' in result ? result.result : null);
+                    tx.onerror = () => resolve(null);
+                };
+            });
+        }
+
+        async function syncCourse(code) {
+            let local = syncMemory[code] || await syncStore('readonly', store => store.get(code));
+            const since = local ? `?since=${encodeURIComponent(local.token)}` : '';
+            let delta = await api(`courses/${encodeURIComponent(code)}/changes/${since}`);
+            if (!delta.token && local) {
+                // Token rejected: start over
+                local = null;
+                delta = await api(`courses/${encodeURIComponent(code)}/changes/`);
+            }
+            if (!delta.token) return null;
+            if (!local || delta.full) {
+                local = { code, token: null };
+                SYNC_KINDS.forEach(kind => local[kind] = {});
+            }
+            // Deletions first: a question moved away and back is both deleted and upserted
+            SYNC_KINDS.forEach(kind => {
+                (delta.deleted[kind] || []).forEach(id => delete local[kind][id]);
+                delta[kind].forEach(row => local[kind][row.id] = row);
+            });
+            local.token = delta.token;
+            syncMemory[code] = local;
+            syncStore('readwrite', store => store.put(local));
+            return local;
+        }
+
+        // The question list rows (as QuestionListSerializer shapes them) for a synced course
+        function localQuestionList(local, { week, type } = {}) {
+            const questions = Object.values(local.questions);
+            const variants = {};
+            questions.forEach(q => {
+                if (q.block) (variants[q.block] = variants[q.block] || []).push(q);
+            });
+            return questions
+                .filter(q => q.canonical === null && (!q.block || !q.variant_number || q.variant_number === 1))
+                .filter(q => (!week || String(q.week) === String(week)) && (!type || q.question_type === type))
+                .sort((a, b) => (a.updated_at < b.updated_at) - (a.updated_at > b.updated_at))
+                .map(q => {
+                    const block = q.block ? local.blocks[q.block] : null;
+                    const siblings = (variants[q.block] || []).sort((a, b) => (a.variant_number || 0) - (b.variant_number || 0));
+                    return {
+                        ...q,
+                        course_code: local.code,
+                        tags: q.tags.map(id => local.tags[id]).filter(Boolean),
+                        block_name: block ? block.name : null,
+                        block_max_questions: block ? block.max_questions : null,
+                        block_variant_count: siblings.length,
+                        block_types: block ? siblings.map(v => ({
+                            id: v.id,
+                            type: v.question_type,
+                            text: v.text.length > 150 ? v.text.slice(0, 150) + '...' : v.text,
+                            points: parseInt(v.points),
+                        })) : null,
+                    };
+                });
+        }
+
         async function loadExamQuestions() {
             const params = new URLSearchParams();
             const course = document.getElementById('exam-filter-course')?.value;
             const week = document.getElementById('exam-filter-week')?.value;
             const type = document.getElementById('exam-filter-type')?.value;
+            if (course) {
+                const local = await syncCourse(course);
+                if (local) return renderExamQuestions(localQuestionList(local, { week, type }));
+            }
             if (course) params.append('course', course);
             if (week) params.append('week', week);
             if (type) params.append('type', type);
+            // The builder only shows a text preview and the block's variants
+            params.append('compact', '1');
+            params.append('expand', 'block');
 
-            const data = await api(`questions/?${params.toString()}`);
-            renderExamQuestions(data.results || data || []);
+            await apiAll(`questions/?${params.toString()}`, (page, all) => renderExamQuestions(all));
         }
 
         // Show prompt to select a course before loading questions
@@ -1019,12 +1118,10 @@
                 }).join('');
                 lucide.createIcons();
 
-                // Show sync button if this is not the canonical question
-                if (q.canonical) {
-                    syncSection.classList.remove('hidden');
-                } else {
-                    syncSection.classList.add('hidden');
-                }
+                // Copies sync from their canonical; the canonical pushes to its copies
+                syncSection.classList.remove('hidden');
+                document.getElementById('sync-btn').classList.toggle('hidden', !q.canonical);
+                document.getElementById('propagate-btn').classList.toggle('hidden', !!q.canonical);
             } else {
                 linkedTabs.classList.add('hidden');
                 linkedTabs.innerHTML = '';
@@ -1050,6 +1147,20 @@
             await editQuestion(editingQuestionId);
         }
 
+        async function propagateToCopies() {
+            if (!editingQuestionId || window.currentQuestion?.canonical) return;
+            const plan = await api(`questions/${editingQuestionId}/propagate/`);
+            if (!plan.changes.length) {
+                showNotification('All copies are up to date', 'info');
+                return;
+            }
+            const courses = [...new Set(plan.changes.map(c => c.course_code))].join(', ');
+            const skipped = plan.skipped.length ? ` (${plan.skipped.length} read-only copies will be skipped)` : '';
+            if (!confirm(`Overwrite ${plan.changes.length} copies in ${courses} with this version?${skipped}`)) return;
+            const result = await api(`questions/${editingQuestionId}/propagate/`, 'POST');
+            showNotification(`Updated ${result.updated.length} copies`, 'success');
+        }
+
         async function saveQuestion() {
             const data = {
                 question_bank: parseInt(document.getElementById('q-bank').value),
@@ -3433,7 +3544,7 @@
                 // Insert markdown reference at cursor in editor
                 if (editor) {
                     const position = editor.getPosition();
-                    const markdownRef = `![${image.alt_text || 'image'}](${image.url})`;
+                    const markdownRef = `![${image.alt_text || 'image'}](${image.web_url || image.url})`;
                     editor.executeEdits('', [{
                         range: {
                             startLineNumber: position.lineNumber,
@@ -3468,8 +3579,8 @@
             container.classList.remove('hidden');
             list.innerHTML = questionImages.map(img => `
                 <div class="relative group">
-                    <img src="${img.url}" alt="${escapeHtml(img.alt_text || '')}" class="w-16 h-16 object-cover rounded border border-gray-200 dark:border-slate-600">
-                    <button onclick="insertImageMarkdown('${img.url}', '${escapeHtml(img.alt_text || 'image')}')"
+                    <img src="${img.thumbnail_url || img.url}" alt="${escapeHtml(img.alt_text || '')}" class="w-16 h-16 object-cover rounded border border-gray-200 dark:border-slate-600">
+                    <button onclick="insertImageMarkdown('${img.web_url || img.url}', '${escapeHtml(img.alt_text || 'image')}')"
                             class="absolute inset-0 bg-black/50 opacity-0 group-hover:opacity-100 transition-opacity flex items-center justify-center rounded"
                             title="Insert into text">
                         <i data-lucide="plus" class="w-4 h-4 text-white"></i>
@@ -3602,9 +3713,10 @@
             if (!bulkSelectedQuestions.size) return alert('No questions selected');
             if (!confirm(`Delete ${bulkSelectedQuestions.size} questions? This cannot be undone.`)) return;
 
-            for (const id of bulkSelectedQuestions) {
-                await api(`questions/${id}/`, 'DELETE');
-            }
+            await api('questions/bulk/', 'POST', {
+                ids: [...bulkSelectedQuestions],
+                operations: { trash: true },
+            });
             bulkSelectedQuestions.clear();
             updateBulkCount();
             loadQuestions(currentPage);
@@ -3615,21 +3727,12 @@
             const tagName = prompt('Enter tag name to add to selected questions:');
             if (!tagName) return;
 
-            // First ensure tag exists
-            let tag = allTags.find(t => t.name.toLowerCase() === tagName.toLowerCase());
-            if (!tag) {
-                tag = await api('tags/', 'POST', { name: tagName, color: '#10b981' });
-            }
-
-            // Add tag to each question
-            for (const id of bulkSelectedQuestions) {
-                const q = await api(`questions/${id}/`);
-                const existingTags = (q.tags || []).map(t => t.name);
-                if (!existingTags.includes(tagName)) {
-                    existingTags.push(tagName);
-                    await api(`questions/${id}/`, 'PATCH', { tag_names: existingTags });
-                }
-            }
+            // Reuse an existing tag's spelling; the server creates missing tags
+            const tag = allTags.find(t => t.name.toLowerCase() === tagName.toLowerCase());
+            await api('questions/bulk/', 'POST', {
+                ids: [...bulkSelectedQuestions],
+                operations: { add_tags: [tag ? tag.name : tagName] },
+            });
 
             loadTags();
             loadQuestions(currentPage);
@@ -3644,12 +3747,14 @@
             const bankId = prompt(`Enter bank ID to move questions to:\n\n${bankOptions}`);
             if (!bankId) return;
 
-            for (const id of bulkSelectedQuestions) {
-                await api(`questions/${id}/`, 'PATCH', { question_bank: parseInt(bankId) });
-            }
+            const result = await api('questions/bulk/', 'POST', {
+                ids: [...bulkSelectedQuestions],
+                operations: { bank: parseInt(bankId) },
+            });
 
             loadQuestions(currentPage);
-            alert(`Moved ${bulkSelectedQuestions.size} questions to new bank`);
+            alert(`Moved ${result.updated} questions to new bank` +
+                (result.errors.length ? ` (${result.errors.length} skipped)` : ''));
         }
 
         // Duplicate/clone question
@@ -3764,8 +3869,15 @@
         async function emptyTrash() {
             if (!confirm('Permanently delete all items in trash? This cannot be undone.')) return;
             try {
-                const result = await api('questions/empty_trash/', 'POST');
-                showNotification(`Deleted ${result.deleted} questions permanently`, 'success');
+                let job = await api('questions/empty_trash/', 'POST');
+                showNotification(`Deleting ${job.total} questions...`, 'info');
+                // The purge runs in the background worker; poll until it's finished
+                while (job.status === 'pending' || job.status === 'running') {
+                    await new Promise(resolve => setTimeout(resolve, 2000));
+                    job = await api(`questions/purge_jobs/${job.id}/`);
+                }
+                if (job.status === 'failed') throw new Error(job.error);
+                showNotification(`Deleted ${job.deleted} questions permanently`, 'success');
                 loadTrash();
             } catch (err) {
                 console.error('Failed to empty trash:', err);
@@ -3816,11 +3928,18 @@
         async function exportQuestions(format) {
             const params = new URLSearchParams();
             const course = document.getElementById('filter-course')?.value;
+
+            // Whole-course exports stream from the server (see questions/export.py)
+            if (['moodle', 'qti', 'mkt'].includes(format) || (format === 'csv' && course && !selectedTags.length)) {
+                if (!course) return alert('Select a course to export');
+                const images = format === 'mkt' ? '?images=1' : '';
+                window.location.href = `/api/courses/${encodeURIComponent(course)}/export/${format}/${images}`;
+                return;
+            }
             if (course) params.append('course', course);
             selectedTags.forEach(tag => params.append('tags', tag));
 
-            const data = await api(`questions/?${params.toString()}&page_size=1000`);
-            const questions = data.results || data || [];
+            const questions = await apiAll(`questions/?${params.toString()}&page_size=1000`);
 
             if (format === 'json') {
                 const blob = new Blob([JSON.stringify(questions, null, 2)], { type: 'application/json' });
@@ -3862,6 +3981,7 @@
             if (!bankId) return alert('Please select a question bank');
 
             const file = fileInput.files[0];
+            if (file.name.endsWith('.zip')) return importPoolArchive(file, bankId);
             const text = await file.text();
             let questions;
 
@@ -3911,6 +4031,36 @@
             alert(`Imported ${imported} questions`);
         }
 
+        // mkt question pools (zip) are imported in the background into the bank's course
+        async function importPoolArchive(file, bankId) {
+            const course = banks.find(b => b.id == bankId)?.course_code;
+            if (!course) return alert('Please select a question bank');
+            const formData = new FormData();
+            formData.append('file', file);
+            try {
+                const res = await fetch(`/api/courses/${encodeURIComponent(course)}/import/`, {
+                    method: 'POST',
+                    body: formData,
+                    headers: { 'X-CSRFToken': getCookie('csrftoken') || '' },
+                    credentials: 'same-origin'
+                });
+                let job = await res.json();
+                if (!res.ok) throw new Error(job.error || res.statusText);
+                hideModal('import-modal');
+                showNotification(`Importing ${file.name} into ${course}...`, 'info');
+                while (job.status === 'pending' || job.status === 'running') {
+                    await new Promise(resolve => setTimeout(resolve, 2000));
+                    job = await api(`courses/${encodeURIComponent(course)}/import_jobs/${job.id}/`);
+                }
+                if (job.status === 'failed') throw new Error(job.error);
+                showNotification(`Imported ${job.questions_created} questions (${job.questions_existing} already there)`, 'success');
+                loadQuestions();
+            } catch (err) {
+                console.error('Failed to import pools:', err);
+                showNotification('Import failed: ' + err.message, 'error');
+            }
+        }
+
         // Block variant preview functions
         function previewBlockVariant(event, index) {
             const row = event.target.closest('.question-row');
@@ -0,0 +1,115 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import mkt_reader_writer as mkt
+
+PNG = b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x06\x00\x00\x00\x1f\x15\xc4\x89'
+
+
+class CourseTestCase(unittest.TestCase):
+    """A throwaway course directory with the module's caches cleared around it"""
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        root_path = mkt.root_path
+        mkt.root_path = self.root + '/'
+        self.addCleanup(setattr, mkt, 'root_path', root_path)
+        for cache in (mkt._listing_cache, mkt._tree_cache, mkt._file_cache, mkt._search_indexes):
+            cache.clear()
+            self.addCleanup(cache.clear)
+        self.write('chap1', '[q1]\ntype = shortAnswer\nquestion = "What is a linked list?"\nsolution = "Nodes"\n')
+
+    def write(self, name, content):
+        path = os.path.join(self.root, 'CS1', 'questions', name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb' if isinstance(content, bytes) else 'w') as f:
+            f.write(content)
+        return path
+
+
+class SearchTests(CourseTestCase):
+
+    def test_files_that_arent_question_files_are_left_out(self):
+        self.write('images/diagram.png', PNG)
+        self.write('notes', 'just some notes\n')
+        hits = mkt.search_questions('CS1', 'linked list')
+        self.assertEqual([(hit['file'], hit['question']) for hit in hits], [('chap1', 'q1')])
+        self.assertEqual(mkt.search_questions('CS1', 'notes'), [])
+
+        # A file that becomes a question file is picked up
+        self.write('notes', '[q2]\nquestion = "Lecture notes question"\n')
+        os.utime(os.path.join(self.root, 'CS1', 'questions', 'notes'), ns=(0, 10 ** 18))
+        self.assertEqual([hit['question'] for hit in mkt.search_questions('CS1', 'notes')], ['q2'])
+
+
+class PatchTests(CourseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.path = mkt.question_file_path('CS1', 'chap1')
+
+    def rewrite_on_disk(self):
+        """Another editor changes the file; our cached entry is now behind it"""
+        stale = mkt._get_file(self.path)
+        with open(self.path, 'a') as f:
+            f.write('\n[q2]\nquestion = "Added elsewhere"\n')
+        os.utime(self.path, ns=(0, stale.mtime + 10 ** 9))
+        fresh = mkt._get_file(self.path)
+        self.assertIsNot(fresh, stale)
+        return stale, fresh
+
+    def test_edits_never_land_on_a_replaced_entry(self):
+        stale, fresh = self.rewrite_on_disk()
+        # patch_questions read the old entry just before it was replaced
+        with mock.patch.object(mkt, '_get_file', side_effect=[stale, fresh]):
+            with self.assertRaises(mkt.StaleVersion):
+                mkt.patch_questions('CS1', 'chap1', {'q1': {'points': 3}}, stale.version)
+        with mock.patch.object(mkt, '_get_file', side_effect=[stale, fresh]):
+            mkt.patch_questions('CS1', 'chap1', {'q1': {'points': 3}})
+        self.assertFalse(stale.dirty)
+        mkt.flush('CS1', 'chap1')
+        with open(self.path) as f:
+            saved = f.read()
+        self.assertIn('points = 3', saved)
+        self.assertIn('Added elsewhere', saved)
+
+    def test_unknown_questions(self):
+        with self.assertRaises(mkt.UnknownQuestion) as raised:
+            mkt.patch_questions('CS1', 'chap1', {'nope': {'points': 1}})
+        self.assertEqual(raised.exception.name, 'nope')
+
+
+class SaveQuestionsTests(CourseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        spec = importlib.util.spec_from_file_location('index', os.path.join(os.path.dirname(__file__), 'web', 'index.py'))
+        index = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(index)
+        self.client = index.app.test_client()
+
+    def save(self, body):
+        return self.client.post('/saveQuestions', json=body)
+
+    def test_bad_requests(self):
+        response = self.save({'course': 'CS1', 'file': 'chap1'})
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn('Unknown question', response.get_json()['error'])
+        self.assertEqual(self.client.post('/saveQuestions', data='nope').status_code, 400)
+
+        response = self.save({'course': 'CS1', 'file': 'chap1', 'patches': {'nope': {'points': 1}}})
+        self.assertEqual((response.status_code, response.get_json()['error']), (400, 'Unknown question: nope'))
+
+        response = self.save({'course': 'CS1', 'file': 'chap1', 'patches': {'q1': {'points': 2}}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.save({'course': 'CS1', 'file': 'chap1', 'patches': {}, 'version': 'old'}).status_code, 409)
+        mkt.flush()
+
+
+if __name__ == '__main__':
+    unittest.main()
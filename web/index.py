@@ -1,11 +1,12 @@
-from flask import Flask, escape, request, render_template
+from flask import Flask, escape, request, render_template, jsonify
 import mkt_reader_writer 
 import os
-import json
 
 
 
 app = Flask(__name__)
+# Question files are ordered; don't let jsonify re-sort them
+app.json.sort_keys = False
 
 @app.route('/')
 @app.route('/home')
@@ -20,25 +21,50 @@ def editor():
 @app.route('/changeCourse', methods=['POST'])
 def changeCourse():
     course = request.form['selectedCourse']
-    return mkt_reader_writer.get_exams(course)
+    return jsonify(mkt_reader_writer.get_exams(course))
     
 @app.route('/changeExam', methods=['POST'])
 def changeExam():
     exam = request.form['selectedExam']
     course = request.form['selectedCourse']
-    return mkt_reader_writer.get_question_files(course, exam)
+    return jsonify(mkt_reader_writer.get_question_files(course, exam))
 
 @app.route('/getFolders', methods=['POST'])
 def getFolders():
     course = request.form['course']
-    return mkt_reader_writer.get_folders(course)
+    return jsonify(mkt_reader_writer.get_folders(course))
 
 @app.route('/getQuestions', methods=['POST'])
 def getQuestions():
     course = request.form['course'].strip()
     fileName = request.form['file'].strip()
-    questions = mkt_reader_writer.load_questions_file(course, fileName)
-    return json.dumps(questions)
+    page = request.form.get('page', 1, type=int)
+    pageSize = request.form.get('pageSize', mkt_reader_writer.DEFAULT_PAGE_SIZE, type=int)
+    return jsonify(mkt_reader_writer.load_questions_page(course, fileName, page, pageSize))
+
+@app.route('/search', methods=['GET', 'POST'])
+def search():
+    course = request.values['course'].strip()
+    query = request.values.get('q', '')
+    limit = request.values.get('limit', 50, type=int)
+    return jsonify(mkt_reader_writer.search_questions(course, query, limit))
+
+
+@app.route('/saveQuestions', methods=['POST'])
+def saveQuestions():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('patches'), dict) \
+            or not isinstance(data.get('course'), str) or not isinstance(data.get('file'), str):
+        return jsonify({'error': 'Expected {"course", "file", "patches": {name: fields}, "version"}'}), 400
+    course = data['course'].strip()
+    fileName = data['file'].strip()
+    try:
+        version = mkt_reader_writer.patch_questions(course, fileName, data['patches'], data.get('version'))
+    except mkt_reader_writer.StaleVersion as e:
+        return jsonify({'error': str(e), 'version': e.current}), 409
+    except mkt_reader_writer.UnknownQuestion as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'version': version})
 
 
 @app.route('/addItem', methods=['POST'])
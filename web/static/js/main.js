@@ -33,9 +33,7 @@ $('#examSelect').change(function() {
             async: false,
             success : function(response) {
                 if (response) {
-                    var arr = response.split(",");
-                    arr.forEach(function(val, idx) {
-                        val = val.trim();
+                    response.forEach(function(val, idx) {
                         renderQuestionsPath(val);
                         loadQuestions(course, val);
                     });
@@ -121,9 +119,7 @@ $('#addItemSelect').change(function() {
 });
 
 function renderOptions(target, response) {
-    var arr = response.split(",");
-    $.each(arr, function(idx, val) {
-        val = val.trim();
+    $.each(response, function(idx, val) {
         target.append(`<option value=${val}>${val}</option>`);
     });
 }
@@ -156,17 +152,18 @@ function renderQuestionsPath(questions_path) {
     });
 }
 
-function loadQuestions(course, questions_file) {
+function loadQuestions(course, questions_file, page = 1) {
     $.ajax({
         type: "POST",
         url: "/getQuestions",
         data: {
             "course": course,
             "file": questions_file,
+            "page": page,
         },
         async: false,
         success : function(response) {
-            const obj = JSON.parse(response);
+            const obj = response.questions;
             const path = questions_file.split('/');
             const id = path[path.length - 1];
             const target = $(`#${id}`);
@@ -180,6 +177,9 @@ function loadQuestions(course, questions_file) {
                 return button
             });
             target.append(buttons);
+            if (response.hasMore) {
+                loadQuestions(course, questions_file, page + 1);
+            }
         }
     });
 }